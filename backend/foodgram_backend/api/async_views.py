@@ -0,0 +1,87 @@
+"""Асинхронные виды чтения для запуска под ASGI.
+
+DRF 3.12 и ORM Django 3.2 синхронные, поэтому асинхронный вид -
+корутина, которая отдаёт синхронный вид в ограниченный пул потоков.
+Медленный запрос занимает поток пула, а не процесс целиком, и
+одновременных обращений к базе не больше ASYNC_DB_THREADS.
+
+Потоковый ответ (выгрузка корзины) дочитывается в том же потоке пула:
+Django 3.2 читает поток в цикле событий, где ORM запрещён. В цикл
+событий уходит уже готовое тело, так что медленный клиент не держит
+поток пула.
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .catalog import request_versions
+
+
+class DatabaseThreads:
+    """Пул потоков процесса для синхронных видов и ORM."""
+
+    def __init__(self):
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=settings.ASYNC_DB_THREADS,
+                    thread_name_prefix='database',
+                )
+        return self.executor
+
+    async def run(self, view, request, *args, **kwargs):
+        # Контекст (метрики запроса) переходит в поток вместе с видом.
+        return await asyncio.get_running_loop().run_in_executor(
+            self.get_executor(),
+            contextvars.copy_context().run,
+            functools.partial(self.call, view, request, *args, **kwargs)
+        )
+
+    @staticmethod
+    def call(view, request, *args, **kwargs):
+        # Сигналы начала и конца запроса приходят в другой поток:
+        # соединения и снимок версий потока пула ведём здесь.
+        close_old_connections()
+        request_versions.start()
+        try:
+            response = view(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()
+            if response.streaming:
+                # Строки корзины читаются курсором здесь, куски текста
+                # остаются в памяти: корзина - сотни строк, а не таблица.
+                response.streaming_content = list(response.streaming_content)
+            return response
+        finally:
+            request_versions.finish()
+            close_old_connections()
+
+
+database_threads = DatabaseThreads()
+
+
+def async_view(view):
+    """Асинхронная обёртка над синхронным видом (csrf_exempt и пр. целы)."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await database_threads.run(view, request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_patterns(patterns, view_classes):
+    """Заменяет виды view_classes в списке адресов асинхронными."""
+    for pattern in patterns:
+        if getattr(pattern.callback, 'cls', None) in view_classes:
+            pattern.callback = async_view(pattern.callback)
+    return patterns
@@ -0,0 +1,129 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from recipes.configurations import JWT_USERS_MEMO_MAX, USERS_ACCESS_VERSION
+from recipes.models import DataVersions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from users.models import DeniedTokens, Users
+
+
+class DenyList:
+    """Отозванные jti в памяти процесса.
+
+    Перечитывается из DeniedTokens не чаще раза в
+    JWT_DENYLIST_REFRESH секунд, так что проверка токена
+    обходится без запроса; отзыв в другом процессе
+    доходит до этого не позже, чем через это время.
+    Заодно читается счётчик USERS_ACCESS_VERSION: если
+    кого-то отключили или удалили, active_users процесса
+    перестаёт верить ответам, полученным до этого.
+    """
+
+    def __init__(self):
+        self.loaded = None
+        self.jtis = frozenset()
+        self.users_version = None
+        self.lock = threading.Lock()
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        if (
+            self.loaded is not None
+            and now - self.loaded < settings.JWT_DENYLIST_REFRESH
+        ):
+            return
+        with self.lock:
+            if (
+                self.loaded is not None
+                and now - self.loaded < settings.JWT_DENYLIST_REFRESH
+            ):
+                return
+            self.jtis = frozenset(DeniedTokens.active())
+            self.users_version = DataVersions.get_value(
+                USERS_ACCESS_VERSION
+            )
+            self.loaded = now
+
+    def __contains__(self, jti):
+        self.ensure_fresh()
+        return jti in self.jtis
+
+    def deny(self, token):
+        """Отзывает токен до его истечения; истёкшие строки удаляет."""
+        jti = token[api_settings.JTI_CLAIM]
+        expires = datetime.fromtimestamp(token['exp'], tz=timezone.utc)
+        DeniedTokens.objects.filter(
+            expires__lte=datetime.now(tz=timezone.utc)
+        ).delete()
+        DeniedTokens.objects.get_or_create(
+            jti=jti, defaults={'expires': expires}
+        )
+        with self.lock:
+            self.jtis = self.jtis | {jti}
+
+
+class ActiveUsers:
+    """Есть ли пользователь и активен ли он - в памяти процесса.
+
+    Ответ помнится JWT_USER_CHECK_TIMEOUT секунд, так что обычный
+    запрос обходится без базы. Отключение и удаление пользователя
+    (api/signals.py) сбрасывает ответ в своём процессе сразу, а в
+    остальных - с опросом deny_list, не позже чем через
+    JWT_DENYLIST_REFRESH секунд: общий кэш для этого не нужен.
+    """
+
+    def __init__(self):
+        self.checked = {}
+
+    def __contains__(self, user_id):
+        deny_list.ensure_fresh()
+        # Версия берётся до запроса: ответ, прочитанный до отключения,
+        # устареет со следующим опросом.
+        version = deny_list.users_version
+        now = time.monotonic()
+        checked = self.checked.get(user_id)
+        if checked is not None and checked[1] == version and now < checked[2]:
+            return checked[0]
+        active = Users.objects.filter(pk=user_id, is_active=True).exists()
+        if len(self.checked) >= JWT_USERS_MEMO_MAX:
+            self.checked = {}
+        self.checked[user_id] = (
+            active, version, now + settings.JWT_USER_CHECK_TIMEOUT
+        )
+        return active
+
+    def forget(self, user_id):
+        self.checked.pop(user_id, None)
+
+
+deny_list = DenyList()
+active_users = ActiveUsers()
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Вход по подписанному токену доступа без запросов к базе.
+
+    Пользователь собирается из id в токене: остальные поля
+    отложены и подгружаются, только если к ним обратятся
+    (например, is_staff при записи в справочники). Что он есть
+    и активен, проверяется по active_users.
+    """
+
+    def get_user(self, validated_token):
+        if validated_token.get(api_settings.JTI_CLAIM) in deny_list:
+            raise InvalidToken('Токен отозван.')
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken('В токене нет пользователя.')
+        if user_id not in active_users:
+            raise AuthenticationFailed(
+                'Пользователь удалён или отключён.', code='user_inactive'
+            )
+        return Users.from_db(DEFAULT_DB_ALIAS, ['id'], [user_id])
@@ -0,0 +1,186 @@
+"""Нагрузка на API по HTTP: пропускная способность и задержки."""
+import contextlib
+import http.client
+import itertools
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+
+# Как запускается каждый вариант сервера.
+SERVERS = {
+    'wsgi': {
+        'args': ['foodgram_backend.wsgi'],
+        'env': {'ASYNC_VIEWS': 'False'},
+    },
+    'asgi': {
+        'args': [
+            '--worker-class', 'uvicorn.workers.UvicornWorker',
+            'foodgram_backend.asgi',
+        ],
+        'env': {'ASYNC_VIEWS': 'True'},
+    },
+}
+READY_TIMEOUT = 30
+
+
+def percentile(values, share):
+    """Значение, не больше которого share отсортированных values."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(share * len(values)) - 1))
+    return values[index]
+
+
+def summary(latencies, errors, elapsed):
+    """Итог прогона: запросы в секунду и задержки в мс."""
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        'requests': total,
+        'errors': errors,
+        'rps': round(total / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2)
+        if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2)
+        if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2)
+        if latencies else None,
+    }
+
+
+def drive(base_url, requests, concurrency, duration, headers=None):
+    """Гоняет requests по кругу в concurrency потоков duration секунд.
+
+    requests - список (метод, путь). У каждого потока своё
+    keep-alive соединение; ответ не 2xx/3xx считается ошибкой.
+    """
+    address = urlsplit(base_url)
+    headers = dict(headers or {})
+    requests = [
+        (method, quote(path, safe='/?&=%:+')) for method, path in requests
+    ]
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    latencies, errors = [], 0
+
+    def worker(offset):
+        nonlocal errors
+        connection = http.client.HTTPConnection(
+            address.hostname, address.port, timeout=60
+        )
+        own, failed = [], 0
+        order = itertools.islice(itertools.cycle(requests), offset, None)
+        for method, path in order:
+            if time.monotonic() >= deadline:
+                break
+            started = time.monotonic()
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                failed += 1
+                continue
+            if response.status >= 400:
+                failed += 1
+            else:
+                own.append(time.monotonic() - started)
+        connection.close()
+        with lock:
+            latencies.extend(own)
+            errors += failed
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [
+            executor.submit(worker, offset % len(requests))
+            for offset in range(concurrency)
+        ]:
+            future.result()
+    return summary(latencies, errors, time.monotonic() - started)
+
+
+class ServerError(Exception):
+    """Сервер не запустился."""
+
+
+@contextlib.contextmanager
+def run_server(name, workers, env=None):
+    """gunicorn варианта name на свободном порту; отдаёт (адрес, процесс)."""
+    port = free_port()
+    base_url = 'http://127.0.0.1:{}'.format(port)
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn',
+            '--bind', '127.0.0.1:{}'.format(port),
+            '--workers', str(workers),
+            '--log-level', 'warning',
+            *SERVERS[name]['args'],
+        ],
+        cwd=settings.BASE_DIR,
+        env=dict(os.environ, **SERVERS[name]['env'], **(env or {})),
+        # Вывод сервера не должен смешиваться с JSON итога.
+        stdout=sys.stderr,
+    )
+    try:
+        wait_ready(base_url, process)
+        yield base_url, process
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=READY_TIMEOUT)
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_ready(base_url, process):
+    deadline = time.monotonic() + READY_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise ServerError('Сервер завершился при запуске.')
+        try:
+            urllib.request.urlopen(base_url + '/api/tags/', timeout=1)
+            return
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    raise ServerError('Сервер не ответил за {} с.'.format(READY_TIMEOUT))
+
+
+def process_tree_rss(pid):
+    """Память процесса и его потомков в КБ (Linux, /proc)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(entry)) as stat:
+                parent = int(stat.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open('/proc/{}/status'.format(current)) as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
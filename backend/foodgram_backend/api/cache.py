@@ -0,0 +1,128 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+from recipes.configurations import (RECIPE_CACHE_LOCAL_SIZE,
+                                    RECIPE_CACHE_PREFIX, RECIPE_CACHE_SCHEMA,
+                                    RECIPE_CACHE_TIMEOUT, RECIPES_VERSION)
+from recipes.models import DataVersions
+
+
+class RecipeFragmentCache:
+    """Кэш общей для всех пользователей части рицепта.
+
+    Два уровня: общий кэш Django и ограниченный LRU в памяти процесса.
+    Ключ фрагмента содержит версию рицепта и поколение всего кэша,
+    поэтому сброс - это запись новой версии, а старые ключи просто
+    перестают читаться.
+    """
+
+    def __init__(self, local_size=RECIPE_CACHE_LOCAL_SIZE):
+        self.local_size = local_size
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def new_version():
+        return uuid.uuid4().hex
+
+    def generation_key(self):
+        return f'{RECIPE_CACHE_PREFIX}:{RECIPE_CACHE_SCHEMA}:generation'
+
+    def version_key(self, pk):
+        return f'{RECIPE_CACHE_PREFIX}:{RECIPE_CACHE_SCHEMA}:version:{pk}'
+
+    def fragment_key(self, pk, stamp):
+        generation, version = stamp
+        return (f'{RECIPE_CACHE_PREFIX}:{RECIPE_CACHE_SCHEMA}:'
+                f'{pk}:{generation}:{version}')
+
+    def get_or_create_version(self, key, found):
+        version = found.get(key)
+        if version is None:
+            version = self.new_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        return version
+
+    def get_stamps(self, pks):
+        """Текущие (поколение, версия) для рицептов одним обращением."""
+        keys = [self.generation_key()]
+        keys.extend(self.version_key(pk) for pk in pks)
+        found = cache.get_many(keys)
+        generation = self.get_or_create_version(self.generation_key(), found)
+        return {
+            pk: (generation,
+                 self.get_or_create_version(self.version_key(pk), found))
+            for pk in pks
+        }
+
+    def get_many(self, pks):
+        """Возвращает штампы и найденные фрагменты {pk: данные}."""
+        stamps = self.get_stamps(pks)
+        fragments = {}
+        with self.lock:
+            for pk, stamp in stamps.items():
+                entry = self.local.get(pk)
+                if entry is not None and entry[0] == stamp:
+                    self.local.move_to_end(pk)
+                    fragments[pk] = entry[1]
+        missing = {
+            self.fragment_key(pk, stamp): pk
+            for pk, stamp in stamps.items() if pk not in fragments
+        }
+        if missing:
+            found = cache.get_many(list(missing))
+            for key, data in found.items():
+                fragments[missing[key]] = data
+                self.remember(missing[key], stamps[missing[key]], data)
+        return stamps, fragments
+
+    def set_many(self, fragments, stamps):
+        cache.set_many(
+            {
+                self.fragment_key(pk, stamps[pk]): data
+                for pk, data in fragments.items()
+            },
+            RECIPE_CACHE_TIMEOUT
+        )
+        for pk, data in fragments.items():
+            self.remember(pk, stamps[pk], data)
+
+    def remember(self, pk, stamp, data):
+        with self.lock:
+            self.local[pk] = (stamp, data)
+            self.local.move_to_end(pk)
+            while len(self.local) > self.local_size:
+                self.local.popitem(last=False)
+
+    def invalidate(self, pks):
+        cache.set_many(
+            {self.version_key(pk): self.new_version() for pk in pks},
+            None
+        )
+
+    def invalidate_all(self):
+        cache.set(self.generation_key(), self.new_version(), None)
+
+
+recipe_fragments = RecipeFragmentCache()
+
+
+def invalidate_recipes(pks):
+    """Сбросить фрагменты рицептов после фиксации транзакции.
+
+    Счётчик рицептов (ETag списков) растёт в той же транзакции.
+    """
+    pks = list(pks)
+    if pks:
+        DataVersions.bump(RECIPES_VERSION)
+        transaction.on_commit(lambda: recipe_fragments.invalidate(pks))
+
+
+def invalidate_all_recipes():
+    """Сбросить все фрагменты (правка тегов или ингридиентов)."""
+    DataVersions.bump(RECIPES_VERSION)
+    transaction.on_commit(recipe_fragments.invalidate_all)
@@ -0,0 +1,143 @@
+import threading
+
+from recipes.configurations import INGREDIENTS_VERSION, TAGS_VERSION
+from recipes.models import DataVersions, Tags
+
+# Счётчики справочников, которые читаются вместе с любыми другими.
+CATALOG_VERSIONS = (TAGS_VERSION, INGREDIENTS_VERSION)
+
+
+class RequestVersions:
+    """Снимок счётчиков DataVersions на время одного запроса.
+
+    Первое обращение за запрос читает нужные счётчики и счётчики
+    справочников одним запросом, дальше ответы берутся из снимка.
+    Вне запроса (команды, фоновые потоки) счётчики читаются заново.
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def start(self, **kwargs):
+        self.local.active = True
+        self.local.versions = {}
+
+    def finish(self, **kwargs):
+        self.local.active = False
+        self.local.versions = {}
+
+    def reset(self):
+        """Забыть снимок: справочник поменялся внутри этого запроса."""
+        self.local.versions = {}
+
+    def get_many(self, names):
+        """{имя: (версия, время изменения)}, как DataVersions.get_many."""
+        active = getattr(self.local, 'active', False)
+        versions = self.local.versions if active else {}
+        missing = [name for name in names if name not in versions]
+        if missing:
+            if not versions:
+                missing.extend(
+                    name for name in CATALOG_VERSIONS if name not in missing
+                )
+            found = DataVersions.get_many(missing)
+            for name in missing:
+                versions[name] = found.get(name, (0, None))
+        return {
+            name: versions[name] for name in names
+            if versions[name][1] is not None
+        }
+
+    def get_value(self, name):
+        return self.get_many([name]).get(name, (0, None))[0]
+
+
+request_versions = RequestVersions()
+
+
+class CatalogCache:
+    """Справочник целиком в памяти процесса.
+
+    Строки хранятся словарями в порядке сортировки модели.
+    Версия сверяется с DataVersions не чаще раза за запрос;
+    правка в админке поднимает версию, и каждый процесс
+    перечитывает справочник при следующем запросе.
+    """
+    version_name = None
+
+    def __init__(self):
+        self.version = None
+        self.rows = []
+        self.by_id = {}
+        self.lock = threading.Lock()
+
+    def load(self):
+        raise NotImplementedError
+
+    def rebuild(self, rows):
+        self.rows = rows
+        self.by_id = {row['id']: row for row in rows}
+
+    def ensure_fresh(self):
+        version = request_versions.get_value(self.version_name)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            self.rebuild(self.load())
+            self.version = version
+
+    def all(self):
+        self.ensure_fresh()
+        return self.rows
+
+    def get(self, pk):
+        return self.get_many([pk]).get(pk)
+
+    def get_many(self, ids):
+        """{id: строка}. Промах - повод перечитать версию ещё раз."""
+        self.ensure_fresh()
+        ids = list(ids)
+        if any(pk not in self.by_id for pk in ids):
+            request_versions.reset()
+            self.ensure_fresh()
+        return {pk: self.by_id[pk] for pk in ids if pk in self.by_id}
+
+
+class TagsCatalog(CatalogCache):
+    """Теги: по id и по slug."""
+    version_name = TAGS_VERSION
+
+    def load(self):
+        return list(Tags.objects.values('id', 'name', 'color', 'slug'))
+
+    def rebuild(self, rows):
+        super().rebuild(rows)
+        self.position = {row['id']: index for index, row in enumerate(rows)}
+        self.by_slug = {row['slug']: row for row in rows if row['slug']}
+
+    def get_slug(self, slug):
+        self.ensure_fresh()
+        return self.by_slug.get(slug)
+
+    def choices(self):
+        """Варианты для фильтра по slug."""
+        return [
+            (row['slug'], row['name']) for row in self.all() if row['slug']
+        ]
+
+    def for_recipe(self, ids):
+        """Теги рицепта в порядке сортировки тегов."""
+        found = self.get_many(ids)
+        return sorted(
+            found.values(), key=lambda row: self.position.get(row['id'], 0)
+        )
+
+
+tags_catalog = TagsCatalog()
+
+
+def tag_choices():
+    """Варианты slug для фильтров (функция: фильтры копируют аргументы)."""
+    return tags_catalog.choices()
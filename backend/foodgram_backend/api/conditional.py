@@ -0,0 +1,65 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from recipes.configurations import USER_MARKS_VERSION
+
+from .catalog import request_versions
+
+
+class ConditionalGetMixin:
+    """ETag по счётчикам изменений DataVersions.
+
+    Совпавший валидатор даёт 304 до выборки и сериализации: на запрос
+    уходит одно чтение счётчиков (общее со справочниками в памяти,
+    см. catalog.request_versions). version_names - счётчики, от которых
+    зависит ответ. С per_user в валидатор входят пользователь и счётчик
+    его отметок, а ответ варьируется по Authorization. Ответы, для
+    которых счётчиков нет, исключает is_conditional. Last-Modified нет:
+    две правки за одну секунду дали бы неверный 304 по If-Modified-Since.
+    """
+    version_names = ()
+    per_user = False
+
+    def get_version_names(self, request):
+        names = list(self.version_names)
+        if self.per_user and request.user.is_authenticated:
+            names.append(USER_MARKS_VERSION.format(request.user.pk))
+        return names
+
+    def is_conditional(self, request):
+        return True
+
+    def get_etag(self, request):
+        names = self.get_version_names(request)
+        versions = request_versions.get_many(names)
+        tokens = [
+            '{}={}'.format(name, versions.get(name, (0, None))[0])
+            for name in names
+        ]
+        tokens.append('format={}'.format(request.accepted_renderer.format))
+        if self.per_user:
+            tokens.append('user={}'.format(request.user.pk or 0))
+        return quote_etag(
+            hashlib.md5(';'.join(tokens).encode()).hexdigest()
+        )
+
+    def conditional(self, handler, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            return handler(request, *args, **kwargs)
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if self.per_user:
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
@@ -0,0 +1,159 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+from recipes.configurations import (COOKABLE_CHECK_EVERY, COOKABLE_GAP_TIMEOUT,
+                                    COOKABLE_LOG_KEEP, COOKABLE_LOG_TRIM_EVERY,
+                                    COOKABLE_REBUILD_CHANGES)
+from recipes.models import RecipeIngredients, RecipeIngredientsChanges
+
+
+class CookableIndex:
+    """Обратный индекс "ингридиент -> рицепты" в памяти процесса.
+
+    postings[ингридиент] - отсортированный array id рицептов,
+    compositions[рицепт] - отсортированный array его ингридиентов.
+    Изменения берутся из журнала RecipeIngredientsChanges: не чаще
+    раза в COOKABLE_CHECK_EVERY с запрос дочитывает новые строки
+    и пересчитывает только эти рицепты. Если новых строк нет,
+    блокировка не берётся. Строки журнала, чьи id пропущены
+    (транзакция ещё не зафиксирована), перечитываются, пока не
+    истечёт COOKABLE_GAP_TIMEOUT. Процесс, отставший больше, чем
+    хранится журнал, собирает индекс заново.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.compositions = {}
+        self.last_id = None
+        self.gaps = {}
+        self.refreshed = None
+        self.trimmed = 0
+        self.lock = threading.Lock()
+
+    def ensure_fresh(self):
+        now = time.monotonic()
+        refreshed = self.refreshed
+        if refreshed is not None and now - refreshed < COOKABLE_CHECK_EVERY:
+            return
+        if refreshed is None or now - refreshed > COOKABLE_LOG_KEEP:
+            with self.lock:
+                # Пока ждали блокировку, индекс мог собрать другой поток.
+                if self.refreshed == refreshed:
+                    self.rebuild()
+        elif self.gaps or RecipeIngredientsChanges.objects.filter(
+            id__gt=self.last_id
+        ).exists():
+            with self.lock:
+                self.apply_changes()
+        self.refreshed = now
+        if now - self.trimmed > COOKABLE_LOG_TRIM_EVERY:
+            self.trimmed = now
+            RecipeIngredientsChanges.objects.filter(
+                created__lt=timezone.now() - timedelta(
+                    seconds=COOKABLE_LOG_KEEP
+                )
+            ).delete()
+
+    def rebuild(self):
+        # Отметка журнала до чтения: что изменится во время сборки,
+        # будет применено ещё раз, это безопасно.
+        self.last_id = RecipeIngredientsChanges.objects.aggregate(
+            last=Max('id')
+        )['last'] or 0
+        self.gaps = {}
+        postings, compositions = {}, {}
+        rows = RecipeIngredients.objects.order_by(
+            'id_ingredient_id', 'id_recipe_id'
+        ).values_list('id_ingredient_id', 'id_recipe_id').iterator()
+        for ingredient_id, recipe_id in rows:
+            postings.setdefault(ingredient_id, array('q')).append(recipe_id)
+            compositions.setdefault(recipe_id, array('q')).append(
+                ingredient_id
+            )
+        self.postings, self.compositions = postings, compositions
+
+    def apply_changes(self):
+        changes = RecipeIngredientsChanges.objects.filter(
+            id__gt=self.last_id
+        ) | RecipeIngredientsChanges.objects.filter(id__in=list(self.gaps))
+        rows = list(changes.order_by('id').values_list(
+            'id', 'recipe_id'
+        )[:COOKABLE_REBUILD_CHANGES + 1])
+        if len(rows) > COOKABLE_REBUILD_CHANGES:
+            # Массовая загрузка: собрать заново дешевле, чем по одному.
+            self.rebuild()
+            return
+        now = time.monotonic()
+        for change_id, _ in rows:
+            self.gaps.pop(change_id, None)
+        expected = self.last_id + 1
+        for change_id, _ in rows:
+            if change_id <= self.last_id:
+                continue
+            for missing in range(expected, change_id):
+                self.gaps[missing] = now
+            expected = change_id + 1
+            self.last_id = change_id
+        self.gaps = {
+            change_id: seen for change_id, seen in self.gaps.items()
+            if now - seen < COOKABLE_GAP_TIMEOUT
+        }
+        recipe_ids = {recipe_id for _, recipe_id in rows}
+        if recipe_ids:
+            self.reindex(recipe_ids)
+
+    def reindex(self, recipe_ids):
+        """Пересчитывает состав рицептов recipe_ids по базе.
+
+        Меняются только списки ингридиентов, которые в рицепт
+        добавлены или из него убраны.
+        """
+        current = {recipe_id: set() for recipe_id in recipe_ids}
+        for ingredient_id, recipe_id in RecipeIngredients.objects.filter(
+            id_recipe__in=recipe_ids
+        ).order_by().values_list('id_ingredient_id', 'id_recipe_id'):
+            current[recipe_id].add(ingredient_id)
+        for recipe_id, ingredients in current.items():
+            previous = set(self.compositions.get(recipe_id, ()))
+            for ingredient_id in previous - ingredients:
+                recipes = self.postings[ingredient_id]
+                del recipes[bisect_left(recipes, recipe_id)]
+                if not recipes:
+                    del self.postings[ingredient_id]
+            for ingredient_id in ingredients - previous:
+                recipes = self.postings.setdefault(ingredient_id, array('q'))
+                recipes.insert(bisect_left(recipes, recipe_id), recipe_id)
+            if ingredients:
+                self.compositions[recipe_id] = array('q', sorted(ingredients))
+            else:
+                self.compositions.pop(recipe_id, None)
+
+    def cookable(self, ingredient_ids, max_missing=None):
+        """Рицепты хотя бы с одним ингридиентом из ingredient_ids.
+
+        Список (id рицепта, совпало, не хватает): сначала те,
+        где не хватает меньше, затем где совпало больше, затем новые.
+        """
+        self.ensure_fresh()
+        with self.lock:
+            matched = Counter()
+            for ingredient_id in set(ingredient_ids):
+                matched.update(self.postings.get(ingredient_id, ()))
+            compositions = self.compositions
+            found = [
+                (recipe_id, hits, len(compositions[recipe_id]) - hits)
+                for recipe_id, hits in matched.items()
+            ]
+        if max_missing is not None:
+            found = [row for row in found if row[2] <= max_missing]
+        found.sort(key=lambda row: (row[2], -row[1], -row[0]))
+        return found
+
+
+cookable_index = CookableIndex()
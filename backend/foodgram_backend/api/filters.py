@@ -1,31 +1,32 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import (BooleanFilter, CharFilter,
-                                           FilterSet,
-                                           ModelMultipleChoiceFilter)
-from recipes.models import Recipes, Tags
-from rest_framework import filters
+                                           ChoiceFilter, FilterSet,
+                                           MultipleChoiceFilter)
+from recipes.configurations import POPULAR_ORDERING, RECIPES_ORDERING_POPULAR
+from recipes.models import Recipes, TagsRecipes
 
-
-class DynamicSearchFilter(filters.SearchFilter):
-    """Динамически поиск для ингридиентов."""
-    search_param = 'name'
-
-    def get_search_fields(self, view, request):
-        if request.query_params.get('name'):
-            return ['name']
-        return super().get_search_fields(view, request)
+from .catalog import tag_choices, tags_catalog
 
 
 class RecipesFilter(FilterSet):
-    """Фильтр по автору, избраным рицептам, в корзине, тегам."""
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tags.objects.all()
+    """Фильтр по автору, избраным рицептам, в корзине, тегам, поиск.
+
+    ordering=popular - сначала самые избранные (по индексу
+    recipes_popular_idx), порядок поиска по релевантности он заменяет.
+    """
+    tags = MultipleChoiceFilter(
+        choices=tag_choices,
+        method='method_tags',
     )
 
+    search = CharFilter(method='method_search')
     author = CharFilter(field_name='author__id')
     is_favorited = BooleanFilter(method='method_favorited_filter')
     is_in_shopping_cart = BooleanFilter(method='method_shopping_filter')
+    ordering = ChoiceFilter(
+        choices=((RECIPES_ORDERING_POPULAR, 'По популярности'),),
+        method='method_ordering',
+    )
 
     class Meta:
         model = Recipes
@@ -34,8 +35,32 @@ class RecipesFilter(FilterSet):
             'author',
             'is_in_shopping_cart',
             'tags',
+            'search',
+            'ordering',
         ]
 
+    def method_tags(self, queryset, name, value):
+        """EXISTS по связям вместо JOIN: без дублей и без DISTINCT."""
+        tags = [tags_catalog.get_slug(slug) for slug in value]
+        tag_ids = [tag['id'] for tag in tags if tag is not None]
+        if not tag_ids:
+            return queryset
+        return queryset.filter(Exists(TagsRecipes.objects.filter(
+            id_recipe=OuterRef('pk'),
+            id_teg__in=tag_ids,
+        )))
+
+    def method_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.search(value)
+
+    def method_ordering(self, queryset, name, value):
+        if value == RECIPES_ORDERING_POPULAR:
+            return queryset.order_by(*POPULAR_ORDERING)
+        return queryset
+
     def method_favorited_filter(self, queryset, name, value):
         user = self.request.user
         print(value)
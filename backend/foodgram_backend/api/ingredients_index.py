@@ -0,0 +1,115 @@
+from array import array
+from bisect import bisect_left
+
+from recipes.configurations import (INGREDIENTS_INFIX_MIN_LENGTH,
+                                    INGREDIENTS_VERSION)
+from recipes.models import Ingredients
+
+from .catalog import CatalogCache
+
+# Символ больше любого в названиях: верхняя граница диапазона префикса.
+PREFIX_END = chr(0x10FFFF)
+# Суффикс в массиве суффиксов: номер ключа << OFFSET_BITS | смещение.
+OFFSET_BITS = 16
+OFFSET_MASK = (1 << OFFSET_BITS) - 1
+
+
+def fold(text):
+    """Приводит строку к виду для поиска: регистр и ё -> е."""
+    return text.casefold().replace('ё', 'е')
+
+
+class IngredientsIndex(CatalogCache):
+    """Префиксный индекс ингридиентов в памяти процесса.
+
+    Отсортированный список ключей и bisect. Для поиска по вхождению -
+    массив суффиксов ключей (кроме самих ключей), отсортированный
+    по тексту суффикса: вхождение - это префикс одного из них.
+    Собирается при первом запросе и пересобирается, когда меняется
+    версия в DataVersions.
+    """
+    version_name = INGREDIENTS_VERSION
+
+    def load(self):
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, name, pk, unit in sorted(
+                (fold(name), name, pk, measurement_unit)
+                for pk, name, measurement_unit
+                in Ingredients.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).iterator()
+            )
+        ]
+
+    def rebuild(self, rows):
+        super().rebuild(rows)
+        keys = [fold(row['name']) for row in rows]
+        infixes = array('q', sorted(
+            (
+                position << OFFSET_BITS | offset
+                for position, key in enumerate(keys)
+                for offset in range(1, len(key))
+            ),
+            key=lambda code: keys[code >> OFFSET_BITS][code & OFFSET_MASK:]
+        ))
+        # Одним присваиванием: поиск в другом потоке видит согласованные
+        # строки, ключи и суффиксы.
+        self.lookup = rows, keys, infixes
+
+    @staticmethod
+    def infix_bound(keys, infixes, value):
+        """Первый суффикс в infixes не меньше value (bisect_left)."""
+        low, high = 0, len(infixes)
+        while low < high:
+            middle = (low + high) // 2
+            code = infixes[middle]
+            if keys[code >> OFFSET_BITS][code & OFFSET_MASK:] < value:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def for_recipe(self, amounts):
+        """Ингридиенты рицепта с количеством: {id: amount} -> по названию."""
+        found = self.get_many(amounts)
+        return sorted(
+            (dict(row, amount=amounts[pk]) for pk, row in found.items()),
+            key=lambda row: (row['name'], row['id'])
+        )
+
+    def search(self, query, limit):
+        """Сначала точные совпадения, затем по префиксу, затем по вхождению."""
+        self.ensure_fresh()
+        rows, keys, infixes = self.lookup
+        query = fold(query.strip())
+        if not query:
+            return rows[:limit]
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query + PREFIX_END, start)
+        found = rows[start:min(end, start + limit)]
+        if len(found) < limit and len(query) >= INGREDIENTS_INFIX_MIN_LENGTH:
+            low = self.infix_bound(keys, infixes, query)
+            high = self.infix_bound(keys, infixes, query + PREFIX_END)
+            # Совпадений мало - берём их из суффиксов и сортируем по номеру
+            # ключа (номера идут по алфавиту). Много - проход по ключам
+            # по порядку наберёт limit раньше, чем соберутся все.
+            if (high - low) ** 2 < (limit - len(found)) * len(keys):
+                matches = sorted(
+                    {code >> OFFSET_BITS for code in infixes[low:high]}
+                )
+            else:
+                matches = (
+                    position for position, key in enumerate(keys)
+                    if query in key
+                )
+            for position in matches:
+                if start <= position < end:
+                    continue
+                found.append(rows[position])
+                if len(found) >= limit:
+                    break
+        return found
+
+
+ingredients_index = IngredientsIndex()
@@ -0,0 +1,395 @@
+"""Метрики запросов по адресам в текстовом формате Prometheus.
+
+Каждый процесс копит счётчики в памяти и раз в METRICS_FLUSH_INTERVAL
+секунд записывает их в METRICS_DIR/<pid>-<старт>.json: время старта
+в имени не даёт новому процессу с тем же pid затереть файл старого.
+/api/_metrics складывает файлы всех процессов, так что счётчики
+воркеров gunicorn суммируются. Файлы завершённых процессов он сводит
+в METRICS_DIR/archive.json и удаляет: их счётчики остаются в сумме,
+текущие значения (пул соединений) - нет.
+"""
+import contextlib
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from foodgram_backend.postgresql_pool.pool import pool_stats
+
+# Границы корзин гистограммы длительности запроса, с.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Счётчики маршрута: запросы, сумма времени, запросы SQL, время SQL,
+# время сериализаторов, затем корзины гистограммы.
+ROUTE_FIELDS = 5
+# Сумма счётчиков завершённых процессов и его блокировка в METRICS_DIR.
+ARCHIVE_NAME = 'archive.json'
+ARCHIVE_LOCK_NAME = 'archive.lock'
+
+current_request = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestRecord:
+    """Счётчики одного запроса: SQL и сериализация."""
+
+    __slots__ = ('sql_count', 'sql_seconds', 'serializer_seconds',
+                 'serializing')
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializing = False
+
+
+class MetricsRegistry:
+    """Счётчики процесса по маршрутам и их запись на диск."""
+
+    def __init__(self):
+        self.routes = {}
+        self.responses = {}
+        self.flusher_pid = None
+        self.lock = threading.Lock()
+
+    def observe(self, route, method, status, seconds, record):
+        with self.lock:
+            values = self.routes.get(route)
+            if values is None:
+                values = self.routes[route] = [0] * (
+                    ROUTE_FIELDS + len(LATENCY_BUCKETS) + 1
+                )
+            values[0] += 1
+            values[1] += seconds
+            values[2] += record.sql_count
+            values[3] += record.sql_seconds
+            values[4] += record.serializer_seconds
+            bucket = ROUTE_FIELDS
+            for bound in LATENCY_BUCKETS:
+                if seconds <= bound:
+                    break
+                bucket += 1
+            values[bucket] += 1
+            key = (route, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+            if self.flusher_pid != os.getpid():
+                # Поток записи свой у каждого процесса (после fork).
+                self.flusher_pid = os.getpid()
+                threading.Thread(
+                    target=self.flush_forever,
+                    name='metrics',
+                    daemon=True,
+                ).start()
+
+    def snapshot(self):
+        pid = os.getpid()
+        with self.lock:
+            return {
+                'pid': pid,
+                'start': process_start(pid),
+                'routes': {
+                    route: list(values)
+                    for route, values in self.routes.items()
+                },
+                'responses': [
+                    [route, method, status, count]
+                    for (route, method, status), count
+                    in self.responses.items()
+                ],
+                'pools': pool_stats(),
+            }
+
+    def flush_forever(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                continue
+
+    def flush(self):
+        """Записывает счётчики процесса в METRICS_DIR атомарно."""
+        directory = settings.METRICS_DIR
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        snapshot = self.snapshot()
+        write_json(
+            os.path.join(directory, snapshot_name(snapshot)), snapshot
+        )
+
+    def snapshots(self):
+        """Снимки всех процессов; свой - текущий, а не с диска.
+
+        Завершённые процессы приходят одним снимком - архивом.
+        """
+        own = self.snapshot()
+        directory = settings.METRICS_DIR
+        if not directory or not os.path.isdir(directory):
+            return [own]
+        with open(os.path.join(directory, ARCHIVE_LOCK_NAME), 'w') as lock:
+            # Сводят в архив воркеры, к которым пришёл /api/_metrics.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            live, archive = self.fold_finished(
+                directory, snapshot_name(own)
+            )
+        return [own, archive, *live]
+
+    def fold_finished(self, directory, own_name):
+        """Файлы завершённых процессов - в архив, живые - в ответ.
+
+        Архив записывается раньше удаления файлов и помнит, что в него
+        вошло (folded): после сбоя между этими шагами файл не сложится
+        второй раз.
+        """
+        path = os.path.join(directory, ARCHIVE_NAME)
+        archive = read_json(path) or empty_snapshot()
+        live, finished, folded = [], [], []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json') or name in (own_name, ARCHIVE_NAME):
+                continue
+            snapshot = read_json(os.path.join(directory, name))
+            if snapshot is None:
+                continue
+            if process_alive(snapshot['pid'], snapshot.get('start')):
+                live.append(snapshot)
+                continue
+            finished.append(name)
+            if name not in archive['folded']:
+                folded.append(snapshot)
+        if folded:
+            routes, responses = add_counters([archive, *folded])
+            archive = empty_snapshot()
+            archive['routes'] = routes
+            archive['responses'] = [
+                [*key, count] for key, count in sorted(responses.items())
+            ]
+            archive['folded'] = finished
+            write_json(path, archive)
+        for name in finished:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(directory, name))
+        return live, archive
+
+    def exposition(self):
+        """Сумма счётчиков всех процессов в формате Prometheus."""
+        snapshots = self.snapshots()
+        routes, responses = add_counters(snapshots)
+        pools = {}
+        for snapshot in snapshots:
+            for alias, stats in snapshot['pools'].items():
+                total = pools.setdefault(alias, {})
+                for name, value in stats.items():
+                    if isinstance(value, (int, float)):
+                        total[name] = total.get(name, 0) + value
+        lines = []
+        metric(lines, 'foodgram_responses_total', 'counter',
+               'Ответы по маршруту, методу и статусу.', [
+                   ({'route': route, 'method': method,
+                     'status': status}, count)
+                   for (route, method, status), count
+                   in sorted(responses.items())
+               ])
+        lines.append('# HELP foodgram_request_seconds '
+                     'Длительность запроса по маршруту.')
+        lines.append('# TYPE foodgram_request_seconds histogram')
+        for route, values in sorted(routes.items()):
+            cumulative = 0
+            for bound, count in zip(
+                LATENCY_BUCKETS + ('+Inf',), values[ROUTE_FIELDS:]
+            ):
+                cumulative += count
+                lines.append(sample('foodgram_request_seconds_bucket', {
+                    'route': route, 'le': bound
+                }, cumulative))
+            lines.append(sample(
+                'foodgram_request_seconds_sum', {'route': route}, values[1]
+            ))
+            lines.append(sample(
+                'foodgram_request_seconds_count', {'route': route}, values[0]
+            ))
+        for name, index, kind, text in (
+            ('foodgram_sql_queries_total', 2, 'counter',
+             'Запросы SQL по маршруту.'),
+            ('foodgram_sql_seconds_total', 3, 'counter',
+             'Время в SQL по маршруту.'),
+            ('foodgram_serializer_seconds_total', 4, 'counter',
+             'Время в сериализаторах по маршруту.'),
+        ):
+            metric(lines, name, kind, text, [
+                ({'route': route}, values[index])
+                for route, values in sorted(routes.items())
+            ])
+        for name, key, kind, text in (
+            ('size', 'size', 'gauge', 'Размер пула соединений.'),
+            ('in_use', 'in_use', 'gauge', 'Соединений выдано.'),
+            ('idle', 'idle', 'gauge', 'Свободных соединений.'),
+            ('checkouts_total', 'checkouts', 'counter', 'Выдач соединений.'),
+            ('timeouts_total', 'timeouts', 'counter',
+             'Отказов по таймауту ожидания.'),
+            ('wait_seconds_total', 'wait_seconds_total', 'counter',
+             'Время ожидания соединений.'),
+        ):
+            metric(
+                lines,
+                'foodgram_db_pool_' + name,
+                kind,
+                text,
+                [
+                    ({'alias': alias}, stats.get(key, 0))
+                    for alias, stats in sorted(pools.items())
+                ]
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def process_start(pid):
+    """Время старта процесса в тактах с загрузки системы.
+
+    Берётся из /proc (Linux); где его нет - None, и процесс
+    узнаётся только по pid.
+    """
+    try:
+        with open('/proc/{}/stat'.format(pid)) as stream:
+            # Поле 22 stat, после имени процесса в скобках - 20-е.
+            return int(stream.read().rsplit(')', 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def process_alive(pid, start=None):
+    """Жив ли процесс снимка: тот же pid и, если известно, тот же старт."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return start is None or process_start(pid) in (None, start)
+
+
+def snapshot_name(snapshot):
+    return '{}-{}.json'.format(snapshot['pid'], snapshot['start'] or 0)
+
+
+def empty_snapshot():
+    """Снимок архива: только счётчики, без пулов соединений."""
+    return {'routes': {}, 'responses': [], 'pools': {}, 'folded': []}
+
+
+def add_counters(snapshots):
+    """Сумма счётчиков снимков по маршрутам и по ответам."""
+    routes, responses = {}, {}
+    for snapshot in snapshots:
+        for route, values in snapshot['routes'].items():
+            total = routes.setdefault(route, [0] * len(values))
+            for index, value in enumerate(values):
+                total[index] += value
+        for route, method, status, count in snapshot['responses']:
+            key = (route, method, status)
+            responses[key] = responses.get(key, 0) + count
+    return routes, responses
+
+
+def read_json(path):
+    try:
+        with open(path) as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json(path, data):
+    """Запись через временный файл: читатель не увидит половину."""
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as stream:
+        json.dump(data, stream)
+    os.replace(temporary, path)
+
+
+def sample(name, labels, value):
+    return '{}{{{}}} {}'.format(name, ','.join(
+        '{}="{}"'.format(key, str(label).replace('\\', '\\\\').replace(
+            '"', '\\"'
+        ))
+        for key, label in labels.items()
+    ), value)
+
+
+def metric(lines, name, kind, text, samples):
+    lines.append('# HELP {} {}'.format(name, text))
+    lines.append('# TYPE {} {}'.format(name, kind))
+    lines.extend(sample(name, labels, value) for labels, value in samples)
+
+
+registry = MetricsRegistry()
+
+
+def sql_timer(execute, sql, params, many, context):
+    """Обёртка execute соединения: число и время SQL текущего запроса."""
+    record = current_request.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.sql_count += 1
+        record.sql_seconds += time.perf_counter() - started
+
+
+def install_sql_timer(sender, connection, **kwargs):
+    """Подключает sql_timer к соединению (сигнал connection_created)."""
+    if sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(sql_timer)
+
+
+@contextlib.contextmanager
+def serializer_timer():
+    """Время блока идёт в счётчик сериализации текущего запроса.
+
+    Вложенные блоки не считаются дважды: учитывается только внешний.
+    """
+    record = current_request.get()
+    if record is None or record.serializing:
+        yield
+        return
+    record.serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.serializer_seconds += time.perf_counter() - started
+        record.serializing = False
+
+
+def serialized(serializer):
+    """serializer.data с учётом времени в метриках запроса."""
+    with serializer_timer():
+        return serializer.data
+
+
+class TimedSerializer:
+    """Обёртка сериализатора: .data считается в метриках запроса."""
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+
+    def __getattr__(self, name):
+        return getattr(self.serializer, name)
+
+    @property
+    def data(self):
+        return serialized(self.serializer)
+
+
+class SerializerTimingMixin:
+    """Время сериализации видов на GenericAPIView.
+
+    .data сериализаторов из get_serializer (в том числе в list,
+    retrieve и create) учитывается в метриках запроса.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        return TimedSerializer(super().get_serializer(*args, **kwargs))
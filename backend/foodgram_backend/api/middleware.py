@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from .metrics import RequestRecord, current_request, registry
+
+
+def route_name(request):
+    """Маршрут запроса: RecipesViewSet.list, DownloadShoppingCartView."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name or match.func.__name__
+    actions = getattr(match.func, 'actions', None)
+    if actions:
+        return '{}.{}'.format(
+            view_class.__name__,
+            actions.get(request.method.lower(), request.method.lower())
+        )
+    return view_class.__name__
+
+
+class MetricsMiddleware:
+    """Длительность, SQL и сериализация каждого запроса по маршрутам.
+
+    Работает и под WSGI, и под ASGI без перехода между потоками.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Так Django узнаёт асинхронный middleware (как MiddlewareMixin).
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.acall(request)
+        record = RequestRecord()
+        token = current_request.set(record)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.observe(request, response, started, record)
+        return response
+
+    async def acall(self, request):
+        record = RequestRecord()
+        token = current_request.set(record)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self.observe(request, response, started, record)
+        return response
+
+    @staticmethod
+    def observe(request, response, started, record):
+        registry.observe(
+            route_name(request),
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            record,
+        )
@@ -0,0 +1,56 @@
+import json
+
+from rest_framework.exceptions import NotFound
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Файл списка покупок. Ответы с ошибками отдаются как JSON текст."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class TxtRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class PrometheusRenderer(ShoppingListRenderer):
+    """Текстовый формат Prometheus; ошибки - JSON текст."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+
+
+class FormatParamNegotiation(BaseContentNegotiation):
+    """Выбор формата только по ?format=, заголовок Accept не учитывается."""
+    format_query_param = 'format'
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        export_format = request.query_params.get(self.format_query_param)
+        if not export_format:
+            return renderers[0], renderers[0].media_type
+        for renderer in renderers:
+            if renderer.format == export_format:
+                return renderer, renderer.media_type
+        raise NotFound(f'Формат {export_format} не поддерживается.')
@@ -1,24 +1,46 @@
 # flake8: noqa
+from collections import OrderedDict
+
 from drf_extra_fields.fields import Base64ImageField
 from django.contrib.auth.password_validation import validate_password
 from django.core import exceptions
+from django.db import transaction
+from django.db.models import Manager
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+    TokenVerifySerializer
+)
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
 
 from recipes.models import (
     Ingredients,
     RecipeIngredients,
     Recipes,
-    Tags
+    ShoppingCartIngredients,
+    Tags,
+    TagsRecipes
 )
-from users.models import Subscriptions, Users
+from users.models import DeniedTokens, Subscriptions, Users
 from recipes.configurations import (
     MIN_NUMBER,
     MAX_NUMBER,
     WITHDRAWAL_CALL_RECIPES,
-    AT_LEAST_ONE_INGREDIENT
+    AT_LEAST_ONE_INGREDIENT,
+    INGREDIENTS_DUPLICATE,
+    INGREDIENTS_NOT_FOUND,
+    RECIPES_BATCH_EMPTY,
+    RECIPES_BATCH_MAX
 )
+from .authentication import deny_list
+from .cache import invalidate_recipes, recipe_fragments
+from .catalog import tags_catalog
+from .ingredients_index import ingredients_index
 
 
 class UsersSerializer(serializers.ModelSerializer):
@@ -40,6 +62,8 @@ class UsersSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscriber'):
+            return obj.is_subscriber
         return request.user.subscriptions_subscriber.filter(
             id_writer=obj.id,
         ).exists()
@@ -97,6 +121,60 @@ class SetPasswordSerializer(serializers.Serializer):
         return super().validate(attrs)
 
 
+class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Пара JWT по почте и паролю, как вход по токену djoser."""
+    username_field = 'email'
+
+    def validate(self, attrs):
+        user = Users.objects.filter(email=attrs['email']).first()
+        if (
+            user is None
+            or not user.is_active
+            or not user.check_password(attrs['password'])
+        ):
+            raise serializers.ValidationError(
+                {'detail': ['Неверная почта или пароль.']}
+            )
+        refresh = self.get_token(user)
+        return {'refresh': str(refresh), 'access': str(refresh.access_token)}
+
+
+class DeniedRefreshSerializer(TokenRefreshSerializer):
+    """Новый токен доступа, если токен обновления не отозван."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if DeniedTokens.objects.filter(
+            jti=refresh[jwt_settings.JTI_CLAIM]
+        ).exists() or not Users.objects.filter(
+            pk=refresh[jwt_settings.USER_ID_CLAIM],
+            is_active=True,
+        ).exists():
+            raise InvalidToken('Токен отозван.')
+        return super().validate(attrs)
+
+
+class DeniedVerifySerializer(TokenVerifySerializer):
+    """Проверка подписи и срока токена с учётом отзыва."""
+
+    def validate(self, attrs):
+        token = UntypedToken(attrs['token'])
+        if token.get(jwt_settings.JTI_CLAIM) in deny_list:
+            raise InvalidToken('Токен отозван.')
+        return {}
+
+
+class TokenDenySerializer(serializers.Serializer):
+    """Токен обновления для отзыва."""
+    refresh = serializers.CharField()
+
+    def validate_refresh(self, value):
+        try:
+            return RefreshToken(value)
+        except TokenError as error:
+            raise serializers.ValidationError(str(error))
+
+
 class IngredientsSerializer(serializers.ModelSerializer):
     """Показ ингридиентов."""
     class Meta:
@@ -154,32 +232,115 @@ class RecipesSerializer(serializers.ModelSerializer):
         if len(value) < 1:
             raise serializers.ValidationError(
                 {'detail': [AT_LEAST_ONE_INGREDIENT]})
+        ids = [ingredient['id'] for ingredient in value]
+        duplicates = sorted({pk for pk in ids if ids.count(pk) > 1})
+        if duplicates:
+            raise serializers.ValidationError(
+                {'detail': [INGREDIENTS_DUPLICATE.format(
+                    ', '.join(map(str, duplicates))
+                )]})
+        found = set(
+            Ingredients.objects.filter(
+                pk__in=ids
+            ).order_by().values_list('pk', flat=True)
+        )
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                {'detail': [INGREDIENTS_NOT_FOUND.format(
+                    ', '.join(map(str, missing))
+                )]})
         return value
 
-    def RecordIngredients(self, recipes, ingredients_data):
-        RecipeIngredients.objects.bulk_create(
-            [RecipeIngredients(
-                id_recipe=recipes,
-                id_ingredient=get_object_or_404(
-                    Ingredients,
-                    pk=ingredient_data['id']
-                ),
-                amount=ingredient_data.get('amount'))
-                for ingredient_data in ingredients_data
-            ], batch_size=None)
+    def set_ingredients(self, recipe, ingredients_data):
+        """Записывает только разницу с текущим составом рицепта."""
+        wanted = {
+            ingredient['id']: ingredient.get('amount')
+            for ingredient in ingredients_data
+        }
+        current = {
+            row.id_ingredient_id: row
+            for row in RecipeIngredients.objects.filter(
+                id_recipe=recipe
+            ).order_by()
+        }
+        removed = [
+            row.pk for pk, row in current.items() if pk not in wanted
+        ]
+        added = [
+            RecipeIngredients(
+                id_recipe=recipe,
+                id_ingredient_id=pk,
+                amount=amount,
+            )
+            for pk, amount in wanted.items() if pk not in current
+        ]
+        changed = []
+        for pk, row in current.items():
+            if pk in wanted and row.amount != wanted[pk]:
+                row.amount = wanted[pk]
+                changed.append(row)
+        if not (removed or added or changed):
+            return
+        ShoppingCartIngredients.objects.apply_recipe(recipe.pk, -1)
+        if removed:
+            RecipeIngredients.objects.filter(pk__in=removed).delete()
+        if added:
+            RecipeIngredients.objects.bulk_create(added)
+        if changed:
+            RecipeIngredients.objects.bulk_update(changed, ['amount'])
+        ShoppingCartIngredients.objects.apply_recipe(recipe.pk, 1)
+
+    def set_tags(self, recipe, tags_data):
+        """Записывает только разницу с текущими тегами рицепта."""
+        wanted = {tag.pk for tag in tags_data}
+        current = set(
+            TagsRecipes.objects.filter(
+                id_recipe=recipe
+            ).order_by().values_list('id_teg_id', flat=True)
+        )
+        if current - wanted:
+            TagsRecipes.objects.filter(
+                id_recipe=recipe,
+                id_teg_id__in=current - wanted,
+            ).delete()
+        if wanted - current:
+            TagsRecipes.objects.bulk_create([
+                TagsRecipes(id_recipe=recipe, id_teg_id=pk)
+                for pk in wanted - current
+            ])
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         recipes = Recipes.objects.create(**validated_data)
-        recipes.tags.set(tags_data)
-        self.RecordIngredients(recipes, ingredients_data)
+        TagsRecipes.objects.bulk_create([
+            TagsRecipes(id_recipe=recipes, id_teg=tag)
+            for tag in set(tags_data)
+        ])
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(
+                id_recipe=recipes,
+                id_ingredient_id=ingredient['id'],
+                amount=ingredient.get('amount'),
+            )
+            for ingredient in ingredients_data
+        ])
+        invalidate_recipes([recipes.pk])
         return recipes
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        # Строка рицепта блокируется до конца транзакции: параллельные
+        # PATCH считают разницу состава по очереди, иначе оба добавили бы
+        # один ингридиент и второй упал бы на уникальности.
+        instance = get_object_or_404(
+            Recipes.objects.select_for_update(), pk=instance.pk
+        )
         instance.image = validated_data.get('image', instance.image)
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
@@ -187,41 +348,94 @@ class RecipesSerializer(serializers.ModelSerializer):
             'cooking_time',
             instance.cooking_time
         )
-        tags_data = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('ingredients')
-        instance.r_connection_i.filter(
-            id_ingredient__in=instance.ingredients.all()
-        ).delete()
-        instance.tags.set(tags_data)
-        self.RecordIngredients(instance, ingredients_data)
+        if 'tags' in validated_data:
+            self.set_tags(instance, validated_data.pop('tags'))
+        if 'ingredients' in validated_data:
+            self.set_ingredients(instance, validated_data.pop('ingredients'))
         instance.save()
+        invalidate_recipes([instance.pk])
         return instance
-    
 
-class RecipeIngredientsSerializer(serializers.ModelSerializer):
-    """Показ ингридиентов в рицепте."""
-    id = serializers.ReadOnlyField(source='id_ingredient.id')
-    name = serializers.ReadOnlyField(source='id_ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='id_ingredient.measurement_unit'
+
+def absolute_urls(request, urls):
+    return OrderedDict(
+        (variant, request.build_absolute_uri(url))
+        for variant, url in urls.items()
     )
 
-    class Meta:
-        model = RecipeIngredients
-        fields = ('id', 'name', 'measurement_unit', 'amount')
 
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на варианты картинки рицепта (thumbnail, card, full, webp)."""
 
-class RecipesListRetrieveSerializer(serializers.ModelSerializer):
-    """Для вывода рицепта."""
-    is_favorited = serializers.SerializerMethodField()
-    is_in_shopping_cart = serializers.SerializerMethodField()
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image_variants'
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        if not value or request is None:
+            return value
+        return absolute_urls(request, value)
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Общая для всех пользователей часть рицепта, хранится в кэше.
+
+    Теги и ингридиенты берутся из справочников в памяти процесса,
+    из базы нужны только строки связей (Recipes.objects.with_related).
+    """
     author = UsersSerializer()
-    tags = TagsSerializer(many=True)
+    tags = serializers.SerializerMethodField()
     ingredients = serializers.SerializerMethodField()
     image = Base64ImageField()
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipes
+        fields = (
+            'id',
+            'tags',
+            'author',
+            'ingredients',
+            'name',
+            'image',
+            'images',
+            'text',
+            'cooking_time',
+        )
+
+    def get_tags(self, obj):
+        return tags_catalog.for_recipe(
+            row.id_teg_id for row in obj.id_tr_recept.all()
+        )
+
+    def get_ingredients(self, obj):
+        return ingredients_index.for_recipe({
+            row.id_ingredient_id: row.amount
+            for row in obj.r_connection_i.all()
+        })
+
+
+class RecipesListSerializer(serializers.ListSerializer):
+    """Страница рицептов: фрагменты из кэша пачкой."""
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return self.child.to_representation_many(list(recipes))
+
+
+class RecipesListRetrieveSerializer(RecipeFragmentSerializer):
+    """Для вывода рицепта.
+
+    Общая часть берётся из кэша фрагментов, поверх неё
+    накладываются отметки текущего пользователя.
+    """
+    is_favorited = serializers.SerializerMethodField()
+    is_in_shopping_cart = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipes
+        list_serializer_class = RecipesListSerializer
         fields = (
             'id',
             'tags',
@@ -231,29 +445,87 @@ class RecipesListRetrieveSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'images',
             'text',
             'cooking_time',
         )
 
-    def get_ingredients(self, obj):
-        ingredients_recipe = obj.r_connection_i.filter()
-        serializer = RecipeIngredientsSerializer(
-            ingredients_recipe,
-            many=True,
-            read_only=True,
+    def to_representation(self, instance):
+        represented = self.to_representation_many([instance])
+        if represented:
+            return represented[0]
+        # Рицепт удалили, пока шёл запрос: собираем из самого объекта,
+        # мимо кэша.
+        return self.overlay(
+            RecipeFragmentSerializer().to_representation(instance), instance
         )
-        return serializer.data
+
+    def to_representation_many(self, recipes):
+        stamps, fragments = recipe_fragments.get_many(
+            [recipe.pk for recipe in recipes]
+        )
+        missing = [recipe.pk for recipe in recipes if recipe.pk not in fragments]
+        if missing:
+            rendered = {
+                recipe.pk: RecipeFragmentSerializer().to_representation(recipe)
+                for recipe in Recipes.objects.with_related().filter(
+                    pk__in=missing
+                )
+            }
+            recipe_fragments.set_many(rendered, stamps)
+            fragments.update(rendered)
+        return [
+            self.overlay(fragments[recipe.pk], recipe)
+            for recipe in recipes if recipe.pk in fragments
+        ]
+
+    def overlay(self, fragment, recipe):
+        """Накладывает на фрагмент данные текущего пользователя."""
+        request = self.context.get('request')
+        author = OrderedDict(fragment['author'])
+        author['is_subscriber'] = self.get_author_is_subscriber(recipe)
+        image = fragment['image']
+        images = fragment['images']
+        if image and request is not None:
+            image = request.build_absolute_uri(image)
+        if images and request is not None:
+            images = absolute_urls(request, images)
+        personal = {
+            'author': author,
+            'image': image,
+            'images': images,
+            'is_favorited': self.get_is_favorited(recipe),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe),
+        }
+        return OrderedDict(
+            (field, personal[field] if field in personal else fragment[field])
+            for field in self.Meta.fields
+        )
+
+    def get_author_is_subscriber(self, obj):
+        request = self.context.get('request')
+        if request is None or request.user.is_anonymous:
+            return False
+        if hasattr(obj, 'author_is_subscriber'):
+            return obj.author_is_subscriber
+        return UsersSerializer(
+            context=self.context
+        ).get_is_subscriber(obj.author)
 
     def get_is_favorited(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return obj.favorited_recipe.filter(id_user=request.user.id).exists()
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return obj.shoppinglist_recipe.filter(id_user=request.user.id).exists()
 
 
@@ -262,6 +534,7 @@ class RecipesReductionSerializer(serializers.Serializer):
     id = serializers.ReadOnlyField()
     name = serializers.ReadOnlyField()
     image = Base64ImageField(read_only=True)
+    images = ImageVariantsField()
     cooking_time = serializers.ReadOnlyField()
 
     class Meta:
@@ -270,10 +543,52 @@ class RecipesReductionSerializer(serializers.Serializer):
             'id',
             'name',
             'image',
+            'images',
             'cooking_time',
         )
 
 
+class RecipesBatchSerializer(serializers.Serializer):
+    """Пакетное добавление и удаление рицептов (избранное, корзина)."""
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=RECIPES_BATCH_MAX,
+        default=list,
+    )
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        max_length=RECIPES_BATCH_MAX,
+        default=list,
+    )
+
+    def validate(self, attrs):
+        if not attrs['add'] and not attrs['remove']:
+            raise serializers.ValidationError(
+                {'detail': [RECIPES_BATCH_EMPTY]}
+            )
+        attrs['add'] = list(dict.fromkeys(attrs['add']))
+        attrs['remove'] = list(dict.fromkeys(attrs['remove']))
+        return attrs
+
+
+class SubscriptionsListSerializer(serializers.ListSerializer):
+    """Страница подписок: рицепты всех авторов одним запросом."""
+
+    def to_representation(self, data):
+        subscriptions = list(data.all() if isinstance(data, Manager) else data)
+        recipes_by_author = {
+            subscription.id_writer_id: [] for subscription in subscriptions
+        }
+        if recipes_by_author:
+            for recipe in Recipes.objects.latest_per_author(
+                list(recipes_by_author),
+                self.child.get_recipes_limit()
+            ):
+                recipes_by_author[recipe.author_id].append(recipe)
+        self.child.recipes_by_author = recipes_by_author
+        return super().to_representation(subscriptions)
+
+
 class SubscriptionsSerializer(serializers.ModelSerializer):
     """Подписки пользователя."""
     email = serializers.ReadOnlyField(source='id_writer.email')
@@ -287,6 +602,7 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Subscriptions
+        list_serializer_class = SubscriptionsListSerializer
         fields = (
             'email',
             'id',
@@ -298,26 +614,40 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
             'recipes_count',
         )
 
+    def get_recipes_limit(self):
+        # Параметр запроса проверяет вид, см. api/views.py.
+        return self.context.get('recipes_limit', WITHDRAWAL_CALL_RECIPES)
+
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        return obj.id_subscriber.subscriptions_subscriber.filter(
-            id_writer=obj.id_writer
+        if obj.id_subscriber_id == request.user.id:
+            return True
+        return request.user.subscriptions_subscriber.filter(
+            id_writer=obj.id_writer_id
         ).exists()
-        
+
     def get_recipes(self, obj):
-        recipes = obj.id_writer.author_recipe.filter(
-            )[:WITHDRAWAL_CALL_RECIPES]
+        recipes_by_author = getattr(self, 'recipes_by_author', None)
+        if recipes_by_author is not None:
+            recipes = recipes_by_author.get(obj.id_writer_id, [])
+        else:
+            recipes = obj.id_writer.author_recipe.all()[
+                :self.get_recipes_limit()
+            ]
         serializer = RecipesReductionSerializer(
             recipes,
             many=True,
             read_only=True,
+            context=self.context,
         )
         return serializer.data
-    
+
     def get_recipes_count(self, obj):
-        return obj.id_writer.author_recipe.filter().count()
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.id_writer.author_recipe.count()
 
 
 class AddSubscriptionsSerializer(serializers.Serializer):
@@ -0,0 +1,104 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from recipes.configurations import SHOPPING_LIST_CHUNK_SIZE
+from recipes.models import ShoppingCartIngredients
+
+SHOPPING_LIST_TITLE = 'Список ингридиентов:'
+SHOPPING_LIST_HEADER = ('Ингридиент', 'Количество', 'Единица измерения')
+SHOPPING_LIST_FILENAME = 'Список_к_покупки_ингридиентов'
+
+
+def shopping_list_rows(user):
+    """Ингридиенты корзины (id, название, единица, сумма) по курсору."""
+    return ShoppingCartIngredients.objects.filter(
+        id_user=user
+    ).values_list(
+        'id_ingredient',
+        'id_ingredient__name',
+        'id_ingredient__measurement_unit',
+        'amount',
+    ).order_by(
+        'id_ingredient__name', 'id_ingredient'
+    ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+def chunked(lines, size=SHOPPING_LIST_CHUNK_SIZE):
+    """Склеивает строки в куски, чтобы не писать в сокет по строчке."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def render_txt(rows):
+    yield f'{SHOPPING_LIST_TITLE}\n\n'
+    yield from chunked(
+        f'{name}: {amount} {unit}\n' for _, name, unit, amount in rows
+    )
+
+
+class EchoBuffer:
+    """Файл-заглушка: csv.writer отдаёт строку, а не пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(SHOPPING_LIST_HEADER)
+    yield from chunked(
+        writer.writerow((name, amount, unit)) for _, name, unit, amount in rows
+    )
+
+
+def get_pdf_font():
+    """Шрифт с кириллицей, если он есть в системе, иначе Helvetica."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFError, TTFont
+
+    font_name = 'ShoppingListFont'
+    if font_name in pdfmetrics.getRegisteredFontNames():
+        return font_name
+    try:
+        pdfmetrics.registerFont(
+            TTFont(font_name, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    except TTFError:
+        return 'Helvetica'
+    return font_name
+
+
+def render_pdf(rows):
+    """PDF для печати. Собирается в памяти, поэтому отдаётся целиком."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
+    from reportlab.pdfgen import canvas
+
+    font = get_pdf_font()
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, invariant=1)
+    pdf.setTitle(SHOPPING_LIST_TITLE)
+    width, height = A4
+    margin = 20 * mm
+    line_height = 7 * mm
+    pdf.setFont(font, 16)
+    pdf.drawString(margin, height - margin, SHOPPING_LIST_TITLE)
+    y = height - margin - 2 * line_height
+    pdf.setFont(font, 12)
+    for _, name, unit, amount in rows:
+        if y < margin:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            y = height - margin
+        pdf.drawString(margin, y, f'□  {name}')
+        pdf.drawRightString(width - margin, y, f'{amount} {unit}')
+        y -= line_height
+    pdf.save()
+    return buffer.getvalue()
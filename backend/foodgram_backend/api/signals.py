@@ -0,0 +1,95 @@
+import functools
+
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from recipes.configurations import USERS_ACCESS_VERSION
+from recipes.images import images_ready
+from recipes.models import (DataVersions, Ingredients, RecipeIngredients,
+                            Recipes, Tags, TagsRecipes, relations_deleted)
+from users.models import Users
+
+from .authentication import active_users
+from .cache import invalidate_all_recipes, invalidate_recipes
+from .catalog import request_versions
+
+# Поля профиля, которые попадают во фрагмент рицепта.
+AUTHOR_FRAGMENT_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(images_ready)
+def recipe_images_ready(sender, recipe_ids, **kwargs):
+    invalidate_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=TagsRecipes)
+@receiver(post_save, sender=RecipeIngredients)
+def recipe_relation_changed(sender, instance, **kwargs):
+    if instance.id_recipe_id is not None:
+        invalidate_recipes([instance.id_recipe_id])
+
+
+@receiver(relations_deleted)
+def recipe_relations_deleted(sender, recipe_ids, **kwargs):
+    # Каскад от рицепта сюда не попадает: его сбрасывает recipe_changed.
+    invalidate_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=Tags)
+@receiver(pre_delete, sender=Tags)
+@receiver(post_save, sender=Ingredients)
+@receiver(pre_delete, sender=Ingredients)
+def catalog_changed(sender, instance, **kwargs):
+    invalidate_all_recipes()
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def catalog_version_changed(sender, instance, **kwargs):
+    # Справочник поменялся в этом запросе: снимок версий устарел.
+    request_versions.reset()
+
+
+@receiver(request_started)
+def request_begun(sender, **kwargs):
+    request_versions.start()
+
+
+@receiver(request_finished)
+def request_ended(sender, **kwargs):
+    request_versions.finish()
+
+
+@receiver(post_save, sender=Users)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not (
+        AUTHOR_FRAGMENT_FIELDS & set(update_fields)
+    ):
+        return
+    invalidate_recipes(
+        instance.author_recipe.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_save, sender=Users)
+@receiver(post_delete, sender=Users)
+def user_access_changed(sender, instance, created=False, update_fields=None,
+                        **kwargs):
+    """Свой процесс забывает пользователя сразу, остальные - по версии."""
+    if created or (
+        update_fields is not None and 'is_active' not in update_fields
+    ):
+        return
+    DataVersions.bump(USERS_ACCESS_VERSION)
+    transaction.on_commit(functools.partial(active_users.forget, instance.pk))
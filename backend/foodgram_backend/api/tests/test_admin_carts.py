@@ -0,0 +1,124 @@
+from django.test import TestCase
+from recipes.models import (Ingredients, RecipeIngredients, Recipes,
+                            ShoppingCartIngredients, ShoppingList)
+from users.models import Users
+
+ADMIN_URL = '/admin/recipes/{}/'
+
+
+class AdminCartTotalsTest(TestCase):
+    """Правки корзины и состава в админке доходят до сумм корзин."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Users.objects.create_superuser(
+            username='admin', email='admin@test.ru', password='p'
+        )
+        cls.buyer = Users.objects.create_user(
+            username='buyer', email='buyer@test.ru', password='p'
+        )
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name='Ингридиент {}'.format(number), measurement_unit='г'
+            )
+            for number in range(2)
+        ]
+        cls.recipes = [
+            Recipes.objects.create(
+                name='Рицепт {}'.format(number),
+                author=cls.admin,
+                text='Описание',
+                cooking_time=5,
+            )
+            for number in range(2)
+        ]
+        cls.rows = [
+            RecipeIngredients.objects.create(
+                id_recipe=recipe, id_ingredient=ingredient, amount=10
+            )
+            for recipe, ingredient in zip(cls.recipes, cls.ingredients)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assert_totals(self, totals):
+        self.assertEqual(dict(ShoppingCartIngredients.objects.filter(
+            id_user=self.buyer
+        ).values_list('id_ingredient', 'amount')), {
+            self.ingredients[number].pk: amount
+            for number, amount in totals.items()
+        })
+        self.assertEqual(
+            ShoppingCartIngredients.objects.expected(self.buyer.pk),
+            {
+                (self.buyer.pk, self.ingredients[number].pk): amount
+                for number, amount in totals.items()
+            },
+        )
+
+    def add_to_cart(self, recipe):
+        response = self.client.post(ADMIN_URL.format('shoppinglist/add'), {
+            'id_user': self.buyer.pk, 'id_recipe': recipe.pk
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def test_shopping_list_add_and_delete(self):
+        for recipe in self.recipes:
+            self.add_to_cart(recipe)
+        self.assert_totals({0: 10, 1: 10})
+        mark = ShoppingList.objects.get(id_recipe=self.recipes[0])
+        response = self.client.post(
+            ADMIN_URL.format('shoppinglist/{}/delete'.format(mark.pk)),
+            {'post': 'yes'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals({1: 10})
+        response = self.client.post(ADMIN_URL.format('shoppinglist'), {
+            'action': 'delete_selected',
+            '_selected_action': list(
+                ShoppingList.objects.values_list('pk', flat=True)
+            ),
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals({})
+        self.assertEqual(
+            Recipes.objects.get(pk=self.recipes[1].pk).in_carts_count, 0
+        )
+
+    def test_recipe_ingredients_list_editable(self):
+        self.add_to_cart(self.recipes[0])
+        row = self.rows[0]
+        response = self.client.post(ADMIN_URL.format('recipeingredients'), {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': row.pk,
+            'form-0-amount': 25,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals({0: 25})
+
+    def test_recipe_ingredients_change_and_delete(self):
+        self.add_to_cart(self.recipes[0])
+        self.add_to_cart(self.recipes[1])
+        row = self.rows[0]
+        # Строка переезжает во второй рицепт: меняются оба.
+        response = self.client.post(
+            ADMIN_URL.format('recipeingredients/{}/change'.format(row.pk)),
+            {
+                'id_recipe': self.recipes[1].pk,
+                'id_ingredient': self.ingredients[0].pk,
+                'amount': 5,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals({0: 5, 1: 10})
+        response = self.client.post(ADMIN_URL.format('recipeingredients'), {
+            'action': 'delete_selected',
+            '_selected_action': [row.pk],
+            'post': 'yes',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals({1: 10})
@@ -0,0 +1,139 @@
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from foodgram_backend.admin_tools import (EstimatedCountPaginator,
+                                          estimated_count, related_count)
+from recipes.models import (Favorited, Ingredients, RecipeIngredients, Recipes,
+                            ShoppingList, Tags)
+from users.models import Subscriptions, Users
+
+CHANGELISTS = (
+    'recipes/recipes',
+    'recipes/ingredients',
+    'recipes/tagsrecipes',
+    'recipes/recipeingredients',
+    'recipes/favorited',
+    'recipes/shoppinglist',
+    'users/users',
+    'users/subscriptions',
+)
+# Признак COUNT(*) в SQL Django.
+COUNT_ALIAS = '"__count"'
+
+
+class AdminChangelistTest(TestCase):
+    """Списки админки: запросов не больше с ростом таблиц, оценка строк."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Users.objects.create_superuser(
+            username='admin', email='admin@test.ru', password='p'
+        )
+        cls.tag = Tags.objects.create(
+            name='Завтрак', color='#000000', slug='breakfast'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, start, count):
+        """Автор с рицептом, его ингридиент и отметки админа."""
+        for number in range(start, start + count):
+            author = Users.objects.create_user(
+                username='author{}'.format(number),
+                email='author{}@test.ru'.format(number),
+                password='p',
+            )
+            recipe = Recipes.objects.create(
+                name='Рицепт {}'.format(number),
+                author=author,
+                text='Описание',
+                cooking_time=5,
+            )
+            recipe.tags.set([self.tag])
+            RecipeIngredients.objects.create(
+                id_recipe=recipe,
+                id_ingredient=Ingredients.objects.create(
+                    name='Ингридиент {}'.format(number),
+                    measurement_unit='г',
+                ),
+                amount=1,
+            )
+            Favorited.objects.create(id_user=self.admin, id_recipe=recipe)
+            ShoppingList.objects.create(id_user=self.admin, id_recipe=recipe)
+            Subscriptions.objects.create(
+                id_subscriber=self.admin, id_writer=author
+            )
+
+    def changelist(self, path, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/{}/'.format(path), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_queries_do_not_grow_with_rows(self):
+        self.add_rows(0, 2)
+        counts = {
+            path: len(self.changelist(path)[1]) for path in CHANGELISTS
+        }
+        self.add_rows(2, 6)
+        for path in CHANGELISTS:
+            with self.subTest(path=path):
+                self.assertEqual(len(self.changelist(path)[1]), counts[path])
+
+    def test_large_table_uses_estimate(self):
+        self.add_rows(0, 3)
+        estimate = EstimatedCountPaginator.exact_limit + 1
+        with mock.patch(
+            'foodgram_backend.admin_tools.estimated_count',
+            return_value=estimate,
+        ):
+            for path in CHANGELISTS:
+                with self.subTest(path=path):
+                    response, queries = self.changelist(path)
+                    self.assertEqual(
+                        response.context['cl'].result_count, estimate
+                    )
+                    self.assertFalse(any(
+                        COUNT_ALIAS in sql for sql in queries
+                    ))
+            # Отфильтрованный список считается точно.
+            response, queries = self.changelist(
+                'recipes/recipes', q='Рицепт 1'
+            )
+            self.assertEqual(response.context['cl'].result_count, 1)
+            self.assertTrue(any(COUNT_ALIAS in sql for sql in queries))
+
+    def test_small_table_counts_exactly(self):
+        self.add_rows(0, 3)
+        for estimate in (-1, EstimatedCountPaginator.exact_limit):
+            with self.subTest(estimate=estimate), mock.patch(
+                'foodgram_backend.admin_tools.estimated_count',
+                return_value=estimate,
+            ):
+                response = self.changelist('recipes/ingredients')[0]
+                self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_exact_count_skips_row_subqueries(self):
+        self.add_rows(0, 3)
+        ingredients = Ingredients.objects.annotate(
+            recipes_total=related_count(RecipeIngredients, 'id_ingredient')
+        ).filter(name__startswith='Ингридиент')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(EstimatedCountPaginator(ingredients, 2).count, 3)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn(
+            RecipeIngredients._meta.db_table, queries[0]['sql']
+        )
+        self.assertEqual(EstimatedCountPaginator([1, 2, 3], 2).count, 3)
+
+    @skipUnless(connection.vendor == 'postgresql', 'pg_class - в PostgreSQL')
+    def test_estimate_from_statistics(self):
+        self.add_rows(0, 5)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {}'.format(
+                connection.ops.quote_name(Recipes._meta.db_table)
+            ))
+        self.assertEqual(estimated_count(Recipes, 'default'), 5)
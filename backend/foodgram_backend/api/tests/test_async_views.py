@@ -0,0 +1,78 @@
+import asyncio
+import threading
+from unittest import mock
+
+from api.async_views import DatabaseThreads, async_view
+from api.shopping_list import shopping_list_rows
+from api.views import DownloadShoppingCartView
+from django.test import TransactionTestCase, override_settings
+from recipes.models import Ingredients, ShoppingCartIngredients
+from rest_framework.test import APIRequestFactory, force_authenticate
+from users.models import Users
+
+
+class DownloadStreamTest(TransactionTestCase):
+    """Выгрузка корзины под ASGI читается в потоке пула, а не в цикле."""
+
+    def setUp(self):
+        self.user = Users.objects.create_user(
+            username='buyer', email='buyer@test.ru', password='p'
+        )
+        for number in range(3):
+            ShoppingCartIngredients.objects.create(
+                id_user=self.user,
+                id_ingredient=Ingredients.objects.create(
+                    name='Ингридиент {}'.format(number), measurement_unit='г'
+                ),
+                amount=number + 1,
+            )
+        # Поток, в котором читается каждая строка корзины.
+        self.threads = []
+
+        def rows(user):
+            for row in shopping_list_rows(user):
+                self.threads.append(threading.current_thread().name)
+                yield row
+
+        patcher = mock.patch('api.views.shopping_list_rows', rows)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self):
+        request = APIRequestFactory().get(
+            '/api/recipes/download_shopping_cart/', {'format': 'txt'}
+        )
+        force_authenticate(request, self.user)
+        return request
+
+    def assert_content(self, response, content, downloads=1):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Ингридиент 2: 3 г'.encode(), content)
+        self.assertEqual(len(self.threads), 3 * downloads)
+        self.assertTrue(all(
+            name.startswith('database') for name in self.threads
+        ))
+
+    def test_body_is_read_by_pool_thread(self):
+        view = async_view(DownloadShoppingCartView.as_view())
+        response = asyncio.run(view(self.request()))
+        self.assert_content(response, b''.join(response))
+
+    @override_settings(ASYNC_DB_THREADS=1)
+    def test_concurrent_downloads_share_one_thread(self):
+        view = async_view(DownloadShoppingCartView.as_view())
+
+        async def download_all():
+            # Тело первого ответа ещё не отправлено, а поток уже свободен.
+            first = await view(self.request())
+            others = await asyncio.wait_for(asyncio.gather(
+                *(view(self.request()) for _ in range(3))
+            ), timeout=10)
+            return [first, *others]
+
+        with mock.patch('api.async_views.database_threads',
+                        DatabaseThreads()):
+            responses = asyncio.run(download_all())
+        contents = [b''.join(response) for response in responses]
+        self.assertEqual(len(set(contents)), 1)
+        self.assert_content(responses[0], contents[0], downloads=4)
@@ -0,0 +1,84 @@
+from api.authentication import active_users, deny_list
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from users.models import Users
+
+ME_URL = '/api/users/me/'
+
+
+class JWTAuthenticationTest(TestCase):
+    """Вход по JWT: отзыв токенов и удалённые или отключённые."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(
+            username='reader', email='reader@test.ru', password='password'
+        )
+
+    def setUp(self):
+        cache.clear()
+        deny_list.loaded = None
+        active_users.checked = {}
+        self.client = APIClient()
+        tokens = self.client.post(
+            '/api/auth/jwt/create/',
+            {'email': 'reader@test.ru', 'password': 'password'},
+        ).data
+        self.refresh = tokens['refresh']
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Bearer {}'.format(tokens['access'])
+        )
+
+    def test_access_token(self):
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.user.pk)
+
+    def test_logout_denies_both_tokens(self):
+        response = self.client.post(
+            '/api/auth/jwt/logout/', {'refresh': self.refresh}
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+        # Другой процесс узнаёт об отзыве из базы.
+        deny_list.loaded = None
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+        response = APIClient().post(
+            '/api/auth/jwt/refresh/', {'refresh': self.refresh}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_inactive_user_is_rejected(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['is_active'])
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['code'], 'user_inactive')
+
+    def test_deleted_user_is_rejected(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            Users.objects.filter(pk=self.user.pk).delete()
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
+        self.assertEqual(
+            self.client.get('/api/users/subscriptions/').status_code, 401
+        )
+
+    def test_user_check_is_cached(self):
+        self.client.get(ME_URL)
+        with self.assertNumQueries(1):
+            # Только сам профиль: владелец токена - из кэша.
+            self.client.get(ME_URL)
+
+    def test_other_process_learns_of_deactivation_by_polling(self):
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        # Фиксации нет: свой процесс не забывает, как и чужой воркер.
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+        # Следующий опрос списка отзыва видит новую версию.
+        deny_list.loaded = None
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
@@ -0,0 +1,100 @@
+from api.catalog import TagsCatalog, request_versions, tags_catalog
+from api.ingredients_index import ingredients_index
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.configurations import INGREDIENTS_VERSION, TAGS_VERSION
+from recipes.models import DataVersions, Tags
+from rest_framework.test import APIClient
+
+# Тёплый справочник: только чтение счётчиков версий.
+WARM_QUERIES = 1
+
+
+class TagsCatalogTest(TestCase):
+    """Теги из памяти процесса: чтение без базы и сброс по версии."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.breakfast = Tags.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'
+        )
+        cls.lunch = Tags.objects.create(
+            name='Обед', color='#49B64E', slug='lunch'
+        )
+
+    def setUp(self):
+        cache.clear()
+        tags_catalog.version = None
+        ingredients_index.version = None
+        self.client = APIClient()
+
+    def slugs(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        return [row['slug'] for row in response.data]
+
+    def expected(self):
+        return list(Tags.objects.values_list('slug', flat=True))
+
+    def test_warm_catalog_reads_only_versions(self):
+        # Порядок - как у модели (по убыванию slug).
+        self.assertEqual(self.slugs(), ['lunch', 'breakfast'])
+        with self.assertNumQueries(WARM_QUERIES):
+            self.assertEqual(self.slugs(), ['lunch', 'breakfast'])
+        with self.assertNumQueries(WARM_QUERIES):
+            response = self.client.get(
+                '/api/tags/{}/'.format(self.lunch.pk)
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {
+            'id': self.lunch.pk,
+            'name': 'Обед',
+            'color': '#49B64E',
+            'slug': 'lunch',
+        })
+
+    def test_unknown_tag_is_404(self):
+        for pk in (self.lunch.pk + 100, 'abc'):
+            with self.subTest(pk=pk):
+                response = self.client.get('/api/tags/{}/'.format(pk))
+                self.assertEqual(response.status_code, 404)
+
+    def test_changes_are_picked_up(self):
+        self.assertEqual(self.slugs(), self.expected())
+        dinner = Tags.objects.create(
+            name='Ужин', color='#8775D2', slug='dinner'
+        )
+        self.assertEqual(self.slugs(), ['lunch', 'dinner', 'breakfast'])
+        self.lunch.name = 'Второй завтрак'
+        self.lunch.save()
+        response = self.client.get('/api/tags/{}/'.format(self.lunch.pk))
+        self.assertEqual(response.data['name'], 'Второй завтрак')
+        dinner.delete()
+        self.assertEqual(self.slugs(), self.expected())
+
+    def test_other_process_waits_for_version(self):
+        # Справочник другого процесса: правка мимо сигналов
+        # видна только после подъёма версии.
+        other = TagsCatalog()
+        self.assertEqual(other.get_slug('lunch')['name'], 'Обед')
+        Tags.objects.filter(pk=self.lunch.pk).update(name='Полдник')
+        self.assertEqual(other.get_slug('lunch')['name'], 'Обед')
+        DataVersions.bump(TAGS_VERSION)
+        self.assertEqual(other.get_slug('lunch')['name'], 'Полдник')
+
+    def test_versions_are_read_once_per_request(self):
+        request_versions.start()
+        self.addCleanup(request_versions.finish)
+        with self.assertNumQueries(1):
+            request_versions.get_value(TAGS_VERSION)
+            request_versions.get_value(INGREDIENTS_VERSION)
+        tags_catalog.all()
+        # Тег добавлен другим процессом после снимка (мимо сигналов):
+        # промах по id перечитывает версию.
+        Tags.objects.bulk_create([
+            Tags(name='Ужин', color='#8775D2', slug='dinner')
+        ])
+        dinner = Tags.objects.get(slug='dinner')
+        DataVersions.bump(TAGS_VERSION)
+        self.assertIsNone(tags_catalog.by_id.get(dinner.pk))
+        self.assertEqual(tags_catalog.get(dinner.pk)['slug'], 'dinner')
@@ -0,0 +1,92 @@
+from api.catalog import tags_catalog
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.configurations import TAGS_VERSION
+from recipes.models import DataVersions, Recipes, Tags
+from rest_framework.test import APIClient
+from users.models import Users
+
+FUTURE = 'Fri, 01 Jan 2100 00:00:00 GMT'
+
+
+class DataVersionsBumpTest(TestCase):
+    """Счётчики версий поднимаются одним запросом без потерь."""
+
+    def test_first_bump_creates_and_next_increments(self):
+        DataVersions.bump('first')
+        DataVersions.bump('first')
+        self.assertEqual(DataVersions.get_value('first'), 2)
+
+    def test_many_names_in_one_query(self):
+        DataVersions.bump('left')
+        with self.assertNumQueries(1):
+            DataVersions.bump('left', 'right', 'left')
+        self.assertEqual(DataVersions.get_value('left'), 2)
+        self.assertEqual(DataVersions.get_value('right'), 1)
+
+
+class ConditionalGetTest(TestCase):
+    """304 по ETag: общий для справочников, свой у каждого пользователя."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = Users.objects.create_user(
+            username='reader', email='reader@test.ru', password='p'
+        )
+        cls.other = Users.objects.create_user(
+            username='other', email='other@test.ru', password='p'
+        )
+        Tags.objects.create(name='Завтрак', color='#000000', slug='breakfast')
+        cls.recipe = Recipes.objects.create(
+            name='Рицепт', author=cls.other, text='Описание', cooking_time=5
+        )
+
+    def setUp(self):
+        cache.clear()
+        tags_catalog.version = None
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            client.force_authenticate(user)
+        return client
+
+    def test_tags_etag_without_last_modified(self):
+        client = self.client_for()
+        response = client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Без Last-Modified дата сама по себе 304 не даёт.
+        response = client.get('/api/tags/', HTTP_IF_MODIFIED_SINCE=FUTURE)
+        self.assertEqual(response.status_code, 200)
+
+    def test_tags_etag_changes_with_catalog(self):
+        client = self.client_for()
+        etag = client.get('/api/tags/')['ETag']
+        version = DataVersions.get_value(TAGS_VERSION)
+        Tags.objects.create(name='Ужин', color='#111111', slug='dinner')
+        self.assertEqual(DataVersions.get_value(TAGS_VERSION), version + 1)
+        response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_recipes_etag_is_per_user(self):
+        reader = self.client_for(self.reader)
+        other = self.client_for(self.other)
+        reader_etag = reader.get('/api/recipes/')['ETag']
+        other_etag = other.get('/api/recipes/')['ETag']
+        self.assertNotEqual(reader_etag, other_etag)
+        response = reader.post(
+            '/api/recipes/{}/favorite/'.format(self.recipe.pk)
+        )
+        self.assertEqual(response.status_code, 201)
+        # Отметка меняет ответ только тому, кто её поставил.
+        response = reader.get('/api/recipes/', HTTP_IF_NONE_MATCH=reader_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['is_favorited'])
+        response = other.get('/api/recipes/', HTTP_IF_NONE_MATCH=other_etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Authorization', response['Vary'])
@@ -0,0 +1,140 @@
+from unittest import mock
+
+from api.cookable_index import CookableIndex
+from django.db.models import Count, F, Q
+from django.test import TestCase
+from recipes.models import Ingredients, RecipeIngredients, Recipes, Tags
+from rest_framework.test import APIClient
+from users.models import Users
+
+
+class CookableIndexTest(TestCase):
+    """Индекс в памяти ранжирует так же, как запрос к базе."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        cls.tag = Tags.objects.create(
+            name='Завтрак', color='#000000', slug='breakfast'
+        )
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name='Ингридиент {}'.format(number), measurement_unit='г'
+            )
+            for number in range(6)
+        ]
+        # Рицепт i - ингридиенты с i по 2 * i.
+        for number in range(3):
+            cls.create_recipe(number, range(number, 2 * number + 1))
+
+    @classmethod
+    def create_recipe(cls, number, ingredients):
+        recipe = Recipes.objects.create(
+            name='Рицепт {}'.format(number),
+            author=cls.author,
+            text='Описание',
+            cooking_time=5,
+        )
+        for ingredient in ingredients:
+            RecipeIngredients.objects.create(
+                id_recipe=recipe,
+                id_ingredient=cls.ingredients[ingredient],
+                amount=1,
+            )
+        return recipe
+
+    def setUp(self):
+        self.index = CookableIndex()
+        patcher = mock.patch('api.cookable_index.COOKABLE_CHECK_EVERY', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def ids(self, *numbers):
+        return [self.ingredients[number].pk for number in numbers]
+
+    def sql_ranking(self, ingredient_ids, max_missing=None):
+        recipes = Recipes.objects.annotate(
+            matched=Count('r_connection_i', filter=Q(
+                r_connection_i__id_ingredient__in=ingredient_ids
+            )),
+            required=Count('r_connection_i'),
+        ).annotate(missing=F('required') - F('matched')).filter(matched__gt=0)
+        if max_missing is not None:
+            recipes = recipes.filter(missing__lte=max_missing)
+        return list(recipes.order_by('missing', '-matched', '-id').values_list(
+            'id', 'matched', 'missing'
+        ))
+
+    def assert_rankings(self):
+        for ingredient_ids in (
+            self.ids(0), self.ids(1, 2), self.ids(0, 1, 2, 3, 4, 5),
+            self.ids(4), self.ids(5, 3),
+        ):
+            for max_missing in (None, 0, 1):
+                with self.subTest(
+                    ingredients=ingredient_ids, max_missing=max_missing
+                ):
+                    self.assertEqual(
+                        self.index.cookable(ingredient_ids, max_missing),
+                        self.sql_ranking(ingredient_ids, max_missing),
+                    )
+
+    def payload(self, *numbers):
+        return {
+            'ingredients': [
+                {'id': pk, 'amount': 2} for pk in self.ids(*numbers)
+            ],
+            'tags': [self.tag.pk],
+        }
+
+    def test_ranking_after_create_update_delete(self):
+        self.assert_rankings()
+        recipe = self.create_recipe(3, [5, 1])
+        self.assert_rankings()
+        for recipe in (recipe, Recipes.objects.get(name='Рицепт 2')):
+            response = self.client.patch(
+                '/api/recipes/{}/'.format(recipe.pk),
+                self.payload(1, 3, 4),
+                format='json',
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assert_rankings()
+        response = self.client.delete('/api/recipes/{}/'.format(recipe.pk))
+        self.assertEqual(response.status_code, 204)
+        self.assert_rankings()
+        self.ingredients[1].delete()
+        self.assert_rankings()
+        self.assertEqual(
+            {
+                recipe_id: list(ingredients)
+                for recipe_id, ingredients in self.index.compositions.items()
+            },
+            {
+                recipe.pk: sorted(recipe.r_connection_i.values_list(
+                    'id_ingredient', flat=True
+                ))
+                for recipe in Recipes.objects.filter(
+                    r_connection_i__isnull=False
+                ).distinct()
+            },
+        )
+
+    def test_unchanged_journal_is_checked_without_lock(self):
+        self.index.ensure_fresh()
+        self.index.lock = mock.MagicMock()
+        with self.assertNumQueries(1):
+            self.index.ensure_fresh()
+        self.assertFalse(self.index.lock.__enter__.called)
+        self.create_recipe(3, [0])
+        self.index.ensure_fresh()
+        self.assertTrue(self.index.lock.__enter__.called)
+
+    def test_journal_is_read_at_most_every_few_seconds(self):
+        with mock.patch('api.cookable_index.COOKABLE_CHECK_EVERY', 60):
+            self.index.ensure_fresh()
+            with self.assertNumQueries(0):
+                self.index.ensure_fresh()
@@ -0,0 +1,123 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.configurations import USER_MARKS_VERSION
+from recipes.models import DataVersions, Favorited, Recipes, ShoppingList
+from rest_framework import status
+from rest_framework.test import APIClient
+from users.models import Users
+
+
+class RecipeCountersTest(TestCase):
+    """Счётчики избранного и корзины у рицептов и ordering=popular."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        cls.readers = [
+            Users.objects.create_user(
+                username='reader{}'.format(number),
+                email='reader{}@test.ru'.format(number),
+                password='p',
+            )
+            for number in range(3)
+        ]
+        cls.recipes = [
+            Recipes.objects.create(
+                name='Рицепт {}'.format(number),
+                author=cls.author,
+                text='Описание',
+                cooking_time=5,
+            )
+            for number in range(3)
+        ]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def mark_all(self, url):
+        """Рицепт i отмечают первые i + 1 читателей."""
+        for number, recipe in enumerate(self.recipes):
+            for reader in self.readers[:number + 1]:
+                response = self.client_for(reader).post(
+                    '/api/recipes/{}/{}/'.format(recipe.pk, url)
+                )
+                self.assertTrue(status.is_success(response.status_code))
+
+    def counters(self, field):
+        return [
+            getattr(Recipes.objects.get(pk=recipe.pk), field)
+            for recipe in self.recipes
+        ]
+
+    def test_add_and_remove_via_api(self):
+        for url, field in (
+            ('favorite', 'favorites_count'),
+            ('shopping_cart', 'in_carts_count'),
+        ):
+            with self.subTest(url=url):
+                self.mark_all(url)
+                self.assertEqual(self.counters(field), [1, 2, 3])
+                response = self.client_for(self.readers[0]).delete(
+                    '/api/recipes/{}/{}/'.format(self.recipes[2].pk, url)
+                )
+                self.assertEqual(response.status_code, 204)
+                self.assertEqual(self.counters(field), [1, 2, 2])
+
+    def test_user_delete_releases_counters(self):
+        self.mark_all('favorite')
+        self.mark_all('shopping_cart')
+        self.readers[2].delete()
+        self.assertEqual(self.counters('favorites_count'), [1, 2, 2])
+        self.assertEqual(self.counters('in_carts_count'), [1, 2, 2])
+        self.assertFalse(Recipes.objects.counters_drift())
+
+    def test_recipe_delete_bumps_each_user_once(self):
+        self.mark_all('favorite')
+        self.mark_all('shopping_cart')
+        names = [
+            USER_MARKS_VERSION.format(reader.pk) for reader in self.readers
+        ]
+        before = [DataVersions.get_value(name) for name in names]
+        self.recipes[2].delete()
+        self.assertEqual(
+            [DataVersions.get_value(name) for name in names],
+            [version + 1 for version in before],
+        )
+        self.assertFalse(Favorited.objects.filter(
+            id_recipe=self.recipes[2].pk
+        ).exists())
+
+    def test_cascade_cost_does_not_depend_on_marks(self):
+        self.mark_all('favorite')
+        self.mark_all('shopping_cart')
+        queries = []
+        for recipe in (self.recipes[0], self.recipes[2]):
+            recipe = Recipes.objects.get(pk=recipe.pk)
+            with CaptureQueriesContext(connection) as context:
+                recipe.delete()
+            queries.append(len(context.captured_queries))
+        # Одна отметка или три - отметки уходят быстрым удалением.
+        self.assertEqual(queries[0], queries[1])
+
+    def test_queryset_delete(self):
+        self.mark_all('favorite')
+        Favorited.objects.filter(id_user__in=self.readers[1:]).delete()
+        self.assertEqual(self.counters('favorites_count'), [1, 1, 1])
+        ShoppingList.objects.none().delete()
+        self.assertFalse(Recipes.objects.counters_drift())
+
+    def test_popular_ordering(self):
+        self.mark_all('favorite')
+        response = self.client_for(self.author).get(
+            '/api/recipes/', {'ordering': 'popular'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipe.pk for recipe in reversed(self.recipes)],
+        )
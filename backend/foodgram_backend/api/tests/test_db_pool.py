@@ -0,0 +1,197 @@
+import threading
+import time
+from unittest import mock
+
+import psycopg2
+from django.db import OperationalError
+from django.test import RequestFactory, SimpleTestCase
+from foodgram_backend.postgresql_pool.middleware import (
+    RETRY_AFTER, PoolExhaustedMiddleware)
+from foodgram_backend.postgresql_pool.pool import ConnectionPool, PoolExhausted
+from psycopg2 import extensions
+
+
+class FakeCursor:
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql):
+        if not self.connection.healthy:
+            raise psycopg2.OperationalError('server closed the connection')
+        self.connection.queries.append(sql)
+
+
+class FakeConnection:
+    """Соединение psycopg2 без сервера: статус задаёт тест."""
+
+    def __init__(self, number):
+        self.number = number
+        self.closed = 0
+        self.healthy = True
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.queries = []
+        self.rollbacks = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    """Пул соединений на фабрике поддельных соединений."""
+
+    def setUp(self):
+        self.connections = []
+        self.now = 1000.0
+
+    def connect(self):
+        connection = FakeConnection(len(self.connections))
+        self.connections.append(connection)
+        return connection
+
+    def make_pool(self, size=1, timeout=1.0, max_age=1800, check_after=30):
+        return ConnectionPool(
+            size=size, timeout=timeout, max_age=max_age,
+            check_after=check_after,
+        )
+
+    def frozen_clock(self):
+        """Часы пула стоят на self.now, тест двигает их сам."""
+        clock = mock.patch(
+            'foodgram_backend.postgresql_pool.pool.time',
+            mock.Mock(monotonic=lambda: self.now),
+        )
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_waiters_are_served_in_order(self):
+        pool = self.make_pool()
+        held = pool.acquire(self.connect)
+        order = []
+
+        def wait_turn(name):
+            connection = pool.acquire(self.connect)
+            order.append(name)
+            pool.release(connection)
+
+        threads = []
+        for name in ('first', 'second', 'third'):
+            thread = threading.Thread(target=wait_turn, args=(name,))
+            thread.start()
+            threads.append(thread)
+            # Следующий встаёт в очередь, только когда этот уже в ней.
+            deadline = time.monotonic() + 5
+            while len(pool.waiters) < len(threads):
+                self.assertLess(time.monotonic(), deadline)
+                time.sleep(0.001)
+        pool.release(held)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(order, ['first', 'second', 'third'])
+        # Все получали одно и то же свободное соединение.
+        self.assertEqual(len(self.connections), 1)
+        stats = pool.stats()
+        self.assertEqual(stats['checkouts'], 4)
+        self.assertEqual(stats['in_use'], 0)
+        self.assertEqual(stats['idle'], 1)
+
+    def test_timeout_is_503(self):
+        pool = self.make_pool(timeout=0.05)
+        held = pool.acquire(self.connect)
+        with self.assertRaises(PoolExhausted):
+            pool.acquire(self.connect)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        self.assertFalse(pool.waiters)
+        # Как обёртка ошибок драйвера в Django: причина - PoolExhausted.
+        try:
+            pool.acquire(self.connect)
+        except PoolExhausted as error:
+            exception = OperationalError(*error.args)
+            exception.__cause__ = error
+        response = PoolExhaustedMiddleware(
+            lambda request: None
+        ).process_exception(RequestFactory().get('/api/recipes/'), exception)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(RETRY_AFTER))
+        pool.release(held)
+        self.assertIs(pool.acquire(self.connect), held)
+
+    def test_failed_connect_frees_slot(self):
+        pool = self.make_pool(timeout=0.05)
+
+        def refuse():
+            raise psycopg2.OperationalError('connection refused')
+
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.acquire(refuse)
+        self.assertEqual(pool.stats()['in_use'], 0)
+        pool.acquire(self.connect)
+
+    def test_release_resets_connection(self):
+        pool = self.make_pool()
+        connection = pool.acquire(self.connect)
+        connection.status = extensions.TRANSACTION_STATUS_INTRANS
+        pool.release(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertIs(pool.acquire(self.connect), connection)
+        connection.status = extensions.TRANSACTION_STATUS_UNKNOWN
+        pool.release(connection)
+        self.assertEqual(connection.closed, 1)
+        replacement = pool.acquire(self.connect)
+        self.assertIsNot(replacement, connection)
+        replacement.close()
+        pool.release(replacement)
+        self.assertEqual(pool.stats()['idle'], 0)
+        self.assertEqual(pool.stats()['discarded'], 2)
+
+    def test_health_check_after_idle_time(self):
+        self.frozen_clock()
+        pool = self.make_pool(check_after=30)
+        connection = pool.acquire(self.connect)
+        pool.release(connection)
+        self.now += 29
+        self.assertIs(pool.acquire(self.connect), connection)
+        self.assertEqual(connection.queries, [])
+        pool.release(connection)
+        self.now += 31
+        self.assertIs(pool.acquire(self.connect), connection)
+        self.assertEqual(connection.queries, ['SELECT 1'])
+        pool.release(connection)
+        self.now += 31
+        connection.healthy = False
+        replacement = pool.acquire(self.connect)
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(connection.closed, 1)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_old_connections_are_recycled(self):
+        self.frozen_clock()
+        pool = self.make_pool(max_age=1800, check_after=30)
+        connection = pool.acquire(self.connect)
+        self.now += 1000
+        pool.release(connection)
+        self.assertIs(pool.acquire(self.connect), connection)
+        self.now += 801
+        pool.release(connection)
+        replacement = pool.acquire(self.connect)
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(connection.closed, 1)
+        # Старое закрывается без проверки SELECT 1.
+        self.assertEqual(connection.queries, [])
+        self.assertEqual(pool.stats()['created'], 2)
@@ -0,0 +1,130 @@
+import io
+
+from django.core.management import CommandError, call_command
+from django.db.models import F, Q
+from django.test import TestCase
+from recipes.configurations import (INGREDIENTS_VERSION, RECIPES_VERSION,
+                                    TAGS_VERSION)
+from recipes.models import (DataVersions, Favorited, Ingredients, Recipes,
+                            ShoppingList, Tags)
+from users.models import Subscriptions, Users
+
+SIZES = {
+    'users': 6,
+    'tags': 3,
+    'ingredients': 10,
+    'recipes': 20,
+    'recipe-ingredients': 3,
+    'recipe-tags': 2,
+    'favorites': 3,
+    'carts': 2,
+    'subscriptions': 2,
+}
+
+
+class GenerateDataTest(TestCase):
+    """generate-data: размеры, воспроизводимость по seed и проверки."""
+
+    def generate(self, seed=1, **sizes):
+        options = {**SIZES, 'seed': seed, 'batch-size': 7, **sizes}
+        args = []
+        for name, value in options.items():
+            args += ['--{}'.format(name), str(value)]
+        call_command('generate-data', *args, stdout=io.StringIO())
+
+    def snapshot(self):
+        """Набор без id: у повторного прогона id другие."""
+        recipes = sorted(
+            (
+                recipe.name, recipe.author.username, recipe.cooking_time,
+                recipe.pub_date,
+                sorted(tag.slug for tag in recipe.tags.all()),
+                sorted(
+                    (row.id_ingredient.name, row.amount)
+                    for row in recipe.r_connection_i.all()
+                ),
+            )
+            for recipe in Recipes.objects.select_related('author')
+        )
+        marks = [
+            sorted(model.objects.values_list(
+                'id_user__username', 'id_recipe__name'
+            ))
+            for model in (Favorited, ShoppingList)
+        ]
+        subscriptions = sorted(Subscriptions.objects.values_list(
+            'id_subscriber__username', 'id_writer__username'
+        ))
+        return recipes, marks, subscriptions
+
+    def clear(self):
+        Users.objects.all().delete()
+        Tags.objects.all().delete()
+        Ingredients.objects.all().delete()
+
+    def test_sizes_and_consistency(self):
+        versions = DataVersions.get_many(
+            [TAGS_VERSION, INGREDIENTS_VERSION, RECIPES_VERSION]
+        )
+        self.generate()
+        self.assertEqual(Users.objects.count(), SIZES['users'])
+        self.assertEqual(Tags.objects.count(), SIZES['tags'])
+        self.assertEqual(Ingredients.objects.count(), SIZES['ingredients'])
+        self.assertEqual(Recipes.objects.count(), SIZES['recipes'])
+        self.assertTrue(Users.objects.get(username='bench-0').is_staff)
+        # У каждого рицепта есть теги и состав.
+        self.assertFalse(Recipes.objects.filter(
+            Q(id_tr_recept__isnull=True) | Q(r_connection_i__isnull=True)
+        ).exists())
+        self.assertFalse(Subscriptions.objects.filter(
+            id_subscriber=F('id_writer')
+        ).exists())
+        # Счётчики сведены с отметками.
+        for recipe in Recipes.objects.all():
+            self.assertEqual(
+                recipe.favorites_count,
+                Favorited.objects.filter(id_recipe=recipe).count(),
+            )
+            self.assertEqual(
+                recipe.in_carts_count,
+                ShoppingList.objects.filter(id_recipe=recipe).count(),
+            )
+        new_versions = DataVersions.get_many(
+            [TAGS_VERSION, INGREDIENTS_VERSION, RECIPES_VERSION]
+        )
+        for name in (TAGS_VERSION, INGREDIENTS_VERSION, RECIPES_VERSION):
+            self.assertEqual(
+                new_versions[name][0], versions.get(name, (0, None))[0] + 1
+            )
+        # Последовательности id сдвинуты за записанные строки.
+        author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        Recipes.objects.create(
+            name='Рицепт', author=author, text='Описание', cooking_time=5
+        )
+        Tags.objects.create(name='Тег', color='#000000', slug='tag')
+        Ingredients.objects.create(name='Соль', measurement_unit='г')
+
+    def test_same_seed_same_data(self):
+        self.generate(seed=3)
+        first = self.snapshot()
+        self.clear()
+        self.generate(seed=3)
+        self.assertEqual(self.snapshot(), first)
+        self.clear()
+        self.generate(seed=4)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_refuses_existing_set_and_bad_options(self):
+        self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
+        self.clear()
+        for options in (
+            {'scale': 0}, {'skew': -1}, {'batch-size': 0}, {'recipes': -1},
+        ):
+            with self.subTest(options=options):
+                with self.assertRaises(CommandError):
+                    self.generate(**options)
+        self.assertFalse(Users.objects.exists())
@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import io
+import os
+import tempfile
+
+from api.cache import recipe_fragments
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from recipes.configurations import RECIPE_IMAGE_DIR, RECIPE_IMAGE_VARIANTS
+from recipes.images import content_storage, variant_name, variant_urls
+from recipes.models import Ingredients, Recipes, Tags
+from rest_framework.test import APIClient
+from users.models import Users
+
+
+def png_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (32, 16), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImageNamesTest(TestCase):
+    """Имена картинок по хэшу и имена их вариантов."""
+
+    def test_variant_name(self):
+        name = RECIPE_IMAGE_DIR + 'ab/abcdef.png'
+        self.assertEqual(
+            variant_name(name, 'card'),
+            RECIPE_IMAGE_DIR + 'ab/abcdef/card.jpeg',
+        )
+        self.assertEqual(
+            variant_name(name, 'webp'),
+            RECIPE_IMAGE_DIR + 'ab/abcdef/webp.webp',
+        )
+
+    def test_variant_urls_fall_back_to_original(self):
+        name = RECIPE_IMAGE_DIR + 'ab/abcdef.png'
+        self.assertIsNone(variant_urls('', False))
+        self.assertEqual(
+            variant_urls(name, False),
+            dict.fromkeys(RECIPE_IMAGE_VARIANTS, content_storage.url(name)),
+        )
+        self.assertEqual(variant_urls(name, True), {
+            variant: content_storage.url(variant_name(name, variant))
+            for variant in RECIPE_IMAGE_VARIANTS
+        })
+
+
+class RecipeImagesTest(TestCase):
+    """Пока варианты не готовы, API отдаёт ссылки на оригинал."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        cls.tag = Tags.objects.create(
+            name='Завтрак', color='#000000', slug='breakfast'
+        )
+        cls.ingredient = Ingredients.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=directory.name, RECIPE_IMAGE_WORKERS=0
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        cache.clear()
+        recipe_fragments.local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def create_recipe(self, content, name='Рицепт'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/recipes/', {
+                'ingredients': [{'id': self.ingredient.pk, 'amount': 5}],
+                'tags': [self.tag.pk],
+                'name': name,
+                'image': 'data:image/png;base64,{}'.format(
+                    base64.b64encode(content).decode()
+                ),
+                'text': 'Описание',
+                'cooking_time': 5,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Recipes.objects.get(name=name)
+
+    def images(self, recipe):
+        response = self.client.get('/api/recipes/{}/'.format(recipe.pk))
+        self.assertEqual(response.status_code, 200)
+        return response.data['images']
+
+    def test_image_name_is_content_hash(self):
+        content = png_bytes()
+        digest = hashlib.sha256(content).hexdigest()
+        recipe = self.create_recipe(content)
+        self.assertEqual(
+            recipe.image.name,
+            '{}{}/{}.png'.format(RECIPE_IMAGE_DIR, digest[:2], digest),
+        )
+        # То же содержимое - тот же файл, без копии с суффиксом.
+        copy = Recipes.objects.create(
+            name='Копия', author=self.author, text='Описание', cooking_time=5,
+            image=SimpleUploadedFile('copy.PNG', content),
+        )
+        self.assertEqual(copy.image.name, recipe.image.name)
+        self.assertEqual(
+            self.create_recipe(content, 'Ещё').image.name, recipe.image.name
+        )
+        self.assertEqual(
+            os.listdir(content_storage.path(RECIPE_IMAGE_DIR + digest[:2])),
+            [digest + '.png'],
+        )
+
+    def test_variants_after_processing(self):
+        recipe = self.create_recipe(png_bytes())
+        # Без потоков в процессе сервера вариантов ещё нет.
+        self.assertEqual(Recipes.objects.pending_images().get(), recipe)
+        original = 'http://testserver' + recipe.image.url
+        self.assertEqual(
+            self.images(recipe),
+            dict.fromkeys(RECIPE_IMAGE_VARIANTS, original),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(
+                Recipes.objects.pending_images().process_images(),
+                [recipe.pk],
+            )
+        self.assertFalse(Recipes.objects.pending_images().exists())
+        images = self.images(recipe)
+        for variant, spec in RECIPE_IMAGE_VARIANTS.items():
+            name = variant_name(recipe.image.name, variant)
+            self.assertEqual(
+                images[variant],
+                'http://testserver' + content_storage.url(name),
+            )
+            with content_storage.open(name) as stream:
+                image = Image.open(stream)
+                self.assertEqual(image.format.lower(), spec['format'])
+                if spec['crop']:
+                    self.assertEqual(image.size, spec['size'])
@@ -0,0 +1,113 @@
+import importlib
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from recipes.configurations import INGREDIENTS_VERSION, TAGS_VERSION
+from recipes.models import DataVersions, Ingredients, Tags
+
+# В имени команды дефис: только через import_module.
+import_csv = importlib.import_module('recipes.management.commands.import-csv')
+INGREDIENTS = [
+    {'name': 'Соль', 'measurement_unit': 'г'},
+    {'name': 'Молоко', 'measurement_unit': 'мл'},
+    {'name': 'Молоко', 'measurement_unit': 'г'},
+    {'name': 'Яйцо', 'measurement_unit': 'шт.'},
+]
+
+
+class ImportTest(TestCase):
+    """import-csv: форматы, повторный запуск и конфликты тегов."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf8') as stream:
+            stream.write(content)
+        return path
+
+    def run_import(self, *args):
+        output = io.StringIO()
+        call_command('import-csv', *args, '--batch-size', '3', stdout=output)
+        return output.getvalue()
+
+    def ingredients(self):
+        return sorted(
+            Ingredients.objects.values_list('name', 'measurement_unit')
+        )
+
+    def test_reimport_is_idempotent(self):
+        expected = sorted(
+            (row['name'], row['measurement_unit']) for row in INGREDIENTS
+        )
+        csv_path = self.write(
+            'ingredients.csv',
+            'name_ingredient,measurement_unit\n' + ''.join(
+                '{name},{measurement_unit}\n'.format(**row)
+                for row in INGREDIENTS
+            ),
+        )
+        json_path = self.write('ingredients.json', json.dumps(INGREDIENTS))
+        jsonl_path = self.write('ingredients.jsonl', '\n'.join(
+            json.dumps(row) for row in INGREDIENTS
+        ))
+        version = DataVersions.get_value(INGREDIENTS_VERSION)
+        self.assertIn('новых записей 4', self.run_import(csv_path))
+        self.assertEqual(self.ingredients(), expected)
+        for path in (csv_path, json_path, jsonl_path):
+            with self.subTest(path=os.path.basename(path)):
+                self.assertIn('новых записей 0', self.run_import(path))
+                self.assertEqual(self.ingredients(), expected)
+        self.assertEqual(
+            DataVersions.get_value(INGREDIENTS_VERSION), version + 4
+        )
+
+    def test_json_is_read_in_chunks(self):
+        path = self.write('ingredients.json', json.dumps(INGREDIENTS))
+        # Записи разрезаны границами кусков чтения.
+        with mock.patch.object(import_csv, 'IMPORT_READ_CHUNK', 5), \
+                mock.patch('json.load', side_effect=AssertionError):
+            self.run_import(path)
+        self.assertEqual(len(self.ingredients()), len(INGREDIENTS))
+
+    def test_bad_files(self):
+        for name, content in (
+            ('ingredients.json', '{"name": "Соль"}'),
+            ('ingredients.json', '[{"name": "Соль", "measurement_unit": "г"'),
+            ('ingredients.jsonl', '{"name": "Соль"}'),
+        ):
+            with self.subTest(content=content):
+                with self.assertRaises(CommandError):
+                    self.run_import(self.write(name, content))
+        self.assertFalse(Ingredients.objects.exists())
+
+    def test_tag_conflicts_keep_existing_tags(self):
+        Tags.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        version = DataVersions.get_value(TAGS_VERSION)
+        path = self.write('tags.json', json.dumps([
+            # Slug занят: существующий тег не меняется.
+            {'name': 'Другое', 'color': '#000000', 'slug': 'breakfast'},
+            {'name': 'Обед', 'color': '#49B64E', 'slug': 'lunch'},
+            # Повтор slug в самом файле: берётся одна запись.
+            {'name': 'Обед', 'color': '#49B64E', 'slug': 'lunch'},
+            {'name': 'Ужин', 'color': '#8775D2', 'slug': 'dinner'},
+            {'name': 'Поздний ужин', 'color': '#8775D2', 'slug': 'dinner'},
+        ]))
+        self.assertIn('новых записей 2', self.run_import(path))
+        self.assertEqual(
+            Tags.objects.get(slug='breakfast').name, 'Завтрак'
+        )
+        self.assertEqual(
+            sorted(Tags.objects.values_list('slug', flat=True)),
+            ['breakfast', 'dinner', 'lunch'],
+        )
+        self.assertIn('новых записей 0', self.run_import(path))
+        self.assertEqual(DataVersions.get_value(TAGS_VERSION), version + 2)
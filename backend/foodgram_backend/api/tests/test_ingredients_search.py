@@ -0,0 +1,107 @@
+from api.ingredients_index import fold, ingredients_index
+from django.test import TestCase
+from recipes.configurations import (INGREDIENTS_SEARCH_LIMIT,
+                                    INGREDIENTS_SEARCH_MAX_LIMIT,
+                                    LIMIT_INVALID)
+from recipes.models import Ingredients
+from rest_framework.test import APIClient
+
+NAMES = [
+    'Молоко',
+    'молоко сгущённое',
+    'Молоко кокосовое',
+    'Молочный шоколад',
+    'Кокосовое молоко',
+    'Сухое молоко',
+    'Ёжевика',
+    'Соль',
+]
+
+
+class IngredientsSearchTest(TestCase):
+    """Подсказки ингридиентов: порядок, limit и регистр."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in NAMES:
+            Ingredients.objects.create(name=name, measurement_unit='г')
+        # Для limit: больше подсказок, чем отдаётся по умолчанию.
+        Ingredients.objects.bulk_create([
+            Ingredients(name='Специя {:02}'.format(number),
+                        measurement_unit='г')
+            for number in range(INGREDIENTS_SEARCH_LIMIT + 5)
+        ])
+
+    def setUp(self):
+        ingredients_index.version = None
+        self.client = APIClient()
+
+    def names(self, **params):
+        response = self.client.get('/api/ingredients/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data]
+
+    def test_exact_then_prefix_then_infix(self):
+        self.assertEqual(self.names(name='молоко'), [
+            'Молоко',
+            'Молоко кокосовое',
+            'молоко сгущённое',
+            'Кокосовое молоко',
+            'Сухое молоко',
+        ])
+        self.assertEqual(self.names(name='кокос'), [
+            'Кокосовое молоко', 'Молоко кокосовое',
+        ])
+
+    def test_case_folding(self):
+        for query in ('МОЛОЧ', 'молоч', 'мОлОч'):
+            with self.subTest(query=query):
+                self.assertEqual(self.names(name=query), ['Молочный шоколад'])
+        # ё и е не различаются ни в названии, ни в запросе.
+        for query in ('ежевика', 'ЁЖ', 'жевик'):
+            with self.subTest(query=query):
+                self.assertEqual(self.names(name=query), ['Ёжевика'])
+        self.assertEqual(
+            self.names(name='сгущенное'), ['молоко сгущённое']
+        )
+
+    def test_limit(self):
+        self.assertEqual(
+            len(self.names(name='специя')), INGREDIENTS_SEARCH_LIMIT
+        )
+        self.assertEqual(
+            self.names(name='специя', limit=2), ['Специя 00', 'Специя 01']
+        )
+        # Префиксные совпадения занимают limit раньше вхождений.
+        self.assertEqual(
+            self.names(name='молоко', limit=2), ['Молоко', 'Молоко кокосовое']
+        )
+        self.assertEqual(
+            self.names(name='молоко', limit=4)[3], 'Кокосовое молоко'
+        )
+        for limit in (0, INGREDIENTS_SEARCH_MAX_LIMIT + 1, 'x'):
+            with self.subTest(limit=limit):
+                response = self.client.get(
+                    '/api/ingredients/', {'name': 'соль', 'limit': limit}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data, {'limit': [
+                    LIMIT_INVALID.format(INGREDIENTS_SEARCH_MAX_LIMIT)
+                ]})
+
+    def test_infix_matches_brute_force(self):
+        keys = sorted(
+            (fold(name), name)
+            for name in Ingredients.objects.values_list('name', flat=True)
+        )
+        for query in ('ко', 'олок', 'ое мо', 'я 1', 'нет такого'):
+            with self.subTest(query=query):
+                prefix = [name for key, name in keys if key.startswith(query)]
+                infix = [
+                    name for key, name in keys
+                    if query in key and not key.startswith(query)
+                ]
+                self.assertEqual(
+                    self.names(name=query, limit=INGREDIENTS_SEARCH_MAX_LIMIT),
+                    prefix + infix,
+                )
@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+
+from api.metrics import (ARCHIVE_NAME, LATENCY_BUCKETS, MetricsRegistry,
+                         RequestRecord, current_request, process_start,
+                         registry, serializer_timer)
+from django.test import TestCase, override_settings
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+from users.models import Users
+
+
+def route_snapshot(pid, start, requests, route='RecipesViewSet.list'):
+    """Снимок процесса с requests запросами по 0.02 с."""
+    values = [0] * (5 + len(LATENCY_BUCKETS) + 1)
+    values[0] = requests
+    values[1] = requests * 0.02
+    values[5 + 2] = requests
+    return {
+        'pid': pid,
+        'start': start,
+        'routes': {route: values},
+        'responses': [[route, 'GET', 200, requests]],
+        'pools': {'default': {'size': 4, 'in_use': 1}},
+    }
+
+
+class MetricsTest(TestCase):
+    """Формат Prometheus и сумма счётчиков по файлам процессов."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.registry = MetricsRegistry()
+        # Без потока записи: файлы пишет сам тест.
+        self.registry.flusher_pid = os.getpid()
+
+    def write(self, name, snapshot):
+        with open(os.path.join(self.directory, name), 'w') as stream:
+            json.dump(snapshot, stream)
+
+    def samples(self):
+        samples = {}
+        for line in self.registry.exposition().splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_exposition_format(self):
+        record = RequestRecord()
+        record.sql_count = 3
+        for seconds in (0.003, 0.02, 20):
+            self.registry.observe('Route"1', 'GET', 200, seconds, record)
+        text = self.registry.exposition()
+        self.assertTrue(text.endswith('\n'))
+        self.assertIn('# TYPE foodgram_request_seconds histogram', text)
+        self.assertIn('# TYPE foodgram_responses_total counter', text)
+        samples = self.samples()
+        route = 'route="Route\\"1"'
+        # Корзины накопительные, +Inf - все запросы.
+        self.assertEqual(
+            samples['foodgram_request_seconds_bucket{%s,le="0.005"}' % route],
+            1,
+        )
+        self.assertEqual(
+            samples['foodgram_request_seconds_bucket{%s,le="0.025"}' % route],
+            2,
+        )
+        self.assertEqual(
+            samples['foodgram_request_seconds_bucket{%s,le="+Inf"}' % route],
+            3,
+        )
+        self.assertEqual(
+            samples['foodgram_request_seconds_count{%s}' % route], 3
+        )
+        self.assertEqual(samples['foodgram_sql_queries_total{%s}' % route], 9)
+        self.assertEqual(samples[
+            'foodgram_responses_total{%s,method="GET",status="200"}' % route
+        ], 3)
+
+    def test_files_of_processes_are_summed(self):
+        parent = os.getppid()
+        self.write(
+            '{}-{}.json'.format(parent, process_start(parent)),
+            route_snapshot(parent, process_start(parent), 2),
+        )
+        # Тот же pid, но другой старт: файл процесса, чей pid занят.
+        self.write(
+            '{}-1.json'.format(parent), route_snapshot(parent, 1, 5)
+        )
+        count = 'foodgram_request_seconds_count{route="RecipesViewSet.list"}'
+        in_use = 'foodgram_db_pool_in_use{alias="default"}'
+        for _ in range(2):
+            samples = self.samples()
+            self.assertEqual(samples[count], 7)
+            # Пул соединений - только у живых процессов.
+            self.assertEqual(samples[in_use], 1)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted([
+                ARCHIVE_NAME,
+                'archive.lock',
+                '{}-{}.json'.format(parent, process_start(parent)),
+            ]),
+        )
+
+    def test_folded_file_is_not_counted_twice(self):
+        name = '{}-1.json'.format(os.getppid())
+        self.write(name, route_snapshot(os.getppid(), 1, 5))
+        self.samples()
+        # Сбой между записью архива и удалением файла.
+        self.write(name, route_snapshot(os.getppid(), 1, 5))
+        count = 'foodgram_request_seconds_count{route="RecipesViewSet.list"}'
+        self.assertEqual(self.samples()[count], 5)
+        self.assertNotIn(name, os.listdir(self.directory))
+
+
+class SerializerTimingTest(TestCase):
+    """Время сериализации считают виды, BaseSerializer не подменён."""
+
+    def test_view_serializer_time(self):
+        self.assertFalse(hasattr(BaseSerializer.data.fget, 'timed'))
+        user = Users.objects.create_user(
+            username='reader', email='reader@test.ru', password='p'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        route = registry.routes.get('RecipesViewSet.list')
+        before = route[4] if route else 0
+        self.assertEqual(client.get('/api/recipes/').status_code, 200)
+        self.assertGreater(registry.routes['RecipesViewSet.list'][4], before)
+
+    def test_nested_blocks_are_counted_once(self):
+        record = RequestRecord()
+        token = current_request.set(record)
+        try:
+            with serializer_timer():
+                with serializer_timer():
+                    pass
+                inner = record.serializer_seconds
+        finally:
+            current_request.reset(token)
+        self.assertEqual(inner, 0)
+        self.assertGreater(record.serializer_seconds, 0)
@@ -0,0 +1,83 @@
+from urllib import parse
+
+from django.test import TestCase
+from recipes.models import Recipes
+from rest_framework.test import APIClient
+from users.models import Users
+
+
+class RecipesPaginationTest(TestCase):
+    """Курсор только для порядка по дате, поиск - по номерам страниц."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        # Свежие рицепты находятся по описанию, старые - по названию.
+        for number in range(8):
+            Recipes.objects.create(
+                name='Borsch {}'.format(number) if number < 4 else 'Суп',
+                author=author,
+                text='Описание' if number < 4 else 'Almost borsch',
+                cooking_time=5,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_without_search(self):
+        response = self.client.get('/api/recipes/', {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.data)
+        self.assertIn('cursor=', response.data['next'])
+
+    def test_search_falls_back_to_page_numbers(self):
+        next_link = self.client.get(
+            '/api/recipes/', {'pagination': 'cursor'}
+        ).data['next']
+        cursor = parse.parse_qs(parse.urlsplit(next_link).query)['cursor'][0]
+        for params in ({'pagination': 'cursor'}, {'cursor': cursor}):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    '/api/recipes/', {'search': 'borsch', **params}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['count'], 8)
+                results = response.data['results']
+                response = self.client.get(response.data['next'])
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.data['next'])
+                results += response.data['results']
+                self.assertEqual(
+                    [recipe['id'] for recipe in results], self.ranked_ids()
+                )
+
+    def ranked_ids(self):
+        """Совпадения в названии выше, хотя эти рицепты старше."""
+        recipes = Recipes.objects.order_by('-pub_date', '-id')
+        return list(
+            recipes.filter(name__startswith='Borsch').values_list(
+                'pk', flat=True
+            )
+        ) + list(recipes.filter(name='Суп').values_list('pk', flat=True))
+
+    def test_search(self):
+        for query, expected in (
+            ('Borsch', self.ranked_ids()),
+            ('almost', self.ranked_ids()[4:]),
+            ('пельмени', []),
+            ("borsch'; DROP TABLE recipes_recipes; --", []),
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    '/api/recipes/', {'search': query, 'page': 1}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['count'], len(expected))
+                page = response.data['results']
+                self.assertEqual(
+                    [recipe['id'] for recipe in page],
+                    expected[:len(page)],
+                )
+        self.assertEqual(Recipes.objects.count(), 8)
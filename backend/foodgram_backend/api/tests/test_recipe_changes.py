@@ -0,0 +1,196 @@
+from api.cache import recipe_fragments
+from api.serializers import RecipesListRetrieveSerializer
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Ingredients, RecipeIngredients,
+                            RecipeIngredientsChanges, Recipes, Tags,
+                            TagsRecipes)
+from rest_framework.test import APIClient
+from users.models import Users
+
+
+class RecipeDeleteTest(TestCase):
+    """Удаление рицепта не зависит от размера его состава."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        cls.tags = [
+            Tags.objects.create(
+                name='Тег {}'.format(number),
+                color='#00000{}'.format(number),
+                slug='tag-{}'.format(number),
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name='Ингридиент {}'.format(number), measurement_unit='г'
+            )
+            for number in range(40)
+        ]
+
+    def setUp(self):
+        # SQLite снова выдаёт id откаченных тестов: фрагменты - долой.
+        cache.clear()
+        recipe_fragments.local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def create_recipe(self, size):
+        recipe = Recipes.objects.create(
+            name='Рицепт', author=self.author, text='Описание', cooking_time=5
+        )
+        recipe.tags.set(self.tags)
+        RecipeIngredients.objects.bulk_create([
+            RecipeIngredients(
+                id_recipe=recipe, id_ingredient=ingredient, amount=1
+            )
+            for ingredient in self.ingredients[:size]
+        ])
+        return recipe
+
+    def delete_recipe(self, size):
+        recipe = self.create_recipe(size)
+        journal = RecipeIngredientsChanges.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(
+                '/api/recipes/{}/'.format(recipe.pk)
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(
+            RecipeIngredients.objects.filter(id_recipe=recipe.pk).exists()
+        )
+        self.assertFalse(
+            TagsRecipes.objects.filter(id_recipe=recipe.pk).exists()
+        )
+        self.assertEqual(
+            RecipeIngredientsChanges.objects.count() - journal, 1
+        )
+        return len(queries)
+
+    def test_delete_queries_do_not_grow_with_ingredients(self):
+        self.assertEqual(self.delete_recipe(2), self.delete_recipe(40))
+
+    def test_relation_delete_is_journaled_once(self):
+        recipe = self.create_recipe(10)
+        journal = RecipeIngredientsChanges.objects.filter(recipe_id=recipe.pk)
+        before = journal.count()
+        RecipeIngredients.objects.filter(id_recipe=recipe).delete()
+        self.assertEqual(journal.count() - before, 1)
+
+    def test_serialize_recipe_deleted_meanwhile(self):
+        recipe = self.create_recipe(2)
+        Recipes.objects.filter(pk=recipe.pk).delete()
+        data = RecipesListRetrieveSerializer(recipe).data
+        self.assertEqual(data['id'], recipe.pk)
+        self.assertEqual(data['name'], recipe.name)
+
+
+class RecipeUpdateTest(TestCase):
+    """PATCH рицепта пишет только изменившиеся строки состава и тегов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        cls.tag = Tags.objects.create(
+            name='Тег', color='#000000', slug='tag'
+        )
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name='Ингридиент {}'.format(number), measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        cls.recipe = Recipes.objects.create(
+            name='Рицепт', author=cls.author, text='Описание', cooking_time=5
+        )
+        cls.recipe.tags.set([cls.tag])
+        for number in range(3):
+            RecipeIngredients.objects.create(
+                id_recipe=cls.recipe,
+                id_ingredient=cls.ingredients[number],
+                amount=number + 1,
+            )
+
+    def setUp(self):
+        cache.clear()
+        recipe_fragments.local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, amounts):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                '/api/recipes/{}/'.format(self.recipe.pk),
+                {
+                    'ingredients': [
+                        {'id': self.ingredients[number].pk, 'amount': amount}
+                        for number, amount in amounts.items()
+                    ],
+                    'tags': [self.tag.pk],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries.captured_queries]
+
+    def writes(self, queries, table):
+        """Команды записи в таблицу table: INSERT INTO "t", UPDATE "t"..."""
+        table = '"{}"'.format(table)
+        writes = []
+        for query in queries:
+            words = query.split(None, 3)
+            if words[0] in ('INSERT', 'DELETE') and words[2] == table or (
+                words[0] == 'UPDATE' and words[1] == table
+            ):
+                writes.append(words[0])
+        return sorted(writes)
+
+    def rows(self):
+        return dict(RecipeIngredients.objects.filter(
+            id_recipe=self.recipe
+        ).values_list('id_ingredient', 'pk'))
+
+    def test_only_changed_rows_are_written(self):
+        before = self.rows()
+        queries = self.patch({0: 1, 1: 5, 3: 4})
+        self.assertEqual(
+            self.writes(queries, RecipeIngredients._meta.db_table),
+            ['DELETE', 'INSERT', 'UPDATE'],
+        )
+        self.assertEqual(self.writes(queries, TagsRecipes._meta.db_table), [])
+        after = self.rows()
+        # Оставшиеся строки - те же записи, не удалены и вставлены заново.
+        for number in (0, 1):
+            pk = self.ingredients[number].pk
+            self.assertEqual(after[pk], before[pk])
+        self.assertEqual(
+            dict(RecipeIngredients.objects.filter(
+                id_recipe=self.recipe
+            ).values_list('id_ingredient', 'amount')),
+            {self.ingredients[0].pk: 1, self.ingredients[1].pk: 5,
+             self.ingredients[3].pk: 4},
+        )
+        queries = self.patch({0: 1, 1: 5, 3: 4})
+        self.assertEqual(
+            self.writes(queries, RecipeIngredients._meta.db_table), []
+        )
+
+    def test_recipe_row_is_locked_first(self):
+        queries = self.patch({0: 1})
+        if connection.features.has_select_for_update:
+            locks = [query for query in queries if 'FOR UPDATE' in query]
+            self.assertEqual(len(locks), 1)
+            self.assertIn('"{}"'.format(Recipes._meta.db_table), locks[0])
+            writes = [
+                number for number, query in enumerate(queries)
+                if query.split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+            ]
+            self.assertLess(queries.index(locks[0]), writes[0])
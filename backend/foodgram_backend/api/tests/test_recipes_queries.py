@@ -0,0 +1,116 @@
+from unittest import mock
+
+from api.cache import recipe_fragments
+from api.catalog import tags_catalog
+from api.ingredients_index import ingredients_index
+from api.pagination import RecipesPagination
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.models import (Favorited, Ingredients, RecipeIngredients, Recipes,
+                            ShoppingList, Tags)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Subscriptions, Users
+
+# Запросов на список и рицепт: без кэшей процесса (справочники,
+# фрагменты) и с ними. С токеном - ещё чтение токена.
+LIST_QUERIES = {'cold': 8, 'warm': 3}
+DETAIL_QUERIES = {'cold': 7, 'warm': 2}
+TOKEN_QUERIES = 1
+PAGE_SIZES = (2, 6)
+
+
+class RecipesQueryCountTest(TestCase):
+    """Число запросов списка и рицепта не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(
+            username='reader', email='reader@test.ru', password='p'
+        )
+        author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        Subscriptions.objects.create(id_subscriber=cls.user, id_writer=author)
+        tags = [
+            Tags.objects.create(
+                name='Тег {}'.format(number),
+                color='#00000{}'.format(number),
+                slug='tag-{}'.format(number),
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredients.objects.create(
+                name='Ингридиент {}'.format(number), measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+        for number in range(max(PAGE_SIZES) * 2):
+            recipe = Recipes.objects.create(
+                name='Рицепт {}'.format(number),
+                author=author if number % 2 else cls.user,
+                text='Описание',
+                cooking_time=5,
+            )
+            recipe.tags.set(tags[:number % 3 + 1])
+            for ingredient in ingredients[:number % 5 + 1]:
+                RecipeIngredients.objects.create(
+                    id_recipe=recipe, id_ingredient=ingredient, amount=1
+                )
+            if number % 3 == 0:
+                Favorited.objects.create(id_user=cls.user, id_recipe=recipe)
+                ShoppingList.objects.create(id_user=cls.user, id_recipe=recipe)
+        cls.recipe = recipe
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.reset_process_caches()
+
+    def reset_process_caches(self):
+        cache.clear()
+        recipe_fragments.local.clear()
+        tags_catalog.version = None
+        ingredients_index.version = None
+
+    def clients(self):
+        reader = APIClient()
+        reader.credentials(
+            HTTP_AUTHORIZATION='Token {}'.format(self.token.key)
+        )
+        return (('anonymous', APIClient(), 0),
+                ('token', reader, TOKEN_QUERIES))
+
+    def assert_queries(self, client, url, expected, extra):
+        self.reset_process_caches()
+        for phase in ('cold', 'warm'):
+            with self.subTest(url=url, phase=phase):
+                with self.assertNumQueries(expected[phase] + extra):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list(self):
+        for name, client, extra in self.clients():
+            for page_size in PAGE_SIZES:
+                with self.subTest(client=name, page_size=page_size), \
+                        mock.patch.object(
+                            RecipesPagination, 'page_size', page_size
+                        ):
+                    response = self.assert_queries(
+                        client, '/api/recipes/', LIST_QUERIES, extra
+                    )
+                    self.assertEqual(
+                        len(response.data['results']), page_size
+                    )
+
+    def test_detail(self):
+        for name, client, extra in self.clients():
+            with self.subTest(client=name):
+                response = self.assert_queries(
+                    client,
+                    '/api/recipes/{}/'.format(self.recipe.pk),
+                    DETAIL_QUERIES,
+                    extra,
+                )
+                self.assertEqual(response.data['id'], self.recipe.pk)
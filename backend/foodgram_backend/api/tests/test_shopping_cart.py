@@ -0,0 +1,95 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Ingredients, RecipeIngredients, Recipes,
+                            ShoppingCartIngredients)
+from rest_framework.test import APIClient
+from users.models import Users
+
+
+class ShoppingCartTotalsTest(TestCase):
+    """Суммы корзины: вычитание чистит только затронутые строки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(
+            username='buyer', email='buyer@test.ru', password='p'
+        )
+        cls.other = Users.objects.create_user(
+            username='other', email='other@test.ru', password='p'
+        )
+        cls.ingredients = [
+            Ingredients.objects.create(
+                name='Ингридиент {}'.format(number), measurement_unit='г'
+            )
+            for number in range(3)
+        ]
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipes.objects.create(
+                name='Рицепт {}'.format(number),
+                author=cls.user,
+                text='Описание',
+                cooking_time=5,
+            )
+            RecipeIngredients.objects.bulk_create([
+                RecipeIngredients(
+                    id_recipe=recipe, id_ingredient=ingredient, amount=10
+                )
+                for ingredient in cls.ingredients[number:number + 2]
+            ])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def totals(self, user):
+        return dict(ShoppingCartIngredients.objects.filter(
+            id_user=user
+        ).values_list('id_ingredient', 'amount'))
+
+    def cart_url(self, recipe):
+        return '/api/recipes/{}/shopping_cart/'.format(recipe.pk)
+
+    def test_remove_deletes_only_emptied_rows_of_this_cart(self):
+        for recipe in self.recipes:
+            self.client.post(self.cart_url(recipe))
+        # Чужая строка с нулём не должна задеваться чужим удалением.
+        stray = ShoppingCartIngredients.objects.create(
+            id_user=self.other, id_ingredient=self.ingredients[0], amount=0
+        )
+        first, second, third = (
+            ingredient.pk for ingredient in self.ingredients
+        )
+        self.assertEqual(
+            self.totals(self.user), {first: 10, second: 20, third: 10}
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(self.cart_url(self.recipes[0]))
+        self.assertEqual(self.totals(self.user), {second: 10, third: 10})
+        self.assertTrue(
+            ShoppingCartIngredients.objects.filter(pk=stray.pk).exists()
+        )
+        deletes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('DELETE') and (
+                ShoppingCartIngredients._meta.db_table in query['sql']
+            )
+        ]
+        self.assertEqual(len(deletes), 1)
+        self.assertIn('"id" IN', deletes[0])
+
+    def test_remove_without_emptied_rows_skips_delete(self):
+        for _ in range(2):
+            ShoppingCartIngredients.objects.apply_recipes(
+                self.user.pk, [self.recipes[1].pk], 1
+            )
+        with CaptureQueriesContext(connection) as queries:
+            ShoppingCartIngredients.objects.apply_recipes(
+                self.user.pk, [self.recipes[1].pk], -1
+            )
+        self.assertFalse(any(
+            query['sql'].startswith('DELETE')
+            for query in queries.captured_queries
+        ))
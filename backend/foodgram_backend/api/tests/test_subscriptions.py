@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from recipes.configurations import (RECIPES_LIMIT_INVALID,
+                                    WITHDRAWAL_CALL_RECIPES)
+from recipes.models import Recipes
+from rest_framework.test import APIClient
+from users.models import Subscriptions, Users
+
+URL = '/api/users/subscriptions/'
+# Число подписок, страница подписок, рицепты всех авторов страницы.
+FEED_QUERIES = 3
+
+
+class SubscriptionsTest(TestCase):
+    """Лента подписок: recipes_limit и число запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = Users.objects.create_user(
+            username='reader', email='reader@test.ru', password='p'
+        )
+        cls.authors = []
+        now = timezone.now()
+        for number in range(4):
+            author = Users.objects.create_user(
+                username='author{}'.format(number),
+                email='author{}@test.ru'.format(number),
+                password='p',
+            )
+            for age in range(number + 2):
+                recipe = Recipes.objects.create(
+                    name='Рицепт {} {}'.format(number, age),
+                    author=author,
+                    text='Описание',
+                    cooking_time=5,
+                )
+                # pub_date ставится при создании: старим явно.
+                Recipes.objects.filter(pk=recipe.pk).update(
+                    pub_date=now - timedelta(days=age)
+                )
+            cls.authors.append(author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def subscribe(self, authors):
+        for author in authors:
+            Subscriptions.objects.create(
+                id_subscriber=self.reader, id_writer=author
+            )
+
+    def latest(self, author, limit):
+        return list(Recipes.objects.filter(author=author).order_by(
+            '-pub_date', '-id'
+        ).values_list('pk', flat=True)[:limit])
+
+    def feed(self, **params):
+        response = self.client.get(URL, params)
+        self.assertEqual(response.status_code, 200)
+        return {
+            item['id']: item for item in response.data['results']
+        }
+
+    def test_recipes_limit(self):
+        self.subscribe(self.authors)
+        for limit in (None, 0, 1, 2, 10):
+            params = {} if limit is None else {'recipes_limit': limit}
+            expected = WITHDRAWAL_CALL_RECIPES if limit is None else limit
+            with self.subTest(limit=limit):
+                feed = self.feed(**params)
+                for author in self.authors:
+                    item = feed[author.pk]
+                    self.assertEqual(
+                        [recipe['id'] for recipe in item['recipes']],
+                        self.latest(author, expected),
+                    )
+                    self.assertEqual(
+                        item['recipes_count'],
+                        author.author_recipe.count(),
+                    )
+
+    def test_invalid_recipes_limit(self):
+        self.subscribe(self.authors[:1])
+        for value in ('-1', 'abc', '1.5'):
+            with self.subTest(value=value):
+                response = self.client.get(URL, {'recipes_limit': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.data, {'recipes_limit': [RECIPES_LIMIT_INVALID]}
+                )
+        response = self.client.post(
+            '/api/users/{}/subscribe/?recipes_limit=-1'.format(
+                self.authors[1].pk
+            )
+        )
+        self.assertEqual(response.status_code, 400)
+        # Подписка не создаётся, если параметр неверный.
+        self.assertFalse(Subscriptions.objects.filter(
+            id_writer=self.authors[1]
+        ).exists())
+
+    def test_subscribe_recipes_limit(self):
+        author = self.authors[3]
+        response = self.client.post(
+            '/api/users/{}/subscribe/?recipes_limit=1'.format(author.pk)
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['recipes']],
+            self.latest(author, 1),
+        )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.feed(recipes_limit=2)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_subscriptions(self):
+        self.subscribe(self.authors[:1])
+        self.assertEqual(self.count_queries(), FEED_QUERIES)
+        self.subscribe(self.authors[1:])
+        self.assertEqual(self.count_queries(), FEED_QUERIES)
@@ -0,0 +1,96 @@
+from api.catalog import tags_catalog
+from api.filters import RecipesFilter
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipes, Tags, TagsRecipes
+from rest_framework.test import APIClient
+from users.models import Users
+
+# Теги рицептов по номерам; у последнего тегов нет.
+RECIPE_TAGS = (('breakfast',), ('breakfast', 'lunch'), ('lunch',),
+               ('dinner',), ())
+
+
+class TagsFilterTest(TestCase):
+    """?tags= через EXISTS: без дублей, DISTINCT и лишних запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = Users.objects.create_user(
+            username='author', email='author@test.ru', password='p'
+        )
+        tags = {
+            slug: Tags.objects.create(
+                name=slug.capitalize(), color='#00000{}'.format(number),
+                slug=slug,
+            )
+            for number, slug in enumerate(('breakfast', 'lunch', 'dinner'))
+        }
+        cls.recipes = []
+        for number, slugs in enumerate(RECIPE_TAGS):
+            recipe = Recipes.objects.create(
+                name='Рицепт {}'.format(number),
+                author=author,
+                text='Описание',
+                cooking_time=5,
+            )
+            recipe.tags.set([tags[slug] for slug in slugs])
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        cache.clear()
+        tags_catalog.version = None
+        self.client = APIClient()
+
+    def expected(self, slugs):
+        return sorted(
+            recipe.pk for recipe, tags in zip(self.recipes, RECIPE_TAGS)
+            if set(tags) & set(slugs)
+        )
+
+    def test_each_recipe_once(self):
+        for slugs in (
+            ['breakfast'], ['breakfast', 'lunch'],
+            ['lunch', 'dinner', 'breakfast'], ['dinner'],
+        ):
+            with self.subTest(slugs=slugs):
+                response = self.client.get(
+                    '/api/recipes/', {'tags': slugs, 'page': 1}
+                )
+                self.assertEqual(response.status_code, 200)
+                ids = [recipe['id'] for recipe in response.data['results']]
+                self.assertEqual(sorted(ids), self.expected(slugs))
+                self.assertEqual(response.data['count'], len(ids))
+
+    def test_unknown_slug_is_400(self):
+        response = self.client.get(
+            '/api/recipes/', {'tags': ['breakfast', 'brunch']}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('tags', response.data)
+
+    def test_semi_join_sql(self):
+        queryset = RecipesFilter(
+            {'tags': ['breakfast', 'lunch']}, queryset=Recipes.objects.all()
+        ).qs
+        sql = str(queryset.query).upper()
+        self.assertIn('EXISTS', sql)
+        self.assertIn(TagsRecipes._meta.db_table.upper(), sql)
+        self.assertNotIn('DISTINCT', sql)
+        # Таблица связей только внутри подзапроса, не в JOIN.
+        self.assertNotIn('JOIN', sql)
+
+    def test_filter_adds_no_queries(self):
+        def count_queries(params):
+            self.client.get('/api/recipes/', params)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/recipes/', params)
+            self.assertEqual(response.status_code, 200)
+            return len(queries)
+
+        self.assertEqual(
+            count_queries({'tags': ['breakfast', 'lunch']}),
+            count_queries({}),
+        )
@@ -0,0 +1,105 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Favorited, Ingredients, RecipeIngredients, Recipes,
+                            ShoppingCartIngredients, ShoppingList)
+from rest_framework.test import APIClient
+from users.models import Users
+
+UNKNOWN = 999999
+
+
+class UserMarksTest(TestCase):
+    """Избранное и корзина: повторы, неизвестные рицепты и пакеты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(
+            username='reader', email='reader@test.ru', password='p'
+        )
+        cls.ingredient = Ingredients.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipes.objects.create(
+                name='Рицепт {}'.format(number),
+                author=cls.user,
+                text='Описание',
+                cooking_time=5,
+            )
+            RecipeIngredients.objects.create(
+                id_recipe=recipe, id_ingredient=cls.ingredient, amount=10
+            )
+            cls.recipes.append(recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def favorites_count(self, recipe):
+        return Recipes.objects.get(pk=recipe.pk).favorites_count
+
+    def test_repeat_post_and_delete(self):
+        recipe = self.recipes[0]
+        url = '/api/recipes/{}/favorite/'.format(recipe.pk)
+        self.assertEqual(self.client.post(url).status_code, 201)
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.favorites_count(recipe), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.delete(url).status_code, 204)
+        # Отметка была: существование рицепта не проверяется.
+        self.assertFalse(any(
+            'EXISTS' in query['sql'] or 'LIMIT 1' in query['sql']
+            for query in queries.captured_queries
+        ))
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.favorites_count(recipe), 0)
+        self.assertFalse(Favorited.objects.exists())
+
+    def test_unknown_recipe(self):
+        for url in ('favorite', 'shopping_cart'):
+            with self.subTest(url=url):
+                url = '/api/recipes/{}/{}/'.format(UNKNOWN, url)
+                self.assertEqual(self.client.post(url).status_code, 404)
+                self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_batch(self):
+        url = '/api/recipes/favorite/batch/'
+        first, second = (recipe.pk for recipe in self.recipes)
+        response = self.client.post(
+            url, {'add': [first, second, UNKNOWN, first]}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sorted(response.data['added']), sorted([first, second])
+        )
+        self.assertEqual(response.data['removed'], [])
+        response = self.client.post(
+            url, {'add': [first], 'remove': [second, UNKNOWN]},
+            format='json',
+        )
+        self.assertEqual(response.data, {'added': [], 'removed': [second]})
+        self.assertEqual(
+            [self.favorites_count(recipe) for recipe in self.recipes], [1, 0]
+        )
+        self.assertEqual(
+            self.client.post(url, {}, format='json').status_code, 400
+        )
+
+    def test_cart_batch_updates_totals(self):
+        first, second = (recipe.pk for recipe in self.recipes)
+        url = '/api/recipes/shopping_cart/batch/'
+        self.client.post(url, {'add': [first, second]}, format='json')
+        self.client.post(url, {'add': [first]}, format='json')
+        self.assertEqual(ShoppingCartIngredients.objects.get(
+            id_user=self.user, id_ingredient=self.ingredient
+        ).amount, 20)
+        self.client.post(url, {'remove': [first]}, format='json')
+        self.assertEqual(ShoppingCartIngredients.objects.get(
+            id_user=self.user, id_ingredient=self.ingredient
+        ).amount, 10)
+        self.assertEqual(
+            list(ShoppingList.objects.values_list('id_recipe', flat=True)),
+            [second],
+        )
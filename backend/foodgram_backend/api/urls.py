@@ -1,8 +1,10 @@
 # flake8: noqa
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from . import views
+from .async_views import async_patterns
 
 app_name = 'api'
 
@@ -33,6 +35,16 @@ router.register(
     basename='Recipes'
 )
 
+router_urls = router.urls
+
+# Под ASGI медленное чтение не должно занимать процесс целиком.
+ASYNC_VIEWS = (
+    views.DownloadShoppingCartView,
+    views.IngredientsViewSet,
+    views.RecipesViewSet,
+    views.SubscriptionsViewSet,
+    views.TagsViewSet,
+)
 
 urlpatterns = [
     path('users/me/', views.ProfileUserView.as_view()),
@@ -40,9 +52,20 @@ urlpatterns = [
     path('users/<int:pk>/subscribe/', views.SubscriberWriterView.as_view()),
     path('recipes/<int:pk>/favorite/', views.FavoritedView.as_view()),
     path('recipes/<int:pk>/shopping_cart/', views.AddCartView.as_view()),
+    path('recipes/favorite/batch/', views.FavoritedBatchView.as_view()),
+    path('recipes/shopping_cart/batch/', views.AddCartBatchView.as_view()),
     path('recipes/download_shopping_cart/',
          views.DownloadShoppingCartView.as_view()),
-    path('', include(router.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
+    path('auth/jwt/create/', views.TokenObtainView.as_view()),
+    path('auth/jwt/refresh/', views.TokenRefreshView.as_view()),
+    path('auth/jwt/verify/', views.TokenVerifyView.as_view()),
+    path('auth/jwt/logout/', views.TokenLogoutView.as_view()),
+    path('_metrics', views.MetricsView.as_view()),
 ]
+
+if settings.ASYNC_VIEWS:
+    async_patterns(urlpatterns, ASYNC_VIEWS)
+    async_patterns(router_urls, ASYNC_VIEWS)
@@ -1,39 +1,93 @@
 # flake8: noqa
-from django.db.models import Sum
-from django.http import HttpResponse
+import hashlib
+
+from django.db import transaction
+from django.db.models import Count
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, mixins, status, viewsets
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import (
+    AllowAny,
+    IsAdminUser,
+    IsAuthenticatedOrReadOnly
+)
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework_simplejwt import views as jwt_views
+from rest_framework_simplejwt.tokens import AccessToken
 
 from users.models import Subscriptions, Users
 from api.serializers import (
     IngredientsSerializer,
     AddSubscriptionsSerializer,
+    DeniedRefreshSerializer,
+    DeniedVerifySerializer,
+    EmailTokenObtainPairSerializer,
+    RecipesBatchSerializer,
     RecipesListRetrieveSerializer,
     RecipesReductionSerializer,
     RecipesSerializer,
     SetPasswordSerializer,
     SubscriptionsSerializer,
     TagsSerializer,
+    TokenDenySerializer,
     UsersCreateSerializer,
     UsersSerializer
 )
 from recipes.models import (
     Favorited,
     Ingredients,
-    RecipeIngredients,
     Recipes,
+    ShoppingCartIngredients,
     ShoppingList,
     Tags
 )
-from .filters import DynamicSearchFilter, RecipesFilter
+from recipes.configurations import (
+    COOKABLE_INGREDIENTS_INVALID,
+    COOKABLE_MAX_INGREDIENTS,
+    COOKABLE_MAX_MISSING_INVALID,
+    INGREDIENTS_SEARCH_LIMIT,
+    INGREDIENTS_SEARCH_MAX_LIMIT,
+    INGREDIENTS_VERSION,
+    LIMIT_INVALID,
+    RECIPES_LIMIT_INVALID,
+    RECIPES_ORDERING_POPULAR,
+    RECIPES_VERSION,
+    TAGS_VERSION,
+    WITHDRAWAL_CALL_RECIPES
+)
+from .authentication import deny_list
+from .catalog import tags_catalog
+from .conditional import ConditionalGetMixin
+from .cookable_index import cookable_index
+from .filters import RecipesFilter
+from .ingredients_index import ingredients_index
+from .metrics import SerializerTimingMixin, registry, serialized
+from .pagination import RecipesPagination
+from .renderers import (
+    CSVRenderer,
+    FormatParamNegotiation,
+    PDFRenderer,
+    PrometheusRenderer,
+    TxtRenderer
+)
+from .shopping_list import (
+    SHOPPING_LIST_FILENAME,
+    render_csv,
+    render_pdf,
+    render_txt,
+    shopping_list_rows
+)
 from .permissions import IsAdminUserOrReadOnly, ProfileReadOnly
 
 
-class UsersViewSet(viewsets.ModelViewSet):
+class UsersViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     """Создание пользователя или просмотр."""
     queryset = Users.objects.all()
     serializer_class = UsersSerializer
@@ -51,7 +105,7 @@ class ProfileUserView(APIView):
         serializer = UsersSerializer(
             get_object_or_404(Users, pk=request.user.id)
         )
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serialized(serializer), status=status.HTTP_200_OK)
 
 
 class SetPasswordView(APIView):
@@ -69,18 +123,83 @@ class SetPasswordView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SubscriptionsViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+class TokenObtainView(jwt_views.TokenObtainPairView):
+    """Пара JWT: короткий токен доступа и токен обновления."""
+    serializer_class = EmailTokenObtainPairSerializer
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    """Новый токен доступа по токену обновления."""
+    serializer_class = DeniedRefreshSerializer
+
+
+class TokenVerifyView(jwt_views.TokenVerifyView):
+    """Проверка токена."""
+    serializer_class = DeniedVerifySerializer
+
+
+class TokenLogoutView(APIView):
+    """Выход: отзыв токена обновления и текущего токена доступа."""
+    permission_classes = (AllowAny, )
+
+    def post(self, request):
+        serializer = TokenDenySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        deny_list.deny(serializer.validated_data['refresh'])
+        if isinstance(request.auth, AccessToken):
+            deny_list.deny(request.auth)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """Метрики всех процессов сервера для Prometheus (только staff)."""
+    permission_classes = (IsAdminUser, )
+    renderer_classes = (PrometheusRenderer, )
+
+    def get(self, request):
+        return Response(
+            registry.exposition().encode('utf-8'),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+
+def get_recipes_limit(request):
+    """?recipes_limit= - сколько рицептов автора показать в подписке."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return WITHDRAWAL_CALL_RECIPES
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        recipes_limit = -1
+    if recipes_limit < 0:
+        raise ValidationError({'recipes_limit': [RECIPES_LIMIT_INVALID]})
+    return recipes_limit
+
+
+class SubscriptionsViewSet(SerializerTimingMixin, mixins.ListModelMixin,
+                           viewsets.GenericViewSet):
     """Показывает подписки текущего пользователя."""
     serializer_class = SubscriptionsSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['recipes_limit'] = get_recipes_limit(self.request)
+        return context
+
     def get_queryset(self):
-        return self.request.user.subscriptions_subscriber.all()
+        return self.request.user.subscriptions_subscriber.select_related(
+            'id_writer'
+        ).annotate(
+            recipes_count=Count('id_writer__author_recipe')
+        ).order_by('-id_writer')
 
 
 class SubscriberWriterView(APIView):
     """Добавление в подписки или удаление."""
     def post(self, request, *args, **kwargs):
         user = self.request.user
+        recipes_limit = get_recipes_limit(request)
         add_user = get_object_or_404(Users, pk=self.kwargs.get('pk'))
         serializer = AddSubscriptionsSerializer(
             data={'subscriber': user.id, 'writer': add_user.id}
@@ -92,10 +211,10 @@ class SubscriberWriterView(APIView):
                 id_writer=add_user
             ),
             data=request.data,
-            context={'request': request}
+            context={'request': request, 'recipes_limit': recipes_limit}
         )
         if serializer.is_valid(raise_exception=True):
-            return Response(serializer.data, status=status.HTTP_200_OK)            
+            return Response(serialized(serializer), status=status.HTTP_200_OK)            
 
     def delete(self, request, pk, format=None):
         user = get_object_or_404(Users, pk=self.kwargs.get('pk'))
@@ -111,126 +230,296 @@ class SubscriberWriterView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagsViewSet(viewsets.ModelViewSet):
-    """Работа с тегами."""
+def catalog_row_response(view, catalog):
+    """Строка справочника в памяти по pk из адреса или 404."""
+    try:
+        row = catalog.get(int(view.kwargs[view.lookup_field]))
+    except ValueError:
+        row = None
+    if row is None:
+        raise Http404
+    return Response(view.get_serializer(row).data)
+
+
+class TagsViewSet(SerializerTimingMixin, ConditionalGetMixin,
+                  viewsets.ModelViewSet):
+    """Работа с тегами.
+
+    Чтение идёт из справочника в памяти процесса, запись - в базу.
+    """
+    version_names = (TAGS_VERSION,)
     queryset = Tags.objects.all()
     serializer_class = TagsSerializer
     permission_classes = (IsAdminUserOrReadOnly, )
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.catalog_list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            self.catalog_retrieve, request, *args, **kwargs
+        )
+
+    def catalog_list(self, request, *args, **kwargs):
+        serializer = self.get_serializer(tags_catalog.all(), many=True)
+        return Response(serializer.data)
+
+    def catalog_retrieve(self, request, *args, **kwargs):
+        return catalog_row_response(self, tags_catalog)
+
 
-class IngredientsViewSet(viewsets.ModelViewSet):
-    """Работа с ингридиентами."""
+class IngredientsViewSet(SerializerTimingMixin, ConditionalGetMixin,
+                         viewsets.ModelViewSet):
+    """Работа с ингридиентами.
+
+    Список отдаётся из префиксного индекса в памяти: ?name= и ?limit=.
+    Отдельный ингридиент - оттуда же.
+    """
+    version_names = (INGREDIENTS_VERSION,)
     queryset = Ingredients.objects.all()
     serializer_class = IngredientsSerializer
     permission_classes = (IsAdminUserOrReadOnly, )
     pagination_class = None
-    filter_backends = [DynamicSearchFilter, filters.SearchFilter]
-    search_fields = ['^name', ]
 
+    def get_limit(self):
+        limit = self.request.query_params.get('limit')
+        if limit is None:
+            return INGREDIENTS_SEARCH_LIMIT
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= INGREDIENTS_SEARCH_MAX_LIMIT:
+            raise ValidationError(
+                {'limit': [LIMIT_INVALID.format(INGREDIENTS_SEARCH_MAX_LIMIT)]}
+            )
+        return limit
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(self.search, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            self.catalog_retrieve, request, *args, **kwargs
+        )
+
+    def catalog_retrieve(self, request, *args, **kwargs):
+        return catalog_row_response(self, ingredients_index)
 
-class RecipesViewSet(viewsets.ModelViewSet):
+    def search(self, request, *args, **kwargs):
+        ingredients = ingredients_index.search(
+            request.query_params.get('name', ''),
+            self.get_limit()
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
+
+class RecipesViewSet(SerializerTimingMixin, ConditionalGetMixin,
+                     viewsets.ModelViewSet):
     """Обработка запросов для Рицепта."""
+    version_names = (RECIPES_VERSION,)
+    per_user = True
     queryset = Recipes.objects.all()
     serializer_class = RecipesSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipesFilter
+    pagination_class = RecipesPagination
 
-    def get_serializer_class(self):
+    def is_conditional(self, request):
+        # Порядок popular меняют чужие отметки, счётчика версий у них
+        # нет: общий счётчик на каждую отметку был бы горячей строкой.
+        return request.query_params.get(
+            'ordering'
+        ) != RECIPES_ORDERING_POPULAR
+
+    def get_queryset(self):
         if self.action in ['retrieve', 'list']:
+            return Recipes.objects.with_user_flags(self.request.user)
+        return Recipes.objects.all()
+
+    def get_serializer_class(self):
+        if self.action in ['retrieve', 'list', 'cookable']:
             return RecipesListRetrieveSerializer
         return RecipesSerializer
 
+    def get_cookable_params(self):
+        params = self.request.query_params
+        try:
+            ingredient_ids = {
+                int(value) for value in params.get('ingredients', '').split(',')
+            }
+        except ValueError:
+            ingredient_ids = set()
+        if not 1 <= len(ingredient_ids) <= COOKABLE_MAX_INGREDIENTS:
+            raise ValidationError({'ingredients': [
+                COOKABLE_INGREDIENTS_INVALID.format(COOKABLE_MAX_INGREDIENTS)
+            ]})
+        max_missing = params.get('max_missing')
+        if max_missing is not None:
+            try:
+                max_missing = int(max_missing)
+            except ValueError:
+                max_missing = -1
+            if max_missing < 0:
+                raise ValidationError(
+                    {'max_missing': [COOKABLE_MAX_MISSING_INVALID]}
+                )
+        return ingredient_ids, max_missing
 
-class FavoritedView(APIView):
-    """Добавляем или удаляем из избранного."""
-    def post(self, request, *args, **kwargs):
-        user=self.request.user
-        recipe = get_object_or_404(Recipes, pk=self.kwargs.get('pk'))
-        if recipe.favorited_recipe.filter(id_user=user):
-            return Response(
-                {'detail': ['На этот рицепт вы уже подписаны.']},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        Favorited.objects.create(
-            id_user=user,
-            id_recipe=recipe
+    @action(detail=False, url_path='cookable')
+    def cookable(self, request):
+        """Что приготовить из того, что есть (?ingredients=1,2,3).
+
+        Рицепты хотя бы с одним из ингридиентов, первыми те, где
+        докупить нужно меньше всего (?max_missing=N - не больше N).
+        Ранжирование по индексу в памяти, из базы читается
+        только страница.
+        """
+        ingredient_ids, max_missing = self.get_cookable_params()
+        paginator = PageNumberPagination()
+        ranked = paginator.paginate_queryset(
+            cookable_index.cookable(ingredient_ids, max_missing),
+            request,
+            view=self
+        )
+        counts = {
+            recipe_id: (matched, missing)
+            for recipe_id, matched, missing in ranked
+        }
+        recipes = {
+            recipe.pk: recipe
+            for recipe in Recipes.objects.with_user_flags(
+                request.user
+            ).filter(pk__in=list(counts))
+        }
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in counts if pk in recipes],
+            many=True
         )
+        results = []
+        for item in serializer.data:
+            item['matched'], item['missing'] = counts[item['id']]
+            results.append(item)
+        return paginator.get_paginated_response(results)
+
+
+class UserRecipeView(APIView):
+    """Отметка рицепта пользователем (избранное, корзина).
+
+    Повторное добавление или удаление не ошибка: запрос просто
+    ничего не меняет. Неизвестный рицепт - 404.
+    """
+    model = None
+    created_status = status.HTTP_201_CREATED
+
+    def add(self, user, recipe_ids):
+        return self.model.objects.add(user.pk, recipe_ids)
+
+    def remove(self, user, recipe_ids):
+        return self.model.objects.remove(user.pk, recipe_ids)
+
+    def post(self, request, pk, format=None):
+        recipe = get_object_or_404(Recipes, pk=pk)
+        added = self.add(request.user, [recipe.pk])
         serializer = RecipesReductionSerializer(
-                recipe,
-                data=request.data,
-                context={'request': request}
-            )
-        serializer.is_valid(raise_exception=True)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)            
+            recipe,
+            context={'request': request}
+        )
+        return Response(
+            serialized(serializer),
+            status=self.created_status if added else status.HTTP_200_OK
+        )
 
     def delete(self, request, pk, format=None):
-        user=self.request.user
-        recipe = get_object_or_404(Recipes, pk=self.kwargs.get('pk'))
-        favorited = recipe.favorited_recipe.filter(id_user=user)
-        if not favorited:
-            return Response(
-                {'detail': ['Рицепт нет в избраном.']},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        favorited.delete()
+        # Рицепт ищется, только если удалять было нечего.
+        if not self.remove(request.user, [pk]) and not (
+            Recipes.objects.filter(pk=pk).exists()
+        ):
+            raise Http404
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class UserRecipeBatchView(APIView):
+    """Пакетно добавить и убрать рицепты: {"add": [id], "remove": [id]}.
+
+    В ответе id, которые действительно изменились.
+    """
+    toggle_view = None
+
+    def post(self, request, format=None):
+        serializer = RecipesBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        toggle = self.toggle_view()
+        with transaction.atomic():
+            removed = toggle.remove(
+                request.user, serializer.validated_data['remove']
+            )
+            added = toggle.add(request.user, serializer.validated_data['add'])
+        return Response({'added': added, 'removed': removed})
+
+
+class FavoritedView(UserRecipeView):
+    """Добавляем или удаляем из избранного."""
+    model = Favorited
+
+
+class FavoritedBatchView(UserRecipeBatchView):
+    """Пакетная правка избранного."""
+    toggle_view = FavoritedView
+
+
 class DownloadShoppingCartView(APIView):
-    """Скачать список ингридиентов для покупок."""
+    """Скачать список ингридиентов для покупок (?format=txt|csv|pdf)."""
+    renderer_classes = (TxtRenderer, CSVRenderer, PDFRenderer)
+    content_negotiation_class = FormatParamNegotiation
+    streaming_formats = {
+        'txt': render_txt,
+        'csv': render_csv,
+    }
+
     def get(self, request):
-        user = self.request.user
-        ingredients = RecipeIngredients.objects.filter(
-            id_recipe__shoppinglist_recipe__id_user=user
-        ).values_list(
-            'id_ingredient__name',
-            'id_ingredient__measurement_unit',
-        ).annotate(amount=Sum('amount')).order_by()
-        filename = 'Список_к_покупки_ингридиентов.txt'
-        shoppingList = 'Список ингридиентов:\n\n'
-        for name, unit, amount in ingredients:
-            shoppingList += f'{name}: {amount} {unit}\n'
-        response = HttpResponse(
-            shoppingList,
-            content_type='text/plain'
-        )
+        export_format = request.accepted_renderer.format
+        content_type = request.accepted_media_type
+        filename = f'{SHOPPING_LIST_FILENAME}.{export_format}'
+        rows = shopping_list_rows(self.request.user)
+        if export_format in self.streaming_formats:
+            response = StreamingHttpResponse(
+                self.streaming_formats[export_format](rows),
+                content_type=f'{content_type}; charset=utf-8'
+            )
+        else:
+            content = render_pdf(rows)
+            etag = quote_etag(hashlib.md5(content).hexdigest())
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = HttpResponse(content, content_type=content_type)
+                response['Content-Length'] = len(content)
+            response['ETag'] = etag
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
 
 
-class AddCartView(APIView):
+class AddCartView(UserRecipeView):
     """Добавить или удалить из корзины."""
-    def post(self, request, *args, **kwargs):
-        user=self.request.user
-        recipe = get_object_or_404(Recipes, pk=self.kwargs.get('pk'))
-        if recipe.shoppinglist_recipe.filter(id_user=user):
-            return Response(
-                {'detail': ['Выуже добавии этот рицепт.']},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        ShoppingList.objects.create(
-            id_user=self.request.user,
-            id_recipe=recipe
-        )
-        serializer = RecipesReductionSerializer(
-            recipe,
-            data=request.data,
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+    model = ShoppingList
+    created_status = status.HTTP_200_OK
 
-    def delete(self, request, pk, format=None):
-        user=self.request.user
-        recipe = get_object_or_404(Recipes, pk=self.kwargs.get('pk'))
-        shoppingList = recipe.shoppinglist_recipe.filter(id_user=user)
-        if not shoppingList:
-            text = 'Вы уже удалиле рицепт из корзины или не добавляли.'
-            return Response(
-                {'detail': [text]},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        shoppingList.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @transaction.atomic(savepoint=False)
+    def add(self, user, recipe_ids):
+        added = super().add(user, recipe_ids)
+        ShoppingCartIngredients.objects.apply_recipes(user.pk, added, 1)
+        return added
+
+    @transaction.atomic(savepoint=False)
+    def remove(self, user, recipe_ids):
+        removed = super().remove(user, recipe_ids)
+        ShoppingCartIngredients.objects.apply_recipes(user.pk, removed, -1)
+        return removed
+
+
+class AddCartBatchView(UserRecipeBatchView):
+    """Пакетная правка корзины."""
+    toggle_view = AddCartView
@@ -0,0 +1,73 @@
+"""Общее для панелей админки над большими таблицами.
+
+Страница списка такой панели - постоянное число запросов: связи
+подгружаются list_select_related, счётчики - подзапросами только для
+строк страницы, фильтры ограничены, а число строк без фильтров берётся
+из статистики PostgreSQL, без COUNT(*) по всей таблице.
+"""
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой числа строк для больших таблиц.
+
+    Без фильтров на PostgreSQL число строк - pg_class.reltuples
+    (обновляется VACUUM и ANALYZE). Пока оценка не больше exact_limit
+    или список отфильтрован, считается точно.
+    """
+    exact_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, models.QuerySet):
+            return super().count
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate > self.exact_limit:
+                return estimate
+        # Подзапросы-счётчики панели для COUNT(*) не нужны.
+        return queryset.values('pk').count()
+
+
+def estimated_count(model, using):
+    """Оценка числа строк таблицы model; -1, если оценки нет."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return -1
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class '
+            'WHERE oid = to_regclass(%s)',
+            [connection.ops.quote_name(model._meta.db_table)]
+        )
+        row = cursor.fetchone()
+    return row[0] if row is not None and row[0] is not None else -1
+
+
+def related_count(model, field):
+    """Подзапрос: число строк model, у которых field - строка списка."""
+    return Coalesce(models.Subquery(
+        model.objects.filter(
+            **{field: models.OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=models.Count('pk')
+        ).values('total'),
+        output_field=models.IntegerField(),
+    ), 0)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Панель для таблицы, которая может быть большой.
+
+    Общего числа строк рядом с отфильтрованным нет - это второй
+    COUNT(*). Внешние ключи в формах выбираются поиском
+    (autocomplete_fields), а не списком всех строк.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
@@ -1,7 +1,9 @@
 import os
 
-from django.core.asgi import get_asgi_application
-
+# Настройки - до импорта Django: он читает их при загрузке.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+from django.core.asgi import get_asgi_application  # noqa: E402
 
 application = get_asgi_application()
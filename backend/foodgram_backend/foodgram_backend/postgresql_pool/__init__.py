@@ -0,0 +1,5 @@
+"""PostgreSQL с пулом соединений в каждом процессе.
+
+ENGINE = 'foodgram_backend.postgresql_pool', настройки пула -
+в DATABASES[...]['POOL'] (SIZE, TIMEOUT, MAX_AGE, CHECK_AFTER).
+"""
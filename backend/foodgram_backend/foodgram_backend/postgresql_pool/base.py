@@ -0,0 +1,30 @@
+from django.db.backends.postgresql import base
+
+from .creation import DatabaseCreation
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Соединения берутся из пула процесса и возвращаются в него.
+
+    Django закрывает соединение в конце запроса (CONN_MAX_AGE = 0)
+    или по сроку - вместо закрытия оно уходит обратно в пул.
+    """
+    creation_class = DatabaseCreation
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        connection = self.pool.acquire(lambda: connect(conn_params))
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
@@ -0,0 +1,25 @@
+from django.db import OperationalError
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .pool import PoolExhausted
+
+# Через сколько секунд клиенту стоит повторить запрос.
+RETRY_AFTER = 1
+
+
+class PoolExhaustedMiddleware(MiddlewareMixin):
+    """Исчерпанный пул соединений - 503 с Retry-After, а не 500."""
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, OperationalError) or not isinstance(
+            exception.__cause__, PoolExhausted
+        ):
+            return None
+        response = JsonResponse(
+            {'detail': ['Сервер перегружен, повторите запрос позже.']},
+            status=503,
+            json_dumps_params={'ensure_ascii': False},
+        )
+        response['Retry-After'] = RETRY_AFTER
+        return response
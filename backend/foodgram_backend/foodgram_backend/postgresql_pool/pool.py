@@ -0,0 +1,223 @@
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+# Границы гистограммы ожидания соединения, с.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class PoolExhausted(psycopg2.OperationalError):
+    """Свободного соединения не дождались за TIMEOUT секунд."""
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений psycopg2 одного процесса.
+
+    Соединение отдаётся потоку на время запроса и возвращается
+    при закрытии. Занятых не больше size, ждущие обслуживаются по
+    очереди; кто не дождался за timeout, получает PoolExhausted.
+    Старше max_age соединения пересоздаются, простоявшие дольше
+    check_after проверяются SELECT 1 перед выдачей.
+    """
+
+    def __init__(self, size, timeout, max_age, check_after):
+        self.size = size
+        self.timeout = timeout
+        self.max_age = max_age
+        self.check_after = check_after
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.turn = threading.Condition(self.lock)
+        self.waiters = deque()
+        # (соединение, когда создано, когда возвращено), последним
+        # берётся самое свежее.
+        self.idle = deque()
+        self.born = {}
+        self.in_use = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def acquire(self, connect):
+        started = time.monotonic()
+        self.take_slot(started + self.timeout)
+        waited = time.monotonic() - started
+        try:
+            connection = self.take_idle()
+            if connection is None:
+                connection = connect()
+                with self.lock:
+                    self.born[connection] = time.monotonic()
+                    self.created += 1
+        except BaseException:
+            self.free_slot()
+            raise
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.wait_counts[
+                next(
+                    (index for index, bound in enumerate(WAIT_BUCKETS)
+                     if waited <= bound),
+                    len(WAIT_BUCKETS)
+                )
+            ] += 1
+        return connection
+
+    def take_slot(self, deadline):
+        with self.turn:
+            ticket = object()
+            self.waiters.append(ticket)
+            while self.waiters[0] is not ticket or self.in_use >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.waiters.remove(ticket)
+                    self.timeouts += 1
+                    self.turn.notify_all()
+                    raise PoolExhausted(
+                        'Нет свободного соединения с базой за {} с.'.format(
+                            self.timeout
+                        )
+                    )
+                self.turn.wait(remaining)
+            self.waiters.popleft()
+            self.in_use += 1
+            self.turn.notify_all()
+
+    def free_slot(self):
+        with self.turn:
+            self.in_use -= 1
+            self.turn.notify_all()
+
+    def take_idle(self):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    return None
+                connection, born, returned = self.idle.pop()
+            now = time.monotonic()
+            if now - born > self.max_age or (
+                now - returned > self.check_after
+                and not self.is_healthy(connection)
+            ):
+                self.discard(connection)
+                continue
+            return connection
+
+    @staticmethod
+    def is_healthy(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    def release(self, connection):
+        """Возвращает соединение; сломанное или в транзакции - сброс."""
+        try:
+            if self.reset(connection):
+                with self.lock:
+                    self.idle.append(
+                        (connection, self.born[connection], time.monotonic())
+                    )
+            else:
+                self.discard(connection)
+        finally:
+            self.free_slot()
+
+    @staticmethod
+    def reset(connection):
+        if connection.closed:
+            return False
+        status = connection.get_transaction_status()
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        try:
+            connection.rollback()
+        except psycopg2.Error:
+            return False
+        return True
+
+    def discard(self, connection):
+        with self.lock:
+            self.born.pop(connection, None)
+            self.discarded += 1
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def clear(self):
+        """Закрывает свободные соединения (например, перед DROP DATABASE)."""
+        with self.lock:
+            idle, self.idle = list(self.idle), deque()
+        for connection, *_ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        """Счётчики пула: загрузка и ожидание соединений."""
+        with self.lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self.idle),
+                'open': len(self.born),
+                'utilization': self.in_use / self.size,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'discarded': self.discarded,
+                'wait_seconds_total': self.wait_total,
+                'wait_seconds_max': self.wait_max,
+                'wait_buckets': dict(
+                    zip(WAIT_BUCKETS + (float('inf'),), self.wait_counts)
+                ),
+            }
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    """Пул базы alias в этом процессе (после fork - новый).
+
+    Смена базы в настройках (например, тестовая) даёт отдельный пул.
+    """
+    key = (alias,) + tuple(
+        settings_dict.get(name) for name in ('NAME', 'HOST', 'PORT', 'USER')
+    )
+    pool = pools.get(key)
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+    options = settings_dict.get('POOL', {})
+    with pools_lock:
+        pool = pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = pools[key] = ConnectionPool(
+                size=options.get('SIZE', 5),
+                timeout=options.get('TIMEOUT', 1.0),
+                max_age=options.get('MAX_AGE', 1800),
+                check_after=options.get('CHECK_AFTER', 30),
+            )
+    return pool
+
+
+def pool_stats():
+    """{alias: счётчики} пулов процесса."""
+    return {
+        key[0]: pool.stats() for key, pool in list(pools.items())
+        if pool.pid == os.getpid()
+    }
@@ -1,16 +1,21 @@
 # flake8: noqa
 import os
-import uuid
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-SECRET_KEY = os.getenv('SECRET_KEY', uuid.uuid4())
+# Общий для всех процессов: им подписываются JWT. Случайный ключ у
+# каждого воркера сделал бы чужие токены недействительными.
+SECRET_KEY = os.getenv('SECRET_KEY')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Задайте SECRET_KEY в окружении или .env.')
 
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
@@ -33,6 +38,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'foodgram_backend.postgresql_pool.middleware.PoolExhaustedMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,14 +69,54 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
+# Пул соединений в каждом процессе, включается явно: DB_POOL_SIZE = 0
+# (по умолчанию) - без пула. Поток держит не больше одного соединения,
+# так что размер - число потоков процесса с базой (--threads gunicorn,
+# под ASGI - ASYNC_DB_THREADS), а воркеры x DB_POOL_SIZE по всем
+# серверам должны помещаться в max_connections PostgreSQL с запасом.
+# Кто не дождался соединения за DB_POOL_TIMEOUT с, получает 503.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram_backend.postgresql_pool' if DB_POOL_SIZE
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
         'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 1)),
+            'MAX_AGE': int(os.getenv('DB_POOL_MAX_AGE', 1800)),
+            'CHECK_AFTER': int(os.getenv('DB_POOL_CHECK_AFTER', 30)),
+        },
+    }
+}
+
+# Локальные прогоны (например, manage.py bench-api) без PostgreSQL:
+# DB_SQLITE - путь к файлу базы SQLite.
+if os.getenv('DB_SQLITE'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_SQLITE'),
+        }
+    }
+
+# Общий кэш (фрагменты рицептов). При нескольких воркерах нужен общий
+# для них бэкенд, например memcached.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -104,6 +151,31 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Варианты картинок рицептов делает отдельный процесс
+# manage.py process-images --watch (сервис images в docker-compose).
+# Больше 0 - столько потоков обработки в каждом процессе сервера.
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 0))
+
+# Под ASGI (foodgram_backend/asgi.py) виды чтения асинхронные, а работа
+# с базой идёт в пуле из ASYNC_DB_THREADS потоков на процесс.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', 4))
+
+# Метрики /api/_metrics: каждый процесс раз в METRICS_FLUSH_INTERVAL
+# секунд пишет свои счётчики в METRICS_DIR, адрес складывает все файлы.
+# Каталог общий для воркеров одного сервера; пустой - только свой процесс.
+METRICS_DIR = os.getenv(
+    'METRICS_DIR',
+    os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+# Шрифт с кириллицей для PDF списка покупок.
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
@@ -113,7 +185,9 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
 
+    # JWT (Bearer) без запросов к базе; старые токены (Token) пока работают.
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
 
@@ -126,10 +200,24 @@ REST_FRAMEWORK = {
 AUTH_USER_MODEL = 'users.Users'
 
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_MINUTES', 15))
+    ),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_DAYS', 7))
+    ),
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'SIGNING_KEY': SECRET_KEY,
 }
 
+# Как часто (с) процесс перечитывает список отозванных токенов.
+JWT_DENYLIST_REFRESH = int(os.getenv('JWT_DENYLIST_REFRESH', 5))
+
+# Сколько (с) процесс помнит, что владелец токена есть и активен.
+# Отключение или удаление пользователя доходит до всех процессов за
+# JWT_DENYLIST_REFRESH.
+JWT_USER_CHECK_TIMEOUT = int(os.getenv('JWT_USER_CHECK_TIMEOUT', 60))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
 }
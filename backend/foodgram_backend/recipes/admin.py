@@ -1,5 +1,9 @@
 # flake8: noqa
+import contextlib
+
 from django.contrib import admin
+from django.db import transaction
+from foodgram_backend.admin_tools import LargeTableAdmin, related_count
 
 from recipes.models import (
     Tags,
@@ -9,9 +13,44 @@ from recipes.models import (
     RecipeIngredients,
     Favorited,
     ShoppingList,
+    ShoppingCartIngredients,
 )
 
 
+@contextlib.contextmanager
+def carts_recomposed(recipe_ids):
+    """Правка состава рицептов внутри блока доходит до сумм корзин.
+
+    Корзины, где лежат рицепты, вычитают старый состав и прибавляют
+    новый - как RecipesPanel.save_related.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    with transaction.atomic():
+        for recipe_id in recipe_ids:
+            ShoppingCartIngredients.objects.apply_recipe(recipe_id, -1)
+        yield
+        for recipe_id in recipe_ids:
+            ShoppingCartIngredients.objects.apply_recipe(recipe_id, 1)
+
+
+class UserRecipeMarkPanel(LargeTableAdmin):
+    """Отметка пользователя: добавить или удалить, но не перенести."""
+    list_display = (
+        'pk',
+        'id_user',
+        'id_recipe',
+    )
+    list_select_related = ('id_user', 'id_recipe__author')
+    autocomplete_fields = ('id_user', 'id_recipe')
+    ordering = ('-pk',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Счётчики и суммы корзины ведутся при создании и удалении.
+        if obj is not None:
+            return ('id_user', 'id_recipe')
+        return ()
+
+
 class TagsPanel(admin.ModelAdmin):
     list_display = (
         'pk',
@@ -24,21 +63,31 @@ class TagsPanel(admin.ModelAdmin):
         'color',
         'slug'
     )
+    search_fields = ('name', 'slug')
     empty_value_display = '_пусто_'
 
 
-class IngredientsPanel(admin.ModelAdmin):
+class IngredientsPanel(LargeTableAdmin):
     list_display = (
         'pk',
         'name',
         'measurement_unit',
+        'count_recipes',
     )
-    list_filter = ('name', )
     search_fields = ('name',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=related_count(RecipeIngredients, 'id_ingredient')
+        )
+
+    def count_recipes(self, obj):
+        return obj.recipes_total
+
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredients
+    autocomplete_fields = ('id_ingredient',)
     min_num = 1
 
 
@@ -47,73 +96,77 @@ class RecipesTags(admin.TabularInline):
     min_num = 1
 
 
-class RecipesPanel(admin.ModelAdmin):
+class RecipesPanel(LargeTableAdmin):
     list_display = (
         'pk',
         'name',
         'author',
         'count_favorites',
+        'in_carts_count',
     )
-    list_editable = (
-        'name',
-        'author'
-    )
+    list_editable = ('name',)
+    list_select_related = ('author',)
     inlines = (RecipeIngredientInline, RecipesTags)
-    list_filter = ('name', 'author', 'tags')
-    empty_value_display = '-пусто-'
+    list_filter = ('tags',)
+    search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author',)
+
+    def get_queryset(self, request):
+        # Автор нужен в __str__ рицепта и для подсказок autocomplete.
+        return super().get_queryset(request).select_related('author')
 
     def count_favorites(self, obj):
-        return obj.favorited_recipe.count()
+        return obj.favorites_count
 
+    count_favorites.admin_order_field = 'favorites_count'
 
-class TagsRecipesPanel(admin.ModelAdmin):
+    def save_related(self, request, form, formsets, change):
+        if change:
+            ShoppingCartIngredients.objects.apply_recipe(form.instance.pk, -1)
+        super().save_related(request, form, formsets, change)
+        ShoppingCartIngredients.objects.apply_recipe(form.instance.pk, 1)
+
+
+class TagsRecipesPanel(LargeTableAdmin):
     list_display = (
         'pk',
         'id_recipe',
         'id_teg',
     )
-    list_editable = (
-        'id_recipe',
-        'id_teg',
-    )
+    list_select_related = ('id_recipe__author', 'id_teg')
+    list_filter = ('id_teg',)
+    autocomplete_fields = ('id_recipe', 'id_teg')
+    ordering = ('-pk',)
 
 
-class RecipeIngredientsPanel(admin.ModelAdmin):
+class RecipeIngredientsPanel(LargeTableAdmin):
     list_display = (
         'pk',
         'id_ingredient',
         'id_recipe',
         'amount'
     )
-    list_editable = (
-        'id_ingredient',
-        'id_recipe',
-        'amount'
-    )
-
+    list_editable = ('amount',)
+    list_select_related = ('id_ingredient', 'id_recipe__author')
+    autocomplete_fields = ('id_ingredient', 'id_recipe')
+    ordering = ('-pk',)
 
-class FavoritedPanel(admin.ModelAdmin):
-    list_display = (
-        'pk',
-        'id_user',
-        'id_recipe',
-    )
-    list_editable = (
-        'id_user',
-        'id_recipe',
-    )
+    def save_model(self, request, obj, form, change):
+        # Строку могли перенести в другой рицепт: старый тоже меняется.
+        recipe_ids = [obj.id_recipe_id]
+        if change and form.initial.get('id_recipe') is not None:
+            recipe_ids.append(form.initial['id_recipe'])
+        with carts_recomposed(recipe_ids):
+            super().save_model(request, obj, form, change)
 
+    def delete_model(self, request, obj):
+        with carts_recomposed([obj.id_recipe_id]):
+            super().delete_model(request, obj)
 
-class ShoppingListPanel(admin.ModelAdmin):
-    list_display = (
-        'pk',
-        'id_user',
-        'id_recipe',
-    )
-    list_editable = (
-        'id_user',
-        'id_recipe',
-    )
+    def delete_queryset(self, request, queryset):
+        recipe_ids = queryset.order_by().values_list('id_recipe', flat=True)
+        with carts_recomposed(recipe_ids):
+            super().delete_queryset(request, queryset)
 
 
 admin.site.register(Tags, TagsPanel)
@@ -121,5 +174,5 @@ admin.site.register(Ingredients, IngredientsPanel)
 admin.site.register(Recipes, RecipesPanel)
 admin.site.register(TagsRecipes, TagsRecipesPanel)
 admin.site.register(RecipeIngredients, RecipeIngredientsPanel)
-admin.site.register(Favorited, FavoritedPanel)
-admin.site.register(ShoppingList, ShoppingListPanel)
+admin.site.register(Favorited, UserRecipeMarkPanel)
+admin.site.register(ShoppingList, UserRecipeMarkPanel)
@@ -9,3 +9,50 @@ WITHDRAWAL_CALL_RECIPES = 3  # Количество рецептов на стр
 MESSAGE_MINEMUM = 'Ингридиентов не должно быть меньше 1.'
 MESSAGE_HIGHS = 'Ингридиентов слишком много.'
 AT_LEAST_ONE_INGREDIENT = 'Должен быть хотябы один ингридиент.'
+INGREDIENTS_DUPLICATE = 'Ингридиенты не должны повторяться: {}.'
+INGREDIENTS_NOT_FOUND = 'Нет ингридиентов с id: {}.'
+RECIPES_BATCH_EMPTY = 'Укажите рицепты в add или remove.'
+RECIPES_LIMIT_INVALID = 'recipes_limit должен быть целым числом от 0.'
+LIMIT_INVALID = 'limit должен быть целым числом от 1 до {}.'
+SHOPPING_LIST_CHUNK_SIZE = 500           # Строк списка покупок за выборку
+INGREDIENTS_VERSION = 'ingredients'      # Имя счётчика изменений ингридиентов
+TAGS_VERSION = 'tags'                    # Имя счётчика изменений тегов
+RECIPES_VERSION = 'recipes'              # Имя счётчика изменений рицептов
+USER_MARKS_VERSION = 'marks:{}'          # Счётчик отметок пользователя
+USERS_ACCESS_VERSION = 'users-access'    # Счётчик отключений пользователей
+INGREDIENTS_SEARCH_LIMIT = 30            # Подсказок ингридиентов по умолчанию
+INGREDIENTS_SEARCH_MAX_LIMIT = 500       # Наибольший limit подсказок
+INGREDIENTS_INFIX_MIN_LENGTH = 2         # Короче - без поиска по вхождению
+IMPORT_BATCH_SIZE = 5000                 # Строк в одной вставке импорта
+IMPORT_READ_CHUNK = 64 * 1024            # Символов за одно чтение JSON-файла
+RECIPES_BATCH_MAX = 100                  # Рицептов в одном пакетном запросе
+RECIPES_SEARCH_CONFIG = 'russian'        # Словарь полнотекстового поиска
+RECIPES_ORDERING_POPULAR = 'popular'     # ordering: сначала самые избранные
+POPULAR_ORDERING = [                     # Порядок (и индекс) для popular
+    '-favorites_count', '-pub_date', '-id'
+]
+COUNTERS_BATCH_SIZE = 1000               # Рицептов за один пересчёт счётчиков
+COOKABLE_MAX_INGREDIENTS = 100           # Ингридиентов в запросе "что есть"
+COOKABLE_INGREDIENTS_INVALID = (
+    'ingredients - id ингридиентов через запятую, от 1 до {}.'
+)
+COOKABLE_MAX_MISSING_INVALID = 'max_missing должен быть целым числом от 0.'
+COOKABLE_GAP_TIMEOUT = 60                # Сколько ждать пропуск в журнале, с
+COOKABLE_CHECK_EVERY = 2                 # Как часто сверяться с журналом, с
+COOKABLE_LOG_KEEP = 60 * 60 * 24         # Сколько хранить журнал состава, с
+COOKABLE_LOG_TRIM_EVERY = 60 * 60        # Как часто чистить журнал, с
+COOKABLE_REBUILD_CHANGES = 1000          # Больше изменений - сборка заново
+RECIPE_CACHE_PREFIX = 'recipe-fragment'  # Префикс ключей кэша рицептов
+RECIPE_CACHE_SCHEMA = 2                  # Версия формата фрагмента
+RECIPE_CACHE_TIMEOUT = 60 * 60 * 24      # Жизнь фрагмента в секундах
+RECIPE_CACHE_LOCAL_SIZE = 1024           # Размер LRU в памяти процесса
+RECIPE_IMAGE_DIR = 'recipes/images/'     # Каталог картинок рицептов
+RECIPE_IMAGE_QUALITY = 85                # Качество JPEG и WebP вариантов
+RECIPE_IMAGE_BATCH_SIZE = 100            # Рицептов за выборку process-images
+RECIPE_IMAGE_VARIANTS = {                # Варианты картинки рицепта
+    'thumbnail': {'size': (160, 160), 'format': 'jpeg', 'crop': True},
+    'card': {'size': (640, 480), 'format': 'jpeg', 'crop': True},
+    'full': {'size': (1600, 1600), 'format': 'jpeg', 'crop': False},
+    'webp': {'size': (1600, 1600), 'format': 'webp', 'crop': False},
+}
+JWT_USERS_MEMO_MAX = 10000               # Владельцев JWT в памяти процесса
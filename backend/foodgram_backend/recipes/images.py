@@ -0,0 +1,153 @@
+"""Картинки рицептов: имена по хэшу содержимого и готовые варианты."""
+import hashlib
+import io
+import logging
+import os.path
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from django.dispatch import Signal
+from django.utils.deconstruct import deconstructible
+from PIL import Image, ImageOps
+from recipes.configurations import (RECIPE_IMAGE_DIR, RECIPE_IMAGE_QUALITY,
+                                    RECIPE_IMAGE_VARIANTS)
+
+logger = logging.getLogger(__name__)
+
+# Варианты картинок рицептов готовы: recipe_ids - список id.
+images_ready = Signal()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище файлов с именем по хэшу содержимого.
+
+    Файл с таким именем уже лежит с тем же содержимым,
+    поэтому повторная загрузка ничего не пишет.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is not None and self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def recipe_image_path(instance, filename):
+    """recipes/images/ab/abcdef....png по sha256 загруженного файла."""
+    digest = hashlib.sha256()
+    for chunk in instance.image.file.chunks():
+        digest.update(chunk)
+    instance.image.file.seek(0)
+    digest = digest.hexdigest()
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{RECIPE_IMAGE_DIR}{digest[:2]}/{digest}{extension}'
+
+
+def variant_name(name, variant):
+    """Имя файла варианта рядом с оригиналом."""
+    spec = RECIPE_IMAGE_VARIANTS[variant]
+    return '{}/{}.{}'.format(
+        os.path.splitext(name)[0], variant, spec['format']
+    )
+
+
+def variant_urls(name, ready):
+    """Ссылки на варианты; пока они не готовы - на оригинал."""
+    if not name:
+        return None
+    return {
+        variant: content_storage.url(
+            variant_name(name, variant) if ready else name
+        )
+        for variant in RECIPE_IMAGE_VARIANTS
+    }
+
+
+def render_variant(source, spec):
+    if spec['crop']:
+        image = ImageOps.fit(source, spec['size'], Image.LANCZOS)
+    else:
+        image = source.copy()
+        image.thumbnail(spec['size'], Image.LANCZOS)
+    if spec['format'] == 'jpeg' and image.mode != 'RGB':
+        # У JPEG нет прозрачности: подкладываем белый фон.
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        spec['format'].upper(),
+        quality=RECIPE_IMAGE_QUALITY,
+        optimize=True,
+    )
+    return buffer.getvalue()
+
+
+def make_variants(name):
+    """Создаёт недостающие варианты картинки name.
+
+    Имена вариантов выводятся из имени оригинала, поэтому
+    повторный вызов только проверяет, что файлы на месте.
+    """
+    missing = [
+        variant for variant in RECIPE_IMAGE_VARIANTS
+        if not content_storage.exists(variant_name(name, variant))
+    ]
+    if not missing:
+        return
+    with content_storage.open(name) as source_file:
+        source = Image.open(source_file)
+        source.load()
+    source = ImageOps.exif_transpose(source)
+    for variant in missing:
+        content_storage.save(
+            variant_name(name, variant),
+            ContentFile(
+                render_variant(source, RECIPE_IMAGE_VARIANTS[variant])
+            )
+        )
+
+
+class ImageProcessor:
+    """Обработка картинок в фоновых потоках процесса.
+
+    При RECIPE_IMAGE_WORKERS = 0 ничего не запускает: картинки
+    обрабатывает отдельный процесс manage.py process-images.
+    """
+
+    def __init__(self):
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, function, *args):
+        workers = settings.RECIPE_IMAGE_WORKERS
+        if workers < 1:
+            return
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix='recipe-images',
+                )
+        self.executor.submit(self.run, function, *args)
+
+    @staticmethod
+    def run(function, *args):
+        try:
+            function(*args)
+        except Exception:
+            logger.exception('Не удалось обработать картинку рицепта.')
+        finally:
+            connection.close()
+
+
+image_processor = ImageProcessor()
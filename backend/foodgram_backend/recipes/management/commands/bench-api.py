@@ -0,0 +1,263 @@
+import itertools
+import json
+import subprocess
+import tempfile
+import time
+import urllib.request
+
+from api.benchmark import SERVERS, ServerError, drive, run_server
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import Ingredients, Recipes, ShoppingList, Tags
+from recipes.synthetic import DEFAULT_SIZES, bench_user, seed
+from rest_framework.authtoken.models import Token
+from users.models import Subscriptions
+
+# Как часто воркеры сервера прогона сбрасывают метрики на диск, с.
+METRICS_FLUSH_INTERVAL = 1
+# Что сравнивается с прошлым прогоном: метрика и лучше ли больше.
+COMPARED = (
+    ('rps', True),
+    ('p95_ms', False),
+    ('queries_per_request', False),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон API на наборе bench-*: все сочетания '
+        'фильтров рицептов, подсказки ингридиентов, подписки, '
+        'избранное и корзина, список покупок. Итог - JSON с '
+        'запросами в секунду, p50/p95/p99 и SQL на запрос.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_SIZES.items():
+            parser.add_argument(
+                '--{}'.format(name.replace('_', '-')),
+                type=int,
+                default=default,
+                help='Размер набора (если его ещё нет).'
+            )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--server',
+            choices=sorted(SERVERS),
+            default='wsgi',
+        )
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=3,
+            help='Секунд нагрузки на каждый сценарий.'
+        )
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            dest='scenarios',
+            help='Только сценарии с таким началом имени (можно несколько).'
+        )
+        parser.add_argument('--output', help='Записать JSON в файл.')
+        parser.add_argument(
+            '--baseline',
+            help='JSON прошлого прогона: ухудшения - ошибка команды.'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимое ухудшение относительно --baseline (доля).'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--workers и --concurrency должны быть >= 1.')
+        sizes = seed(options['seed'], **{
+            name: options[name] for name in DEFAULT_SIZES
+        })
+        user = bench_user()
+        token, _ = Token.objects.get_or_create(user=user)
+        headers = {'Authorization': 'Token {}'.format(token.key)}
+        scenarios = [
+            (name, requests) for name, requests in self.get_scenarios(user)
+            if not options['scenarios'] or name.startswith(
+                tuple(options['scenarios'])
+            )
+        ]
+        if not scenarios:
+            raise CommandError('Нет сценариев с такими именами.')
+        results = {}
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            try:
+                with run_server(options['server'], options['workers'], {
+                    'METRICS_DIR': metrics_dir,
+                    'METRICS_FLUSH_INTERVAL': str(METRICS_FLUSH_INTERVAL),
+                }) as (base_url, process):
+                    # Прогрев: справочники и индексы в памяти, кэш.
+                    drive(base_url, [
+                        request for _, requests in scenarios
+                        for request in requests
+                    ], options['workers'], 2, headers)
+                    for name, requests in scenarios:
+                        self.stderr.write('Сценарий {}...'.format(name))
+                        results[name] = self.run_scenario(
+                            base_url, requests, headers, options
+                        )
+            except ServerError as error:
+                raise CommandError(error)
+        report = {
+            'commit': current_commit(),
+            'database': connection.vendor,
+            'server': options['server'],
+            'workers': options['workers'],
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'dataset': dict(sizes, seed=options['seed']),
+            'scenarios': results,
+        }
+        regressions = []
+        if options['baseline']:
+            with open(options['baseline']) as stream:
+                baseline = json.load(stream)
+            regressions = compare(
+                baseline['scenarios'], results, options['tolerance']
+            )
+            report['baseline'] = baseline.get('commit')
+            report['regressions'] = regressions
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                stream.write(output + '\n')
+        self.stdout.write(output)
+        if regressions:
+            raise CommandError(
+                'Ухудшений относительно {}: {}.'.format(
+                    options['baseline'], len(regressions)
+                )
+            )
+
+    def get_scenarios(self, user):
+        """(имя, [(метод, путь)]) по набору bench-*."""
+        slugs = list(Tags.objects.filter(
+            slug__startswith='bench-'
+        ).order_by('id').values_list('slug', flat=True)[:2])
+        author = Subscriptions.objects.filter(
+            id_subscriber=user
+        ).order_by('id').values_list('id_writer', flat=True).first()
+        filters = {
+            'tags': '&'.join('tags={}'.format(slug) for slug in slugs),
+            'author': 'author={}'.format(author or user.pk),
+            'is_favorited': 'is_favorited=1',
+            'is_in_shopping_cart': 'is_in_shopping_cart=1',
+            'search': 'search=суп',
+        }
+        for size in range(len(filters) + 1):
+            for names in itertools.combinations(filters, size):
+                yield 'recipes' + ''.join('+' + name for name in names), [(
+                    'GET',
+                    '/api/recipes/?' + '&'.join(
+                        filters[name] for name in names
+                    ),
+                )]
+        names = Ingredients.objects.order_by('id').values_list(
+            'name', flat=True
+        )[:20]
+        yield 'ingredients', [
+            ('GET', '/api/ingredients/?name={}'.format(name[:prefix]))
+            for name in names for prefix in (1, 3)
+        ]
+        yield 'subscriptions', [('GET', '/api/users/subscriptions/')]
+        recipe_ids = list(Recipes.objects.exclude(
+            pk__in=ShoppingList.objects.filter(
+                id_user=user
+            ).values('id_recipe')
+        ).order_by('id').values_list('id', flat=True)[:20])
+        for name, url in (
+            ('favorite', '/api/recipes/{}/favorite/'),
+            ('shopping_cart', '/api/recipes/{}/shopping_cart/'),
+        ):
+            yield name, [
+                (method, url.format(pk))
+                for pk in recipe_ids for method in ('POST', 'DELETE')
+            ]
+        yield 'download_shopping_cart', [
+            ('GET', '/api/recipes/download_shopping_cart/?format={}'.format(
+                export_format
+            ))
+            for export_format in ('txt', 'csv')
+        ]
+
+    def run_scenario(self, base_url, requests, headers, options):
+        before = scrape(base_url, headers)
+        result = drive(
+            base_url,
+            requests,
+            options['concurrency'],
+            options['duration'],
+            headers,
+        )
+        # Другие воркеры сбрасывают счётчики раз в интервал.
+        time.sleep(METRICS_FLUSH_INTERVAL * 1.5)
+        after = scrape(base_url, headers)
+        served = after['requests'] - before['requests']
+        result['queries_per_request'] = round(
+            (after['queries'] - before['queries']) / served, 2
+        ) if served else None
+        return result
+
+
+def scrape(base_url, headers):
+    """Запросы и SQL всех маршрутов, кроме самих метрик."""
+    request = urllib.request.Request(
+        base_url + '/api/_metrics', headers=headers
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        text = response.read().decode('utf-8')
+    totals = {'requests': 0, 'queries': 0}
+    for line in text.splitlines():
+        if line.startswith('#') or 'route="MetricsView"' in line:
+            continue
+        name, _, value = line.rpartition(' ')
+        if name.startswith('foodgram_request_seconds_count{'):
+            totals['requests'] += float(value)
+        elif name.startswith('foodgram_sql_queries_total{'):
+            totals['queries'] += float(value)
+    return totals
+
+
+def compare(baseline, results, tolerance):
+    """Сценарии, где метрика хуже прошлой больше, чем на tolerance."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric, higher_better in COMPARED:
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (old - new if higher_better else new - old) / old
+            if change > tolerance:
+                regressions.append({
+                    'scenario': name,
+                    'metric': metric,
+                    'baseline': old,
+                    'current': new,
+                })
+    return regressions
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,101 @@
+import json
+
+from api.benchmark import (SERVERS, ServerError, drive, process_tree_rss,
+                           run_server)
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = [
+    '/api/recipes/',
+    '/api/recipes/?limit=20&page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=с',
+    '/api/users/subscriptions/',
+    '/api/recipes/download_shopping_cart/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение WSGI и ASGI: одинаковое число процессов gunicorn, '
+        'пропускная способность, p50/p99 и память. Итог - JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--servers',
+            nargs='+',
+            choices=sorted(SERVERS),
+            default=['wsgi', 'asgi'],
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Процессов gunicorn у каждого сервера.'
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--duration',
+            type=int,
+            default=20,
+            help='Секунд нагрузки на каждый сервер.'
+        )
+        parser.add_argument(
+            '--token',
+            help='Токен пользователя: без него личные адреса дают 401.'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Адрес для нагрузки (можно несколько).'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--workers и --concurrency должны быть >= 1.')
+        paths = options['paths'] or DEFAULT_PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = 'Token {}'.format(options['token'])
+        else:
+            paths = [
+                path for path in paths
+                if not path.startswith((
+                    '/api/users/subscriptions/',
+                    '/api/recipes/download_shopping_cart/',
+                ))
+            ]
+        results = {}
+        for name in options['servers']:
+            self.stderr.write('Сервер {}...'.format(name))
+            results[name] = self.run_server(name, paths, headers, options)
+        self.stdout.write(json.dumps({
+            'workers': options['workers'],
+            'concurrency': options['concurrency'],
+            'duration': options['duration'],
+            'async_db_threads': settings.ASYNC_DB_THREADS,
+            'paths': paths,
+            'results': results,
+        }, indent=2, ensure_ascii=False))
+
+    def run_server(self, name, paths, headers, options):
+        try:
+            with run_server(name, options['workers']) as (base_url, process):
+                requests = [('GET', path) for path in paths]
+                # Прогрев: справочники в памяти, кэш фрагментов.
+                drive(base_url, requests, options['workers'], 2, headers)
+                result = drive(
+                    base_url,
+                    requests,
+                    options['concurrency'],
+                    options['duration'],
+                    headers,
+                )
+                result['rss_mb'] = round(
+                    process_tree_rss(process.pid) / 1024, 1
+                )
+                return result
+        except ServerError as error:
+            raise CommandError(error)
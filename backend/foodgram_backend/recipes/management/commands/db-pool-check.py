@@ -0,0 +1,71 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from foodgram_backend.postgresql_pool.pool import get_pool
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка пула соединений на локальном PostgreSQL: потоки '
+        'держат соединение заданное время, итог - счётчики пула (JSON).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--seconds',
+            type=float,
+            default=5,
+            help='Сколько длится проверка.'
+        )
+        parser.add_argument(
+            '--hold',
+            type=float,
+            default=0.05,
+            help='Сколько секунд запрос держит соединение (pg_sleep).'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if 'POOL' not in connection.settings_dict or connection.vendor != (
+            'postgresql'
+        ):
+            raise CommandError('Пул работает только с PostgreSQL.')
+        if not connection.settings_dict['POOL']['SIZE']:
+            raise CommandError('Пул выключен: задайте DB_POOL_SIZE.')
+        deadline = time.monotonic() + options['seconds']
+        lock = threading.Lock()
+        counts = {'queries': 0, 'rejected': 0}
+
+        def worker():
+            done = rejected = 0
+            while time.monotonic() < deadline:
+                try:
+                    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                        cursor.execute(
+                            'SELECT pg_sleep(%s)', [options['hold']]
+                        )
+                    done += 1
+                except OperationalError:
+                    rejected += 1
+                finally:
+                    connections[DEFAULT_DB_ALIAS].close()
+            with lock:
+                counts['queries'] += done
+                counts['rejected'] += rejected
+
+        threads = [
+            threading.Thread(target=worker) for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = get_pool(DEFAULT_DB_ALIAS, connection.settings_dict).stats()
+        stats['wait_buckets'] = {
+            str(bound): count for bound, count in stats['wait_buckets'].items()
+        }
+        self.stdout.write(json.dumps(dict(counts, pool=stats), indent=2))
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.configurations import IMPORT_BATCH_SIZE
+from recipes.synthetic import (DEFAULT_SIZES, DEFAULT_SKEW, SCALED, bench_user,
+                               generate, sizes_for)
+
+
+class Command(BaseCommand):
+    help = (
+        'Синтетический набор bench-* для воспроизведения нагрузки: '
+        'пользователи, рицепты, состав, избранное, корзины, подписки. '
+        'Одинаковые --seed, --scale и распределения дают одинаковые '
+        'данные. На PostgreSQL пишет через COPY.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1,
+            help='Множитель для {} (при 1 - {}).'.format(
+                ', '.join(SCALED),
+                ', '.join(
+                    '{} {}'.format(DEFAULT_SIZES[name], name)
+                    for name in SCALED
+                )
+            )
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=DEFAULT_SKEW,
+            help='Показатель Ципфа для популярности (0 - равномерно).'
+        )
+        for name, default in DEFAULT_SIZES.items():
+            parser.add_argument(
+                '--{}'.format(name.replace('_', '-')),
+                type=int,
+                help='Вместо {} по умолчанию.'.format(default)
+            )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Строк в одной записи в базу.'
+        )
+
+    def handle(self, *args, **options):
+        if options['scale'] <= 0 or options['batch_size'] < 1:
+            raise CommandError('--scale и --batch-size должны быть > 0.')
+        if options['skew'] < 0:
+            raise CommandError('--skew не может быть отрицательным.')
+        if bench_user() is not None:
+            raise CommandError(
+                'Набор bench-* уже есть: для нового нужна чистая база.'
+            )
+        sizes = sizes_for(options['scale'], **{
+            name: options[name] for name in DEFAULT_SIZES
+        })
+        if any(value < 0 for value in sizes.values()):
+            raise CommandError('Размеры не могут быть отрицательными.')
+        self.stdout.write('Размеры: {}.'.format(', '.join(
+            '{} {}'.format(name, value) for name, value in sizes.items()
+        )))
+        started = time.monotonic()
+        written = generate(
+            sizes,
+            seed=options['seed'],
+            skew=options['skew'],
+            batch_size=options['batch_size'],
+            report=self.report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: {} строк за {:.1f} с.'.format(
+                sum(written.values()), time.monotonic() - started
+            )
+        ))
+
+    def report(self, table, count, seconds):
+        self.stdout.write('  {}: {} строк за {:.1f} с ({:.0f} строк/с)'.format(
+            table, count, seconds, count / seconds if seconds else 0
+        ))
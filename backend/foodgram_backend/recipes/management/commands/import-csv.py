@@ -1,43 +1,276 @@
-# flake8: noqa
 import csv
+import io
+import json
 import os.path
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
-from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from recipes.configurations import (IMPORT_BATCH_SIZE, IMPORT_READ_CHUNK,
+                                    INGREDIENTS_VERSION, TAGS_VERSION)
+from recipes.models import DataVersions, Ingredients, Tags
 
-from recipes.models import (
-    Ingredients,
-)
+# Что умеем загружать: модель, поля строки, синонимы заголовков.
+IMPORT_MODELS = {
+    'ingredients': {
+        'model': Ingredients,
+        'fields': ('name', 'measurement_unit'),
+        'aliases': {'name_ingredient': 'name'},
+        'version': INGREDIENTS_VERSION,
+    },
+    'tags': {
+        'model': Tags,
+        'fields': ('name', 'color', 'slug'),
+        'aliases': {},
+        'version': TAGS_VERSION,
+    },
+}
+DEFAULT_FILES = [
+    os.path.join(settings.BASE_DIR, 'static/data/ingredients.csv'),
+]
+WHITESPACE = re.compile(r'\s*')
+
+
+def json_array_items(source, path):
+    """Элементы JSON-массива верхнего уровня по одному.
+
+    Файл читается кусками по IMPORT_READ_CHUNK символов, в памяти -
+    только ещё не разобранный хвост.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, finished = '', 0, False
+
+    def read():
+        nonlocal buffer, position, finished
+        chunk = source.read(IMPORT_READ_CHUNK)
+        finished = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+    def next_char():
+        """Первый непробельный символ с position, '' в конце файла."""
+        nonlocal position
+        while True:
+            position = WHITESPACE.match(buffer, position).end()
+            if position < len(buffer) or finished:
+                return buffer[position:position + 1]
+            read()
+
+    def broken():
+        return CommandError('Файл {} - не JSON-массив записей.'.format(path))
+
+    if next_char() != '[':
+        raise broken()
+    position += 1
+    if next_char() == ']':
+        return
+    while True:
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            item, end = None, None
+        # Значение могло продолжиться в следующем куске.
+        if end is None or (end == len(buffer) and not finished):
+            if finished:
+                raise broken()
+            read()
+            continue
+        yield item
+        position = end
+        separator = next_char()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise broken()
+        next_char()
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из CSV в Базу POSTSQL'
-
-    def handle(self, *args, **kwargs):
-        self.stdout.write("###   НАЧИНАЮ!   ###")
-        patch_full = [
-            {'file': 'ingredients.csv', 'obj': Ingredients},
-        ]
-
-        for parameter in patch_full:
-            patch = os.path.join(
-                settings.BASE_DIR,
-                'static/data/',
-                parameter['file']
+    help = (
+        'Импорт справочников из CSV, JSON или JSON Lines. '
+        'Повторный запуск не создаёт дублей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'files',
+            nargs='*',
+            help='Файлы .csv, .json или .jsonl (по умолчанию ингридиенты).'
+        )
+        parser.add_argument(
+            '--model',
+            choices=sorted(IMPORT_MODELS),
+            help='Куда грузить. По умолчанию берётся из имени файла.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Строк в одной вставке.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Параллельных потоков вставки (для PostgreSQL).'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size и --workers должны быть >= 1.')
+        self.use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        if connection.vendor == 'sqlite' and options['workers'] > 1:
+            self.stdout.write('SQLite пишет в один поток: --workers 1.')
+            options['workers'] = 1
+        for path in options['files'] or DEFAULT_FILES:
+            name = options['model'] or os.path.splitext(
+                os.path.basename(path)
+            )[0]
+            if name not in IMPORT_MODELS:
+                raise CommandError(
+                    'Не понятно, куда грузить {}: укажите --model.'.format(
+                        path
+                    )
+                )
+            self.import_file(
+                path,
+                IMPORT_MODELS[name],
+                options['batch_size'],
+                options['workers'],
             )
-            with open(patch, 'r', encoding="utf8") as f_csv:
-                reader = csv.reader(f_csv, delimiter=',')
-                header = next(reader)
-                try:
-                    for row in reader:
-                        object_dict = {key: value for key, value in zip(
-                            header, row)
-                        }
-                        parameter['obj'].objects.create(**object_dict)
-                except ValueError as error:
-                    self.stdout.write("Ошибка :{}.".format(error))
-            self.stdout.write("Данные модели :{}, ЗАГРУЖЕНА!".format(
-                parameter['file'])
+
+    def read_rows(self, path, spec):
+        """Строки файла словарями с полями модели."""
+        extension = os.path.splitext(path)[1].lower()
+        with open(path, 'r', encoding='utf8') as source:
+            if extension == '.csv':
+                records = csv.DictReader(source)
+            elif extension == '.jsonl':
+                records = (json.loads(line) for line in source if line.strip())
+            elif extension == '.json':
+                records = json_array_items(source, path)
+            else:
+                raise CommandError('Неизвестный формат файла {}.'.format(path))
+            for number, record in enumerate(records, start=1):
+                row = {
+                    spec['aliases'].get(key, key): value
+                    for key, value in record.items()
+                }
+                missing = [
+                    field for field in spec['fields'] if not row.get(field)
+                ]
+                if missing:
+                    raise CommandError(
+                        '{}, запись {}: нет полей {}.'.format(
+                            path, number, ', '.join(missing)
+                        )
+                    )
+                yield tuple(row[field] for field in spec['fields'])
+
+    def import_file(self, path, spec, batch_size, workers):
+        model = spec['model']
+        self.stdout.write('Загрузка {} в {}.'.format(
+            path, model._meta.verbose_name_plural
+        ))
+        before = model.objects.count()
+        started = time.monotonic()
+        rows = self.read_rows(path, spec)
+        batches = iter(lambda: list(islice(rows, batch_size)), [])
+        processed = 0
+        lock = threading.Lock()
+
+        def report(count):
+            nonlocal processed
+            with lock:
+                processed += count
+                self.stdout.write('  {} строк, {:.0f} строк/с'.format(
+                    processed, self.speed(processed, started)
+                ))
+
+        def load(batch):
+            try:
+                self.insert_batch(spec, batch)
+            finally:
+                connections.close_all()
+            report(len(batch))
+
+        if workers == 1:
+            for batch in batches:
+                self.insert_batch(spec, batch)
+                report(len(batch))
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = []
+                for batch in batches:
+                    pending.append(executor.submit(load, batch))
+                    if len(pending) >= workers * 2:
+                        pending.pop(0).result()
+                for future in pending:
+                    future.result()
+
+        if spec['version']:
+            DataVersions.bump(spec['version'])
+        added = model.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            'Готово: {} строк за {:.2f} с ({:.0f} строк/с), '
+            'новых записей {}.'.format(
+                processed,
+                time.monotonic() - started,
+                self.speed(processed, started),
+                added,
             )
+        ))
 
-        self.stdout.write("###  Готово !!!  ###")
+    @staticmethod
+    def speed(count, started):
+        elapsed = time.monotonic() - started
+        return count / elapsed if elapsed else 0
+
+    def insert_batch(self, spec, batch):
+        if self.use_copy:
+            self.copy_batch(spec, batch)
+            return
+        spec['model'].objects.bulk_create(
+            [spec['model'](**dict(zip(spec['fields'], row))) for row in batch],
+            ignore_conflicts=True,
+        )
+
+    def copy_batch(self, spec, batch):
+        """COPY во временную таблицу и INSERT ... ON CONFLICT DO NOTHING."""
+        qn = connection.ops.quote_name
+        table = qn(spec['model']._meta.db_table)
+        columns = ', '.join(
+            qn(spec['model']._meta.get_field(field).column)
+            for field in spec['fields']
+        )
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(batch)
+        buffer.seek(0)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE import_rows ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY import_rows ({columns}) FROM STDIN WITH CSV',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT {columns} FROM import_rows '
+                f'ON CONFLICT DO NOTHING'
+            )
+            # Внутри внешней транзакции ON COMMIT не наступит до конца.
+            cursor.execute('DROP TABLE import_rows')
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.configurations import RECIPE_IMAGE_BATCH_SIZE
+from recipes.models import Recipes
+
+
+class Command(BaseCommand):
+    help = 'Варианты картинок рицептов, которые ещё не обработаны'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--watch',
+            type=int,
+            metavar='SECONDS',
+            help='Не завершаться: проверять новые картинки раз в SECONDS с.'
+        )
+
+    def process_pending(self):
+        done, failed, last = 0, 0, 0
+        while True:
+            batch = list(
+                Recipes.objects.pending_images().filter(
+                    pk__gt=last
+                ).order_by('pk').values_list('pk', flat=True)[
+                    :RECIPE_IMAGE_BATCH_SIZE
+                ]
+            )
+            if not batch:
+                return done, failed
+            last = batch[-1]
+            for pk in batch:
+                try:
+                    done += len(
+                        Recipes.objects.filter(pk=pk).process_images()
+                    )
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(
+                        'Рицепт {}: {}'.format(pk, error)
+                    )
+
+    def handle(self, *args, **options):
+        while True:
+            done, failed = self.process_pending()
+            if done or failed or not options['watch']:
+                self.stdout.write(
+                    'Обработано картинок: {}, с ошибкой: {}.'.format(
+                        done, failed
+                    )
+                )
+            if not options['watch']:
+                return
+            time.sleep(options['watch'])
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import ShoppingCartIngredients
+
+
+class Command(BaseCommand):
+    help = 'Сверка и пересборка сумм ингридиентов в корзинах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить суммы, ничего не меняя.'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Только корзина пользователя с этим id.'
+        )
+
+    def get_drift(self, user_id):
+        expected = ShoppingCartIngredients.objects.expected(user_id)
+        stored = ShoppingCartIngredients.objects.all()
+        if user_id is not None:
+            stored = stored.filter(id_user=user_id)
+        stored = {
+            (user, ingredient): amount
+            for user, ingredient, amount in stored.values_list(
+                'id_user', 'id_ingredient', 'amount'
+            )
+        }
+        return {
+            key: (stored.get(key, 0), expected.get(key, 0))
+            for key in expected.keys() | stored.keys()
+            if stored.get(key, 0) != expected.get(key, 0)
+        }
+
+    def handle(self, *args, **options):
+        user_id = options['user']
+        drift = self.get_drift(user_id)
+        for (user, ingredient), (stored, expected) in sorted(drift.items()):
+            self.stdout.write(
+                'Пользователь {}, ингридиент {}: {} вместо {}.'.format(
+                    user, ingredient, stored, expected
+                )
+            )
+        self.stdout.write('Расхождений: {}.'.format(len(drift)))
+        if options['verify']:
+            if drift:
+                raise CommandError('Суммы корзин расходятся.')
+            return
+        if drift:
+            with transaction.atomic():
+                ShoppingCartIngredients.objects.rebuild(user_id)
+            self.stdout.write('Суммы корзин пересобраны.')
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверка и пересчёт счётчиков рицептов favorites_count и '
+        'in_carts_count по избранному и корзинам. Для периодического '
+        'запуска: правки в обход приложения (SQL, загрузка данных) '
+        'счётчики не меняют.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить счётчики, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        drift = Recipes.objects.counters_drift()
+        for recipe_id, fields in drift.items():
+            for field, (stored, expected) in sorted(fields.items()):
+                self.stdout.write('Рицепт {}, {}: {} вместо {}.'.format(
+                    recipe_id, field, stored, expected
+                ))
+        self.stdout.write('Расхождений: {}.'.format(len(drift)))
+        if options['verify']:
+            if drift:
+                raise CommandError('Счётчики рицептов расходятся.')
+            return
+        if drift:
+            Recipes.objects.reconcile_counters(list(drift))
+            self.stdout.write('Счётчики пересчитаны.')
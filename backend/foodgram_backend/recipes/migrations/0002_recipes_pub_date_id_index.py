@@ -0,0 +1,26 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 12:49
+
+from django.db import migrations, models
+from recipes.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipes',
+            options={'ordering': ['-pub_date', '-id'], 'verbose_name': 'Рицепт', 'verbose_name_plural': 'Рицепты'},
+        ),
+        AddIndexConcurrently(
+            model_name='recipes',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipes_pub_date_id_idx'),
+        ),
+    ]
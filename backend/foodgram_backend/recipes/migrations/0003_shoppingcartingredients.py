@@ -0,0 +1,49 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 12:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+FILL_SHOPPING_CART_INGREDIENTS = """
+INSERT INTO recipes_shoppingcartingredients
+    (id_user_id, id_ingredient_id, amount)
+SELECT sl.id_user_id, ri.id_ingredient_id, SUM(ri.amount)
+FROM recipes_shoppinglist sl
+INNER JOIN recipes_recipeingredients ri ON ri.id_recipe_id = sl.id_recipe_id
+GROUP BY sl.id_user_id, ri.id_ingredient_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_recipes_pub_date_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredients',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0, verbose_name='Количество.')),
+                ('id_ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients_ingredient', to='recipes.ingredients', verbose_name='Ингридиент.')),
+                ('id_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients_user', to=settings.AUTH_USER_MODEL, verbose_name='Владелец корзины.')),
+            ],
+            options={
+                'verbose_name': 'Ингридиент корзины',
+                'verbose_name_plural': 'Ингридиенты корзины',
+                'ordering': ['id_user'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredients',
+            constraint=models.UniqueConstraint(fields=('id_user', 'id_ingredient'), name='unique_cart_user_ingredient'),
+        ),
+        migrations.RunSQL(
+            FILL_SHOPPING_CART_INGREDIENTS,
+            migrations.RunSQL.noop
+        ),
+    ]
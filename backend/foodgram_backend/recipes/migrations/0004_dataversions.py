@@ -0,0 +1,27 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 12:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppingcartingredients'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersions',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True, verbose_name='Справочник')),
+                ('value', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+            ],
+            options={
+                'verbose_name': 'Версия справочника',
+                'verbose_name_plural': 'Версии справочников',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 12:56
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Сливает одинаковые (name, measurement_unit) в запись с меньшим id."""
+    Ingredients = apps.get_model('recipes', 'Ingredients')
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    ShoppingCartIngredients = apps.get_model(
+        'recipes', 'ShoppingCartIngredients'
+    )
+    duplicates = Ingredients.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for row in duplicates:
+        extra = list(Ingredients.objects.filter(
+            name=row['name'],
+            measurement_unit=row['measurement_unit'],
+        ).exclude(id=row['keep']).values_list('id', flat=True))
+        RecipeIngredients.objects.filter(
+            id_ingredient__in=extra
+        ).update(id_ingredient=row['keep'])
+        for cart in ShoppingCartIngredients.objects.filter(
+            id_ingredient__in=extra
+        ):
+            kept, _ = ShoppingCartIngredients.objects.get_or_create(
+                id_user_id=cart.id_user_id,
+                id_ingredient_id=row['keep'],
+            )
+            kept.amount = models.F('amount') + cart.amount
+            kept.save(update_fields=['amount'])
+            cart.delete()
+        Ingredients.objects.filter(id__in=extra).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_dataversions'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,38 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+from recipes.operations import delete_duplicates, rebuild_shopping_cart
+
+
+def deduplicate_relations(apps, schema_editor):
+    Favorited = apps.get_model('recipes', 'Favorited')
+    ShoppingList = apps.get_model('recipes', 'ShoppingList')
+    TagsRecipes = apps.get_model('recipes', 'TagsRecipes')
+    RecipeIngredients = apps.get_model('recipes', 'RecipeIngredients')
+    TagsRecipes.objects.filter(
+        models.Q(id_recipe__isnull=True) | models.Q(id_teg__isnull=True)
+    ).delete()
+    delete_duplicates(TagsRecipes, ['id_recipe', 'id_teg'])
+    delete_duplicates(Favorited, ['id_user', 'id_recipe'])
+    cart_changed = delete_duplicates(ShoppingList, ['id_user', 'id_recipe'])
+    cart_changed += delete_duplicates(
+        RecipeIngredients, ['id_recipe', 'id_ingredient'], merge_amount=True
+    )
+    if cart_changed:
+        rebuild_shopping_cart(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_unique_ingredients'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            deduplicate_relations,
+            migrations.RunPython.noop
+        ),
+    ]
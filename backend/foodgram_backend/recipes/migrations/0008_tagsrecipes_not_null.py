@@ -0,0 +1,29 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+from recipes.operations import SetNotNull
+
+
+class Migration(migrations.Migration):
+
+    # Проверка NOT VALID и её VALIDATE - в отдельных транзакциях.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0007_deduplicate_relations'),
+    ]
+
+    operations = [
+        SetNotNull(
+            model_name='tagsrecipes',
+            name='id_recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='id_tr_recept', to='recipes.recipes', verbose_name='Индификатор рицепта'),
+        ),
+        SetNotNull(
+            model_name='tagsrecipes',
+            name='id_teg',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='id_tr_teg', to='recipes.tags', verbose_name='Индификатор тега'),
+        ),
+    ]
@@ -0,0 +1,117 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:00
+
+from django.db import IntegrityError, migrations, models
+from recipes.operations import delete_duplicates, rebuild_shopping_cart
+
+
+CONSTRAINTS = [
+    ('favorited', models.UniqueConstraint(fields=('id_user', 'id_recipe'), name='unique_favorited_user_recipe')),
+    ('recipeingredients', models.UniqueConstraint(fields=('id_recipe', 'id_ingredient'), name='unique_recipeingredients_recipe_ingredient')),
+    ('shoppinglist', models.UniqueConstraint(fields=('id_user', 'id_recipe'), name='unique_shoppinglist_user_recipe')),
+    ('tagsrecipes', models.UniqueConstraint(fields=('id_recipe', 'id_teg'), name='unique_tagsrecipes_recipe_teg')),
+]
+
+# Модели, дубли которых входят в суммы корзин.
+CART_MODELS = {'recipeingredients', 'shoppinglist'}
+
+# Сколько раз строить индекс, если дубли появляются во время построения.
+BUILD_ATTEMPTS = 5
+
+
+def deduplicate(schema_editor, model, constraint):
+    """Дубли, вставленные после 0007, пока миграция ещё не дошла сюда."""
+    merge_amount = any(
+        field.name == 'amount' for field in model._meta.get_fields()
+    )
+    removed = delete_duplicates(model, constraint.fields, merge_amount)
+    if removed and model._meta.model_name in CART_MODELS:
+        rebuild_shopping_cart(schema_editor)
+
+
+def create_unique_concurrently(schema_editor, model, constraint):
+    """Уникальный индекс без блокировки записи в таблицу (PostgreSQL).
+
+    Невалидный индекс от прерванного запуска удаляется. Перед каждой
+    попыткой CREATE INDEX CONCURRENTLY дубли чистятся заново: таблица
+    всё это время открыта для записи. Если дубль вставили во время
+    построения, невалидный индекс удаляется и попытка повторяется.
+    Готовый индекс без сканирования таблицы становится ограничением.
+    """
+    qn = schema_editor.quote_name
+    name = constraint.name
+    table = model._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT indisvalid FROM pg_index '
+            'WHERE indexrelid = to_regclass(%s)',
+            [name]
+        )
+        index = cursor.fetchone()
+        cursor.execute(
+            'SELECT 1 FROM pg_constraint WHERE conname = %s '
+            'AND conrelid = to_regclass(%s)',
+            [name, table]
+        )
+        attached = cursor.fetchone() is not None
+    if index is not None and not index[0]:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY {qn(name)}')
+        index = None
+    columns = ', '.join(
+        qn(model._meta.get_field(field).column)
+        for field in constraint.fields
+    )
+    attempt = 0
+    while index is None:
+        attempt += 1
+        deduplicate(schema_editor, model, constraint)
+        try:
+            schema_editor.execute(
+                f'CREATE UNIQUE INDEX CONCURRENTLY {qn(name)} '
+                f'ON {qn(table)} ({columns})'
+            )
+        except IntegrityError:
+            schema_editor.execute(
+                f'DROP INDEX CONCURRENTLY IF EXISTS {qn(name)}'
+            )
+            if attempt >= BUILD_ATTEMPTS:
+                raise
+        else:
+            index = (True,)
+    if not attached:
+        schema_editor.execute(
+            f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} '
+            f'UNIQUE USING INDEX {qn(name)}'
+        )
+
+
+class AddConstraintConcurrently(migrations.AddConstraint):
+    """AddConstraint, на PostgreSQL - через CREATE INDEX CONCURRENTLY."""
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            create_unique_concurrently(schema_editor, model, self.constraint)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0008_tagsrecipes_not_null'),
+    ]
+
+    operations = [
+        AddConstraintConcurrently(
+            model_name=model_name,
+            constraint=constraint,
+        )
+        for model_name, constraint in CONSTRAINTS
+    ]
@@ -0,0 +1,25 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:06
+
+from django.db import migrations, models
+import recipes.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_relation_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='image_processed',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Обработанная картинка.'),
+        ),
+        migrations.AlterField(
+            model_name='recipes',
+            name='image',
+            field=models.ImageField(default=None, null=True, storage=recipes.images.ContentAddressedStorage(), upload_to=recipes.images.recipe_image_path, verbose_name='Картинка рицепта.'),
+        ),
+    ]
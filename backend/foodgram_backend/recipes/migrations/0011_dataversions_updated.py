@@ -0,0 +1,20 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:08
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipes_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversions',
+            name='updated',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Изменено'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# flake8: noqa
+from django.db import migrations
+
+from recipes.configurations import RECIPES_SEARCH_CONFIG
+
+TABLE = 'recipes_recipes'
+VECTOR = (
+    "setweight(to_tsvector('{config}', coalesce({row}.name, '')), 'A') || "
+    "setweight(to_tsvector('{config}', coalesce({row}.text, '')), 'B')"
+)
+
+
+def create_search_vector(apps, schema_editor):
+    """tsvector по названию и описанию, триггер и GIN-индекс (PostgreSQL).
+
+    Триггер держит столбец в актуальном виде при любой записи,
+    в том числе при COPY и в обход ORM.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+    execute(
+        f'ALTER TABLE {TABLE} '
+        f'ADD COLUMN IF NOT EXISTS search_vector tsvector'
+    )
+    execute(
+        f'CREATE OR REPLACE FUNCTION recipes_search_vector_update() '
+        f'RETURNS trigger AS $$ BEGIN '
+        f'NEW.search_vector := '
+        f'{VECTOR.format(config=RECIPES_SEARCH_CONFIG, row="NEW")}; '
+        f'RETURN NEW; END $$ LANGUAGE plpgsql'
+    )
+    execute(f'DROP TRIGGER IF EXISTS recipes_search_vector ON {TABLE}')
+    execute(
+        f'CREATE TRIGGER recipes_search_vector '
+        f'BEFORE INSERT OR UPDATE OF name, text ON {TABLE} '
+        f'FOR EACH ROW EXECUTE FUNCTION recipes_search_vector_update()'
+    )
+    execute(
+        f'UPDATE {TABLE} SET search_vector = '
+        f'{VECTOR.format(config=RECIPES_SEARCH_CONFIG, row=TABLE)}'
+    )
+    execute('DROP INDEX CONCURRENTLY IF EXISTS recipes_search_vector_idx')
+    execute(
+        f'CREATE INDEX CONCURRENTLY recipes_search_vector_idx '
+        f'ON {TABLE} USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+    execute('DROP INDEX CONCURRENTLY IF EXISTS recipes_search_vector_idx')
+    execute(f'DROP TRIGGER IF EXISTS recipes_search_vector ON {TABLE}')
+    execute('DROP FUNCTION IF EXISTS recipes_search_vector_update()')
+    execute(f'ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0011_dataversions_updated'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,28 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:30
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipes_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeIngredientsChanges',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.PositiveBigIntegerField(verbose_name='Рицепт')),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Когда')),
+            ],
+            options={
+                'verbose_name': 'Изменение состава рицепта',
+                'verbose_name_plural': 'Изменения состава рицептов',
+                'ordering': ['id'],
+            },
+        ),
+    ]
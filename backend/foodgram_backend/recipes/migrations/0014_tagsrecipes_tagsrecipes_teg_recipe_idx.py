@@ -0,0 +1,22 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:31
+
+from django.db import migrations, models
+from recipes.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0013_recipeingredientschanges'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='tagsrecipes',
+            index=models.Index(fields=['id_teg', 'id_recipe'], name='tagsrecipes_teg_recipe_idx'),
+        ),
+    ]
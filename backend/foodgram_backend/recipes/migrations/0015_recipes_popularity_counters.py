@@ -0,0 +1,54 @@
+# flake8: noqa
+# Generated by Django 3.2.3 on 2026-10-18 13:48
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+from recipes.operations import AddIndexConcurrently
+
+
+def fill_counters(apps, schema_editor):
+    Recipes = apps.get_model('recipes', 'Recipes')
+    for field, model_name in (
+        ('favorites_count', 'Favorited'),
+        ('in_carts_count', 'ShoppingList'),
+    ):
+        model = apps.get_model('recipes', model_name)
+        Recipes.objects.update(**{field: Coalesce(models.Subquery(
+            model.objects.filter(
+                id_recipe=models.OuterRef('pk')
+            ).order_by().values('id_recipe').annotate(
+                total=models.Count('pk')
+            ).values('total'),
+            output_field=models.PositiveIntegerField(),
+        ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0014_tagsrecipes_tagsrecipes_teg_recipe_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipes',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном.'),
+        ),
+        migrations.AddField(
+            model_name='recipes',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах.'),
+        ),
+        AddIndexConcurrently(
+            model_name='recipes',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipes_popular_idx'),
+        ),
+        # Миграция вне транзакции: счётчики заполняются одной своей.
+        migrations.RunPython(
+            fill_counters, migrations.RunPython.noop, atomic=True
+        ),
+    ]
@@ -1,5 +1,12 @@
 # flake8: noqa
-from django.db import models
+import functools
+import operator
+
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, Greatest
+from django.dispatch import Signal
+from django.utils import timezone
 from django.core.validators import (
     MinValueValidator,
     MaxValueValidator,
@@ -14,8 +21,19 @@ from .configurations import (
     DEFAULT_INTERAGER_FIELD,
     MESSAGE_MINEMUM,
     MESSAGE_HIGHS,
+    USER_MARKS_VERSION,
+    RECIPES_SEARCH_CONFIG,
+    POPULAR_ORDERING,
+    COUNTERS_BATCH_SIZE,
 )
-from users.models import Users
+from .images import (
+    content_storage,
+    images_ready,
+    make_variants,
+    recipe_image_path,
+    variant_urls
+)
+from users.models import Subscriptions, Users
 
 
 class Tags(models.Model):
@@ -74,6 +92,12 @@ class Ingredients(models.Model):
         ordering = ['name']
         verbose_name = 'Ингридиент'
         verbose_name_plural = 'Ингридиенты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_measurement_unit'
+            )
+        ]
 
     def __str__(self):
         return self.INGREDIENTS_TEMPLATE.format(
@@ -82,6 +106,188 @@ class Ingredients(models.Model):
         )
 
 
+class RecipesQuerySet(models.QuerySet):
+    """Выборки рицептов для чтения без запросов на каждую строку."""
+
+    def with_related(self):
+        """Тянет автора и строки связей с тегами и ингридиентами пачкой.
+
+        Сами теги и ингридиенты не соединяются: их отдают
+        справочники в памяти процесса.
+        """
+        return self.select_related('author').prefetch_related(
+            models.Prefetch(
+                'id_tr_recept',
+                queryset=TagsRecipes.objects.order_by(),
+            ),
+            models.Prefetch(
+                'r_connection_i',
+                queryset=RecipeIngredients.objects.order_by(),
+            ),
+        )
+
+    def with_user_flags(self, user=None):
+        """Отметки избраного, корзины и подписки одним запросом со списком."""
+        if user is None or not user.is_authenticated:
+            false = models.Value(False, output_field=models.BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscriber=false,
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorited.objects.filter(
+                    id_user=user.id,
+                    id_recipe=models.OuterRef('pk'),
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingList.objects.filter(
+                    id_user=user.id,
+                    id_recipe=models.OuterRef('pk'),
+                )
+            ),
+            author_is_subscriber=models.Exists(
+                Subscriptions.objects.filter(
+                    id_subscriber=user.id,
+                    id_writer=models.OuterRef('author'),
+                )
+            ),
+        )
+
+    def search(self, query):
+        """Поиск по названию и описанию, сначала самые подходящие.
+
+        На PostgreSQL - по столбцу search_vector (tsvector со
+        стеммингом, название весомее описания) с GIN-индексом,
+        см. миграцию 0012. На других базах - icontains, совпадения
+        в названии выше.
+        """
+        if connections[self.db].vendor == 'postgresql':
+            quote_name = connections[self.db].ops.quote_name
+            vector = '{}.{}'.format(
+                quote_name(self.model._meta.db_table),
+                quote_name('search_vector'),
+            )
+            tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+            params = (RECIPES_SEARCH_CONFIG, query)
+            return self.filter(RawSQL(
+                f'{vector} @@ {tsquery}',
+                params,
+                output_field=models.BooleanField(),
+            )).annotate(search_rank=RawSQL(
+                f'ts_rank({vector}, {tsquery})',
+                params,
+                output_field=models.FloatField(),
+            )).order_by('-search_rank', '-pub_date', '-id')
+        return self.filter(
+            models.Q(name__icontains=query) | models.Q(text__icontains=query)
+        ).annotate(search_rank=models.Case(
+            models.When(name__icontains=query, then=models.Value(1.0)),
+            default=models.Value(0.0),
+            output_field=models.FloatField(),
+        )).order_by('-search_rank', '-pub_date', '-id')
+
+    def pending_images(self):
+        """Рицепты, у чьей картинки ещё нет вариантов."""
+        return self.exclude(image__isnull=True).exclude(image='').exclude(
+            image_processed=models.F('image')
+        )
+
+    def process_images(self):
+        """Делает варианты картинок, возвращает id обработанных рицептов.
+
+        Отметка ставится, только если картинка не сменилась за время
+        обработки.
+        """
+        done = []
+        for pk, name in self.values_list('pk', 'image').order_by():
+            if not name:
+                continue
+            make_variants(name)
+            if self.model.objects.filter(pk=pk, image=name).update(
+                image_processed=name
+            ):
+                done.append(pk)
+        if done:
+            images_ready.send(sender=self.model, recipe_ids=done)
+        return done
+
+    def latest_per_author(self, author_ids, limit):
+        """Последние limit рицептов каждого автора одним запросом.
+
+        Для каждого автора подзапрос берёт limit его новых рицептов:
+        фильтровать по оконной функции Django 3.2 не умеет.
+        """
+        if limit < 1:
+            return self.none()
+        latest = self.model.objects.filter(
+            author=models.OuterRef('author')
+        ).order_by('-pub_date', '-id').values('pk')[:limit]
+        return self.filter(
+            author__in=author_ids, pk__in=models.Subquery(latest)
+        ).order_by('-pub_date', '-id')
+
+    def with_expected_counters(self):
+        """Счётчики отметок, посчитанные по самим отметкам."""
+        return self.annotate(**{
+            'expected_' + model.COUNTER_FIELD: marks_count(model)
+            for model in (Favorited, ShoppingList)
+        })
+
+    def counters_drift(self):
+        """{id: {поле: (в рицепте, по отметкам)}} для разошедшихся."""
+        fields = [model.COUNTER_FIELD for model in (Favorited, ShoppingList)]
+        drifted = self.with_expected_counters().filter(functools.reduce(
+            operator.or_, (
+                ~models.Q(**{field: models.F('expected_' + field)})
+                for field in fields
+            )
+        )).order_by('pk').values(
+            'pk', *fields, *('expected_' + field for field in fields)
+        )
+        return {
+            row['pk']: {
+                field: (row[field], row['expected_' + field])
+                for field in fields
+                if row[field] != row['expected_' + field]
+            }
+            for row in drifted
+        }
+
+    def reconcile_counters(self, recipe_ids):
+        """Пересчитать счётчики рицептов recipe_ids по отметкам.
+
+        Строки сначала блокируются: отметки, поставленные до
+        блокировки, попадут в пересчёт, поставленные после - прибавятся
+        к нему сами.
+        """
+        for start in range(0, len(recipe_ids), COUNTERS_BATCH_SIZE):
+            batch = sorted(recipe_ids[start:start + COUNTERS_BATCH_SIZE])
+            with transaction.atomic():
+                recipes = self.model.objects.filter(pk__in=batch)
+                list(recipes.order_by('pk').select_for_update().values_list(
+                    'pk', flat=True
+                ))
+                recipes.update(**{
+                    model.COUNTER_FIELD: marks_count(model)
+                    for model in (Favorited, ShoppingList)
+                })
+
+
+def marks_count(model):
+    """Подзапрос: число отметок model (избранное, корзина) рицепта."""
+    return Coalesce(models.Subquery(
+        model.objects.filter(
+            id_recipe=models.OuterRef('pk')
+        ).order_by().values('id_recipe').annotate(
+            total=models.Count('pk')
+        ).values('total'),
+        output_field=models.PositiveIntegerField(),
+    ), 0)
+
+
 class Recipes(models.Model):
     """Рицепт приготовляния блюда."""
 
@@ -109,10 +315,20 @@ class Recipes(models.Model):
     )
     image = models.ImageField(
         'Картинка рицепта.',
-        upload_to='recipes/images/',
+        upload_to=recipe_image_path,
+        storage=content_storage,
         null=True,
         default=None
     )
+    # Для какой картинки уже сделаны варианты; не совпадает с image,
+    # пока новая картинка ждёт обработки.
+    image_processed = models.CharField(
+        'Обработанная картинка.',
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+    )
     text = models.TextField(
         'Описание',
         default='',
@@ -128,12 +344,45 @@ class Recipes(models.Model):
         'Дата публикации.',
         auto_now_add=True,
     )
+    # Счётчики отметок ведёт UserRecipeQuerySet (и сигналы для правок
+    # мимо него), сверяет команда reconcile-counters.
+    favorites_count = models.PositiveIntegerField(
+        'В избранном.',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В корзинах.',
+        default=0,
+        editable=False,
+    )
+
+    objects = RecipesQuerySet.as_manager()
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-id']
+        # Столбец search_vector с GIN-индексом и триггером есть только
+        # на PostgreSQL и в модели не описан (миграция 0012).
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipes_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=POPULAR_ORDERING,
+                name='recipes_popular_idx'
+            ),
+        ]
         verbose_name = 'Рицепт'
         verbose_name_plural = 'Рицепты'
 
+    @property
+    def image_variants(self):
+        return variant_urls(
+            self.image.name,
+            bool(self.image) and self.image_processed == self.image.name,
+        )
+
     def __str__(self):
         return self.RECIPES_TEMPLATE.format(
             self.name,
@@ -141,31 +390,80 @@ class Recipes(models.Model):
         )
 
 
-class TagsRecipes(models.Model):
+# Строки RecipeIngredients или TagsRecipes удалены не каскадом от
+# рицепта: recipe_ids - их рицепты. Каскад отмечает сам рицепт.
+relations_deleted = Signal()
+
+
+class RecipeRelationQuerySet(models.QuerySet):
+    """Связи рицепта (состав, теги).
+
+    Обработчиков post_delete у связей нет, поэтому каскад от рицепта
+    удаляет их одним запросом без выборки строк. Удаление через этот
+    QuerySet отмечается сигналом relations_deleted - один раз на вызов.
+    """
+
+    def delete(self):
+        recipe_ids = list(self.order_by().values_list(
+            'id_recipe', flat=True
+        ).distinct())
+        result = super().delete()
+        if recipe_ids:
+            relations_deleted.send(sender=self.model, recipe_ids=recipe_ids)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class RecipeRelation:
+    """delete() строки связи тоже отмечается relations_deleted."""
+
+    def delete(self, *args, **kwargs):
+        recipe_id = self.id_recipe_id
+        result = super().delete(*args, **kwargs)
+        relations_deleted.send(sender=type(self), recipe_ids=[recipe_id])
+        return result
+
+
+class TagsRecipes(RecipeRelation, models.Model):
     """Связь между Тегами и рицептами."""
 
     TAGSRECIPES_TEMPLATE = '{} > {}'
     id_recipe = models.ForeignKey(
         Recipes,
-        on_delete=models.SET_NULL,
-        blank=True,
-        null=True,
+        on_delete=models.CASCADE,
         related_name='id_tr_recept',
         verbose_name='Индификатор рицепта'
     )
     id_teg = models.ForeignKey(
         Tags,
-        on_delete=models.SET_NULL,
-        blank=True,
-        null=True,
+        on_delete=models.CASCADE,
         related_name='id_tr_teg',
         verbose_name='Индификатор тега'
     )
 
+    objects = RecipeRelationQuerySet.as_manager()
+
     class Meta:
         ordering = ['id_teg']
         verbose_name = 'Рицепт < Тег.'
         verbose_name_plural = 'Рицепты < Теги.'
+        # Фильтр по тегам - EXISTS по этой таблице: уникальный индекс
+        # (рицепт, тег) проверяет рицепт, индекс (тег, рицепт) отдаёт
+        # рицепты тега без обращения к таблице.
+        indexes = [
+            models.Index(
+                fields=['id_teg', 'id_recipe'],
+                name='tagsrecipes_teg_recipe_idx'
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_recipe', 'id_teg'],
+                name='unique_tagsrecipes_recipe_teg'
+            )
+        ]
 
     def __str__(self):
         return self.TAGSRECIPES_TEMPLATE.format(
@@ -174,7 +472,7 @@ class TagsRecipes(models.Model):
         )
 
 
-class RecipeIngredients(models.Model):
+class RecipeIngredients(RecipeRelation, models.Model):
     """Связь между рицептом и ингридиентами."""
 
     RECIPEINGREDIENTS_TEMPLATE = '{}: {} ,kol {}'
@@ -199,10 +497,18 @@ class RecipeIngredients(models.Model):
         ]
     )
 
+    objects = RecipeRelationQuerySet.as_manager()
+
     class Meta:
         ordering = ['id_ingredient']
         verbose_name = 'Рицепт < Ингридиент.'
         verbose_name_plural = 'Рицепты < Ингридиенты.'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_recipe', 'id_ingredient'],
+                name='unique_recipeingredients_recipe_ingredient'
+            )
+        ]
 
     def __str__(self):
         return self.RECIPEINGREDIENTS_TEMPLATE.format(
@@ -212,10 +518,141 @@ class RecipeIngredients(models.Model):
         )
 
 
-class Favorited(models.Model):
+class UserRecipeQuerySet(models.QuerySet):
+    """Отметки пользователя на рицептах (избранное, корзина).
+
+    Добавление и удаление - один запрос без предварительной проверки,
+    повторный вызов ничего не меняет. При изменении растёт счётчик
+    отметок пользователя (по нему строится ETag) и счётчик рицепта
+    COUNTER_FIELD модели - в той же транзакции.
+    """
+
+    def add(self, user_id, recipe_ids):
+        """Добавить рицепты, вернуть id действительно добавленных.
+
+        Несуществующие рицепты пропускаются.
+        """
+        if not recipe_ids:
+            return []
+        qn = connections[self.db].ops.quote_name
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        sql = (
+            f'INSERT INTO {qn(self.model._meta.db_table)} '
+            f'(id_user_id, id_recipe_id) '
+            f'SELECT %s, r.id FROM {qn(Recipes._meta.db_table)} r '
+            f'WHERE r.id IN ({placeholders}) '
+            f'ON CONFLICT (id_user_id, id_recipe_id) DO NOTHING '
+            f'RETURNING id_recipe_id'
+        )
+        return self._execute_marks(sql, user_id, recipe_ids, 1)
+
+    def remove(self, user_id, recipe_ids):
+        """Убрать рицепты, вернуть id действительно удалённых."""
+        if not recipe_ids:
+            return []
+        qn = connections[self.db].ops.quote_name
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        sql = (
+            f'DELETE FROM {qn(self.model._meta.db_table)} '
+            f'WHERE id_user_id = %s AND id_recipe_id IN ({placeholders}) '
+            f'RETURNING id_recipe_id'
+        )
+        return self._execute_marks(sql, user_id, recipe_ids, -1)
+
+    def _execute_marks(self, sql, user_id, recipe_ids, delta):
+        with transaction.atomic(using=self.db, savepoint=False):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(sql, [user_id, *recipe_ids])
+                changed = [row[0] for row in cursor.fetchall()]
+            if changed:
+                self.change_counters(changed, delta)
+                DataVersions.bump(USER_MARKS_VERSION.format(user_id))
+        return changed
+
+    @transaction.atomic(savepoint=False)
+    def delete(self):
+        """Удаление пачкой (админка) без сигналов на каждую строку.
+
+        Счётчики рицептов - по UPDATE на одинаковую убыль, версия
+        отметок - по разу на пользователя.
+        """
+        user_ids = list(self.order_by().values_list(
+            'id_user', flat=True
+        ).distinct())
+        released = self.released_counts()
+        result = super().delete()
+        self.model.objects.release_counters(released)
+        DataVersions.bump(*(
+            USER_MARKS_VERSION.format(user_id) for user_id in user_ids
+        ))
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def released_counts(self):
+        """{убыль: [id рицептов]} для отметок этой выборки (GROUP BY)."""
+        released = {}
+        for recipe_id, total in self.order_by().values(
+            'id_recipe'
+        ).annotate(total=models.Count('pk')).values_list(
+            'id_recipe', 'total'
+        ):
+            released.setdefault(total, []).append(recipe_id)
+        return released
+
+    def release_counters(self, released):
+        """Вычесть отметки released (см. released_counts) из счётчиков."""
+        for total, recipe_ids in released.items():
+            self.change_counters(recipe_ids, -total)
+
+    def change_counters(self, recipe_ids, delta):
+        """Прибавить delta к счётчику COUNTER_FIELD рицептов."""
+        field = self.model.COUNTER_FIELD
+        recipes = Recipes.objects.filter(pk__in=recipe_ids)
+        if len(recipe_ids) > 1:
+            # Строки блокируются по порядку id: пакеты с общими
+            # рицептами не ждут друг друга по кругу.
+            list(recipes.order_by('pk').select_for_update().values_list(
+                'pk', flat=True
+            ))
+        recipes.update(**{
+            field: Greatest(models.F(field) + delta, 0)
+        })
+
+
+class ShoppingListQuerySet(UserRecipeQuerySet):
+    """Корзина: удаление пачкой вычитает рицепты из сумм ингридиентов."""
+
+    @transaction.atomic(savepoint=False)
+    def delete(self):
+        ShoppingCartIngredients.objects.apply_marks(self, -1)
+        return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class UserRecipeMark:
+    """delete() одной отметки тоже меняет счётчик рицепта и версию.
+
+    Обработчиков post_delete у отметок нет: каскад от рицепта или
+    пользователя удаляет их одним запросом (см. recipes/signals.py).
+    """
+
+    @transaction.atomic(savepoint=False)
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        type(self).objects.change_counters([self.id_recipe_id], -1)
+        DataVersions.bump(USER_MARKS_VERSION.format(self.id_user_id))
+        return result
+
+
+class Favorited(UserRecipeMark, models.Model):
     """Таблица Избраных рицептов."""
 
     FAVORITED_TEMPLATE = '{}: {}'
+    COUNTER_FIELD = 'favorites_count'
     id_user = models.ForeignKey(
         Users,
         on_delete=models.CASCADE,
@@ -231,10 +668,18 @@ class Favorited(models.Model):
         verbose_name='Избраный рицепт.'
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ['id_user']
         verbose_name = 'Избраный'
         verbose_name_plural = 'Избраные'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_user', 'id_recipe'],
+                name='unique_favorited_user_recipe'
+            )
+        ]
 
     def __str__(self):
         return self.FAVORITED_TEMPLATE.format(
@@ -243,10 +688,11 @@ class Favorited(models.Model):
         )
 
 
-class ShoppingList(models.Model):
+class ShoppingList(UserRecipeMark, models.Model):
     """Таблица Подписок на автора рицептов."""
 
     SHOPPINGLIST_TEMPLATE = '{}: {}'
+    COUNTER_FIELD = 'in_carts_count'
     id_user = models.ForeignKey(
         Users,
         on_delete=models.CASCADE,
@@ -262,13 +708,282 @@ class ShoppingList(models.Model):
         verbose_name='Рицепт в корзине.'
     )
 
+    objects = ShoppingListQuerySet.as_manager()
+
     class Meta:
         ordering = ['id_user']
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзина'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_user', 'id_recipe'],
+                name='unique_shoppinglist_user_recipe'
+            )
+        ]
 
     def __str__(self):
         return self.SHOPPINGLIST_TEMPLATE.format(
             self.id_user,
             self.id_recipe,
         )
+
+    @transaction.atomic(savepoint=False)
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        ShoppingCartIngredients.objects.apply_recipes(
+            self.id_user_id, [self.id_recipe_id], -1
+        )
+        return result
+
+
+class ShoppingCartQuerySet(models.QuerySet):
+    """Поддержка сумм ингридиентов корзины одним запросом.
+
+    Методы вызываются в той же транзакции, что и изменение
+    ShoppingList или состава рицепта.
+    """
+
+    def _upsert(self, select, params, sign):
+        """INSERT ... SELECT (пользователь, ингридиент, количество)
+        с прибавлением к имеющемуся.
+
+        При вычитании удаляются обнулившиеся строки - только из тех,
+        что затронул этот запрос (RETURNING), а не по всем корзинам.
+        """
+        qn = connections[self.db].ops.quote_name
+        cart = qn(self.model._meta.db_table)
+        sql = (
+            f'INSERT INTO {cart} (id_user_id, id_ingredient_id, amount) '
+            f'{select} '
+            f'ON CONFLICT (id_user_id, id_ingredient_id) '
+            f'DO UPDATE SET amount = {cart}.amount + EXCLUDED.amount'
+        )
+        if sign < 0:
+            sql += ' RETURNING id, amount'
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            emptied = [
+                pk for pk, amount in cursor.fetchall() if amount <= 0
+            ] if sign < 0 else []
+        if emptied:
+            self.filter(pk__in=emptied, amount__lte=0).delete()
+
+    def _upsert_shopping(self, sign, where, params):
+        """Суммы по строкам ShoppingList, отобранным условием where."""
+        qn = connections[self.db].ops.quote_name
+        select = (
+            f'SELECT sl.id_user_id, ri.id_ingredient_id, %s * SUM(ri.amount) '
+            f'FROM {qn(ShoppingList._meta.db_table)} sl '
+            f'INNER JOIN {qn(RecipeIngredients._meta.db_table)} ri '
+            f'ON ri.id_recipe_id = sl.id_recipe_id '
+            f'WHERE {where} '
+            f'GROUP BY sl.id_user_id, ri.id_ingredient_id'
+        )
+        self._upsert(select, [sign, *params], sign)
+
+    def apply_recipe(self, recipe_id, sign, user_id=None):
+        """Прибавить (sign=1) или вычесть (sign=-1) рицепт из корзин.
+
+        Без user_id затрагиваются все корзины, где лежит рицепт.
+        """
+        where, params = 'sl.id_recipe_id = %s', [recipe_id]
+        if user_id is not None:
+            where += ' AND sl.id_user_id = %s'
+            params.append(user_id)
+        self._upsert_shopping(sign, where, params)
+
+    def apply_marks(self, marks, sign):
+        """Прибавить или вычесть строки ShoppingList выборки marks.
+
+        Вычитать нужно до удаления строк: суммы берутся из них.
+        """
+        mark_ids = list(marks.values_list('pk', flat=True))
+        if not mark_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(mark_ids))
+        self._upsert_shopping(sign, f'sl.id IN ({placeholders})', mark_ids)
+
+    def apply_recipes(self, user_id, recipe_ids, sign):
+        """Прибавить или вычесть рицепты в корзине одного пользователя.
+
+        Суммы берутся из состава рицептов, а не из ShoppingList, поэтому
+        вычитать можно уже после удаления строк корзины.
+        """
+        if not recipe_ids:
+            return
+        recipe_ingredients = connections[self.db].ops.quote_name(
+            RecipeIngredients._meta.db_table
+        )
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        select = (
+            f'SELECT %s, ri.id_ingredient_id, %s * SUM(ri.amount) '
+            f'FROM {recipe_ingredients} ri '
+            f'WHERE ri.id_recipe_id IN ({placeholders}) '
+            f'GROUP BY ri.id_ingredient_id'
+        )
+        self._upsert(select, [user_id, sign, *recipe_ids], sign)
+
+    def rebuild(self, user_id=None):
+        """Пересобрать суммы с нуля из ShoppingList."""
+        carts = self.all()
+        where, params = '1 = 1', []
+        if user_id is not None:
+            carts = carts.filter(id_user=user_id)
+            where, params = 'sl.id_user_id = %s', [user_id]
+        carts.delete()
+        self._upsert_shopping(1, where, params)
+
+    def expected(self, user_id=None):
+        """Суммы {(пользователь, ингридиент): количество} по ShoppingList."""
+        rows = ShoppingList.objects.all()
+        if user_id is not None:
+            rows = rows.filter(id_user=user_id)
+        return {
+            (user, ingredient): amount
+            for user, ingredient, amount in rows.filter(
+                id_recipe__r_connection_i__isnull=False
+            ).values_list(
+                'id_user',
+                'id_recipe__r_connection_i__id_ingredient',
+            ).annotate(
+                amount=models.Sum('id_recipe__r_connection_i__amount')
+            ).order_by()
+        }
+
+
+class ShoppingCartIngredients(models.Model):
+    """Сумма ингридиентов в корзине пользователя."""
+
+    SHOPPINGCARTINGREDIENTS_TEMPLATE = '{}: {} {}'
+    id_user = models.ForeignKey(
+        Users,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients_user',
+        verbose_name='Владелец корзины.'
+    )
+    id_ingredient = models.ForeignKey(
+        Ingredients,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients_ingredient',
+        verbose_name='Ингридиент.'
+    )
+    amount = models.IntegerField(
+        'Количество.',
+        default=DEFAULT_INTERAGER_FIELD,
+    )
+
+    objects = ShoppingCartQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id_user']
+        verbose_name = 'Ингридиент корзины'
+        verbose_name_plural = 'Ингридиенты корзины'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['id_user', 'id_ingredient'],
+                name='unique_cart_user_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return self.SHOPPINGCARTINGREDIENTS_TEMPLATE.format(
+            self.id_user_id,
+            self.id_ingredient_id,
+            self.amount,
+        )
+
+
+class DataVersions(models.Model):
+    """Счётчики изменений справочников.
+
+    По ним процессы узнают, что их кэш в памяти устарел.
+    """
+
+    DATAVERSIONS_TEMPLATE = '{}: {}'
+    name = models.CharField(
+        'Справочник',
+        max_length=DIMENSION_FIELD,
+        unique=True,
+    )
+    value = models.PositiveBigIntegerField(
+        'Версия',
+        default=DEFAULT_INTERAGER_FIELD,
+    )
+    updated = models.DateTimeField(
+        'Изменено',
+        default=timezone.now,
+    )
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return self.DATAVERSIONS_TEMPLATE.format(self.name, self.value)
+
+    @classmethod
+    def get_value(cls, name):
+        return cls.objects.filter(name=name).values_list(
+            'value', flat=True
+        ).first() or DEFAULT_INTERAGER_FIELD
+
+    @classmethod
+    def get_many(cls, names):
+        """{имя: (версия, время изменения)} одним запросом."""
+        return {
+            name: (value, updated)
+            for name, value, updated in cls.objects.filter(
+                name__in=names
+            ).values_list('name', 'value', 'updated')
+        }
+
+    @classmethod
+    def bump(cls, *names):
+        """Поднять счётчики names одним INSERT ... ON CONFLICT.
+
+        Первый подъём создаёт строку; одновременные подъёмы одного
+        счётчика (в том числе первые) не теряются.
+        """
+        names = sorted(set(names))
+        if not names:
+            return
+        connection = connections[cls.objects.db]
+        table = connection.ops.quote_name(cls._meta.db_table)
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        values = ', '.join(['(%s, 1, %s)'] * len(names))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (name, value, updated) '
+                f'VALUES {values} '
+                f'ON CONFLICT (name) DO UPDATE SET '
+                f'value = {table}.value + 1, updated = EXCLUDED.updated',
+                [param for name in names for param in (name, now)]
+            )
+
+
+class RecipeIngredientsChanges(models.Model):
+    """Журнал рицептов, у которых мог смениться состав.
+
+    По нему процессы досчитывают индекс "ингридиент -> рицепты"
+    в памяти, не перестраивая его целиком. Старые строки
+    удаляются, см. api/cookable_index.py.
+    """
+
+    RECIPEINGREDIENTSCHANGES_TEMPLATE = '{}: {}'
+    recipe_id = models.PositiveBigIntegerField('Рицепт')
+    created = models.DateTimeField(
+        'Когда',
+        default=timezone.now,
+        db_index=True,
+    )
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Изменение состава рицепта'
+        verbose_name_plural = 'Изменения состава рицептов'
+
+    def __str__(self):
+        return self.RECIPEINGREDIENTSCHANGES_TEMPLATE.format(
+            self.pk, self.recipe_id
+        )
@@ -0,0 +1,136 @@
+"""Операции и помощники миграций без блокировки записи на PostgreSQL."""
+from django.contrib.postgres import operations as postgres_operations
+from django.db import migrations, models
+
+from .configurations import MAX_NUMBER
+
+REBUILD_SHOPPING_CART_INGREDIENTS = """
+DELETE FROM recipes_shoppingcartingredients;
+INSERT INTO recipes_shoppingcartingredients
+    (id_user_id, id_ingredient_id, amount)
+SELECT sl.id_user_id, ri.id_ingredient_id, SUM(ri.amount)
+FROM recipes_shoppinglist sl
+INNER JOIN recipes_recipeingredients ri ON ri.id_recipe_id = sl.id_recipe_id
+GROUP BY sl.id_user_id, ri.id_ingredient_id
+"""
+
+
+def delete_duplicates(model, fields, merge_amount=False):
+    """Оставляет для каждой пары fields запись с меньшим id.
+
+    С merge_amount количество удалённых записей прибавляется к оставленной.
+    Возвращает число удалённых записей.
+    """
+    aggregates = {'keep': models.Min('id'), 'total': models.Count('id')}
+    if merge_amount:
+        aggregates['amount'] = models.Sum('amount')
+    duplicates = model.objects.values(*fields).annotate(
+        **aggregates
+    ).filter(total__gt=1).order_by()
+    removed = 0
+    for row in duplicates:
+        model.objects.filter(
+            **{field: row[field] for field in fields}
+        ).exclude(id=row['keep']).delete()
+        if merge_amount:
+            model.objects.filter(id=row['keep']).update(
+                amount=min(row['amount'], MAX_NUMBER)
+            )
+        removed += row['total'] - 1
+    return removed
+
+
+def rebuild_shopping_cart(schema_editor):
+    """Суммы корзин заново из ShoppingList и состава рицептов."""
+    for statement in REBUILD_SHOPPING_CART_INGREDIENTS.split(';'):
+        schema_editor.execute(statement)
+
+
+class AddIndexConcurrently(postgres_operations.AddIndexConcurrently):
+    """AddIndexConcurrently из django.contrib.postgres.
+
+    На других базах (SQLite в разработке) - обычный AddIndex.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        return migrations.AddIndex.database_forwards(
+            self, app_label, schema_editor, from_state, to_state
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        return migrations.AddIndex.database_backwards(
+            self, app_label, schema_editor, from_state, to_state
+        )
+
+
+class SetNotNull(migrations.AlterField):
+    """AlterField, которое только запрещает NULL в колонке.
+
+    На PostgreSQL сначала CHECK (... IS NOT NULL) NOT VALID, затем
+    VALIDATE CONSTRAINT: таблица проверяется без блокировки записи, и
+    SET NOT NULL уже не сканирует её. Внешний ключ колонки не
+    пересоздаётся. Миграции с этой операцией нужен atomic = False,
+    иначе блокировка первого шага держится до конца транзакции.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias,
+                                        model):
+            return
+        qn = schema_editor.quote_name
+        table = model._meta.db_table
+        column = model._meta.get_field(self.name).column
+        check = f'{column}_not_null'
+        with schema_editor.connection.cursor() as cursor:
+            # Проверка могла остаться от прерванного запуска.
+            cursor.execute(
+                'SELECT 1 FROM pg_constraint WHERE conname = %s '
+                'AND conrelid = to_regclass(%s)',
+                [check, table]
+            )
+            exists = cursor.fetchone() is not None
+        if not exists:
+            schema_editor.execute(
+                f'ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(check)} '
+                f'CHECK ({qn(column)} IS NOT NULL) NOT VALID'
+            )
+        schema_editor.execute(
+            f'ALTER TABLE {qn(table)} VALIDATE CONSTRAINT {qn(check)}'
+        )
+        schema_editor.execute(
+            f'ALTER TABLE {qn(table)} ALTER COLUMN {qn(column)} SET NOT NULL'
+        )
+        schema_editor.execute(
+            f'ALTER TABLE {qn(table)} DROP CONSTRAINT {qn(check)}'
+        )
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            return super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            qn = schema_editor.quote_name
+            column = model._meta.get_field(self.name).column
+            schema_editor.execute(
+                f'ALTER TABLE {qn(model._meta.db_table)} '
+                f'ALTER COLUMN {qn(column)} DROP NOT NULL'
+            )
@@ -0,0 +1,126 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from users.models import Subscriptions, Users
+
+from .configurations import (INGREDIENTS_VERSION, TAGS_VERSION,
+                             USER_MARKS_VERSION)
+from .images import image_processor
+from .models import (DataVersions, Favorited, Ingredients, RecipeIngredients,
+                     RecipeIngredientsChanges, Recipes,
+                     ShoppingCartIngredients, ShoppingList, Tags,
+                     relations_deleted)
+
+
+@receiver(pre_delete, sender=Recipes)
+def recipe_deleted(sender, instance, **kwargs):
+    """Убрать удаляемый рицепт из сумм корзин, пока его состав на месте.
+
+    Отметки рицепта уходят каскадом одним запросом: версия отметок
+    растёт по разу у каждого, кто их ставил, счётчики самого рицепта
+    не трогаются.
+    """
+    ShoppingCartIngredients.objects.apply_recipe(instance.pk, -1)
+    user_ids = Favorited.objects.filter(id_recipe=instance).order_by(
+    ).values_list('id_user', flat=True).union(
+        ShoppingList.objects.filter(id_recipe=instance).order_by(
+        ).values_list('id_user', flat=True)
+    )
+    DataVersions.bump(*(
+        USER_MARKS_VERSION.format(user_id) for user_id in user_ids
+    ))
+
+
+@receiver(pre_delete, sender=Users)
+def user_deleted(sender, instance, **kwargs):
+    """Каскад от пользователя: его отметки уходят из счётчиков рицептов.
+
+    Рицепты самого пользователя удаляются следом, их счётчики не
+    трогаются. На модель - один GROUP BY и UPDATE на каждую убыль.
+    """
+    for model in (Favorited, ShoppingList):
+        marks = model.objects.filter(id_user=instance).exclude(
+            id_recipe__author=instance
+        )
+        model.objects.release_counters(marks.released_counts())
+
+
+@receiver(post_save, sender=Recipes)
+def recipe_saved(sender, instance, **kwargs):
+    """Новая картинка: варианты делаются в фоне после фиксации."""
+    if instance.image and instance.image.name != instance.image_processed:
+        pending = Recipes.objects.filter(pk=instance.pk)
+        transaction.on_commit(
+            lambda: image_processor.submit(pending.process_images)
+        )
+
+
+@receiver(post_save, sender=Recipes)
+@receiver(post_delete, sender=Recipes)
+@receiver(post_save, sender=RecipeIngredients)
+def recipe_composition_changed(sender, instance, **kwargs):
+    """Отметка в журнале для индекса ингридиентов (в той же транзакции).
+
+    На удаление строк состава обработчиков нет: каскад от рицепта
+    удаляется одним запросом, а рицепт отмечается один раз. Удаление
+    строк отдельно от рицепта сообщает relations_deleted.
+    """
+    recipe_id = instance.pk if sender is Recipes else instance.id_recipe_id
+    if recipe_id is not None:
+        RecipeIngredientsChanges.objects.create(recipe_id=recipe_id)
+
+
+@receiver(pre_delete, sender=Ingredients)
+def ingredient_deleted(sender, instance, **kwargs):
+    """Каскад от ингридиента меняет состав рицептов, где он был."""
+    relations_deleted.send(
+        sender=RecipeIngredients,
+        recipe_ids=list(RecipeIngredients.objects.filter(
+            id_ingredient=instance
+        ).order_by().values_list('id_recipe', flat=True)),
+    )
+
+
+@receiver(relations_deleted)
+def recipe_relations_deleted(sender, recipe_ids, **kwargs):
+    if sender is RecipeIngredients:
+        RecipeIngredientsChanges.objects.bulk_create([
+            RecipeIngredientsChanges(recipe_id=recipe_id)
+            for recipe_id in recipe_ids
+        ])
+
+
+@receiver(post_save, sender=Ingredients)
+@receiver(post_delete, sender=Ingredients)
+def ingredient_changed(sender, instance, **kwargs):
+    DataVersions.bump(INGREDIENTS_VERSION)
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_delete, sender=Tags)
+def tag_changed(sender, instance, **kwargs):
+    DataVersions.bump(TAGS_VERSION)
+
+
+@receiver(post_save, sender=Favorited)
+@receiver(post_save, sender=ShoppingList)
+def user_mark_saved(sender, instance, created, **kwargs):
+    """Отметка сохранена мимо UserRecipeQuerySet (админка).
+
+    Новая строка корзины прибавляется и к суммам ингридиентов. Удаление
+    ведут delete() моделей и их QuerySet, каскад - recipe_deleted и
+    user_deleted.
+    """
+    if created:
+        sender.objects.change_counters([instance.id_recipe_id], 1)
+        if sender is ShoppingList:
+            ShoppingCartIngredients.objects.apply_recipes(
+                instance.id_user_id, [instance.id_recipe_id], 1
+            )
+    DataVersions.bump(USER_MARKS_VERSION.format(instance.id_user_id))
+
+
+@receiver(post_save, sender=Subscriptions)
+@receiver(post_delete, sender=Subscriptions)
+def subscription_changed(sender, instance, **kwargs):
+    DataVersions.bump(USER_MARKS_VERSION.format(instance.id_subscriber_id))
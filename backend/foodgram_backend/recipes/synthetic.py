@@ -0,0 +1,333 @@
+"""Детерминированный набор данных для нагрузочных прогонов.
+
+Один и тот же seed, размеры и перекос дают одни и те же строки, так
+что прогоны разных коммитов сравнимы. Пользователи набора называются
+bench-<n>; bench-0 - staff, от его имени идут личные запросы.
+
+Строки не проходят через модели: они генерируются потоком и пишутся
+пакетами, на PostgreSQL - через COPY. Популярность авторов, рицептов
+и ингридиентов распределена по Ципфу: вес k-го по популярности
+1 / k ** skew, так что у немногих рицептов большая часть избранного.
+"""
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from users.models import Subscriptions, Users
+
+from .configurations import (IMPORT_BATCH_SIZE, INGREDIENTS_VERSION,
+                             RECIPES_VERSION, TAGS_VERSION)
+from .models import (DataVersions, Favorited, Ingredients, RecipeIngredients,
+                     RecipeIngredientsChanges, Recipes,
+                     ShoppingCartIngredients, ShoppingList, Tags, TagsRecipes)
+
+BENCH_USER = 'bench-{}'
+BENCH_TAG = 'bench-{}'
+# Даты набора не зависят от дня запуска.
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+SPAN = timedelta(days=365)
+DISHES = (
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'котлеты', 'плов', 'рагу',
+    'омлет', 'запеканка', 'блины', 'оладьи', 'паста', 'соус', 'торт',
+)
+MANNERS = (
+    'домашний', 'быстрый', 'острый', 'постный', 'праздничный', 'летний',
+    'зимний', 'сытный', 'лёгкий', 'бабушкин',
+)
+PRODUCTS = (
+    'мука', 'сахар', 'соль', 'молоко', 'яйцо', 'масло', 'картофель',
+    'морковь', 'лук', 'капуста', 'свёкла', 'говядина', 'курица', 'рис',
+    'гречка', 'сметана', 'сыр', 'чеснок', 'перец', 'томат',
+)
+UNITS = ('г', 'мл', 'шт', 'ст. л.', 'ч. л.')
+# Размеры при scale = 1: количества строк и средние на одну запись.
+DEFAULT_SIZES = {
+    'users': 100,
+    'tags': 8,
+    'ingredients': 500,
+    'recipes': 2000,
+    'recipe_ingredients': 8,
+    'recipe_tags': 2,
+    'favorites': 30,
+    'carts': 5,
+    'subscriptions': 10,
+}
+# Что растёт с scale; справочники и средние на запись - нет.
+SCALED = ('users', 'recipes')
+DEFAULT_SKEW = 1.0
+
+
+def bench_user():
+    """Пользователь для личных запросов или None, если набора нет."""
+    return Users.objects.filter(username=BENCH_USER.format(0)).first()
+
+
+def sizes_for(scale=1, **sizes):
+    """Размеры набора: DEFAULT_SIZES, SCALED умножены на scale."""
+    result = {
+        name: round(value * scale) if name in SCALED else value
+        for name, value in DEFAULT_SIZES.items()
+    }
+    result.update(
+        (name, value) for name, value in sizes.items() if value is not None
+    )
+    return result
+
+
+class Popularity:
+    """Выбор id с весами Ципфа; порядок популярности перемешан seed."""
+
+    def __init__(self, rng, ids, skew):
+        self.rng = rng
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, len(self.ids) + 1)
+        ))
+
+    def pick(self):
+        return self.rng.choices(self.ids, cum_weights=self.weights)[0]
+
+    def sample(self, count, exclude=None):
+        """До count разных id (повторы и exclude отбрасываются)."""
+        if not self.ids or count <= 0:
+            return set()
+        found = set(self.rng.choices(
+            self.ids, cum_weights=self.weights, k=min(count, len(self.ids))
+        ))
+        found.discard(exclude)
+        return found
+
+
+class TableWriter:
+    """Пакетная запись строк в таблицу модели.
+
+    На PostgreSQL - COPY в текстовом формате, иначе executemany.
+    Строки - кортежи значений полей fields в том же порядке.
+    """
+
+    def __init__(self, model, fields, batch_size):
+        self.model = model
+        self.fields = [model._meta.get_field(name) for name in fields]
+        self.batch_size = batch_size
+        self.use_copy = connection.vendor == 'postgresql'
+        qn = connection.ops.quote_name
+        self.table = qn(model._meta.db_table)
+        self.columns = ', '.join(qn(field.column) for field in self.fields)
+
+    def write(self, rows):
+        rows = iter(rows)
+        written = 0
+        for batch in iter(lambda: list(islice(rows, self.batch_size)), []):
+            if self.use_copy:
+                self.copy_batch(batch)
+            else:
+                self.insert_batch(batch)
+            written += len(batch)
+        return written
+
+    def copy_batch(self, batch):
+        buffer = StringBuffer(
+            '\t'.join(map(copy_value, row)) + '\n' for row in batch
+        )
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {self.table} ({self.columns}) FROM STDIN', buffer
+            )
+
+    def insert_batch(self, batch):
+        placeholders = ', '.join(['%s'] * len(self.fields))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} ({self.columns}) '
+                f'VALUES ({placeholders})',
+                [
+                    [
+                        field.get_db_prep_save(value, connection)
+                        for field, value in zip(self.fields, row)
+                    ]
+                    for row in batch
+                ]
+            )
+
+
+class StringBuffer:
+    """Файл для COPY, который читается из генератора строк."""
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.rest = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.rest) < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            self.rest += line
+        if size < 0:
+            size = len(self.rest)
+        chunk, self.rest = self.rest[:size], self.rest[size:]
+        return chunk
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def copy_value(value):
+    """Значение в текстовом формате COPY."""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return 't'
+    if value is False:
+        return 'f'
+    return str(value).replace('\\', '\\\\').replace(
+        '\t', '\\t'
+    ).replace('\n', '\\n').replace('\r', '\\r')
+
+
+def next_id(model):
+    return (model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0) + 1
+
+
+def activity(rng, average):
+    """Сколько записей у одного владельца: в среднем average, с хвостом."""
+    return round(rng.expovariate(1 / average)) if average > 0 else 0
+
+
+@transaction.atomic
+def generate(sizes, seed=1, skew=DEFAULT_SKEW,
+             batch_size=IMPORT_BATCH_SIZE, report=None):
+    """Пишет набор размеров sizes (см. sizes_for) в базу.
+
+    report(таблица, строк, секунд) вызывается после каждой таблицы.
+    Возвращает {таблица: строк}.
+    """
+    rng = random.Random(seed)
+    written = {}
+
+    def write(model, fields, rows):
+        started = time.monotonic()
+        count = TableWriter(model, fields, batch_size).write(rows)
+        written[model._meta.db_table] = count
+        if report is not None:
+            report(model._meta.db_table, count, time.monotonic() - started)
+
+    first_user = next_id(Users)
+    user_ids = range(first_user, first_user + sizes['users'])
+    write(Users, (
+        'id', 'password', 'is_superuser', 'is_staff', 'is_active',
+        'date_joined', 'username', 'first_name', 'last_name', 'email',
+    ), (
+        (
+            user_id, '!', False, number == 0, True,
+            EPOCH + SPAN * number / max(1, sizes['users']),
+            BENCH_USER.format(number), '', '',
+            '{}@bench.local'.format(BENCH_USER.format(number)),
+        )
+        for number, user_id in enumerate(user_ids)
+    ))
+    first_tag = next_id(Tags)
+    tag_ids = range(first_tag, first_tag + sizes['tags'])
+    write(Tags, ('id', 'name', 'color', 'slug'), (
+        (
+            tag_id, 'Тег {}'.format(number),
+            '#{:06x}'.format(rng.randrange(0x1000000)),
+            BENCH_TAG.format(number),
+        )
+        for number, tag_id in enumerate(tag_ids)
+    ))
+    first_ingredient = next_id(Ingredients)
+    ingredient_ids = range(
+        first_ingredient, first_ingredient + sizes['ingredients']
+    )
+    write(Ingredients, ('id', 'name', 'measurement_unit'), (
+        (
+            ingredient_id,
+            '{} {}'.format(PRODUCTS[number % len(PRODUCTS)], number),
+            rng.choice(UNITS),
+        )
+        for number, ingredient_id in enumerate(ingredient_ids)
+    ))
+    authors = Popularity(rng, user_ids, skew)
+    first_recipe = next_id(Recipes)
+    recipe_ids = range(first_recipe, first_recipe + sizes['recipes'])
+    write(Recipes, (
+        'id', 'author', 'name', 'image', 'image_processed', 'text',
+        'cooking_time', 'pub_date', 'favorites_count', 'in_carts_count',
+    ), (
+        (
+            recipe_id, authors.pick(),
+            '{} {} {}'.format(
+                rng.choice(DISHES), rng.choice(MANNERS), number
+            ).capitalize(),
+            None, '', ' '.join(rng.choices(PRODUCTS, k=12)),
+            rng.randint(5, 180),
+            EPOCH + SPAN * number / max(1, sizes['recipes']), 0, 0,
+        )
+        for number, recipe_id in enumerate(recipe_ids)
+    ))
+    tags = Popularity(rng, tag_ids, skew)
+    write(TagsRecipes, ('id_recipe', 'id_teg'), (
+        (recipe_id, tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in sorted(tags.sample(
+            max(1, activity(rng, sizes['recipe_tags']))
+        ))
+    ))
+    ingredients = Popularity(rng, ingredient_ids, skew)
+    write(RecipeIngredients, ('id_recipe', 'id_ingredient', 'amount'), (
+        (recipe_id, ingredient_id, rng.randint(1, 500))
+        for recipe_id in recipe_ids
+        for ingredient_id in sorted(ingredients.sample(
+            max(1, activity(rng, sizes['recipe_ingredients']))
+        ))
+    ))
+    recipes = Popularity(rng, recipe_ids, skew)
+    for model, average in (
+        (Favorited, sizes['favorites']),
+        (ShoppingList, sizes['carts']),
+    ):
+        write(model, ('id_user', 'id_recipe'), (
+            (user_id, recipe_id)
+            for user_id in user_ids
+            for recipe_id in sorted(recipes.sample(activity(rng, average)))
+        ))
+    write(Subscriptions, ('id_subscriber', 'id_writer'), (
+        (user_id, writer_id)
+        for user_id in user_ids
+        for writer_id in sorted(authors.sample(
+            activity(rng, sizes['subscriptions']), exclude=user_id
+        ))
+    ))
+    # Сигналы при такой записи не срабатывают: журнал состава, суммы
+    # корзин, счётчики рицептов, версии справочников и
+    # последовательности id - здесь.
+    changed = timezone.now()
+    write(RecipeIngredientsChanges, ('recipe_id', 'created'), (
+        (recipe_id, changed) for recipe_id in recipe_ids
+    ))
+    ShoppingCartIngredients.objects.rebuild()
+    Recipes.objects.reconcile_counters(list(recipe_ids))
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [Users, Tags, Ingredients, Recipes]
+        ):
+            cursor.execute(sql)
+    for name in (TAGS_VERSION, INGREDIENTS_VERSION, RECIPES_VERSION):
+        DataVersions.bump(name)
+    return written
+
+
+def seed(seed=1, **sizes):
+    """Небольшой набор для bench-api, если его ещё нет."""
+    sizes = sizes_for(**sizes)
+    if bench_user() is None:
+        generate(sizes, seed)
+    return sizes
@@ -1,9 +1,10 @@
 # flake8: noqa
 from django.contrib import admin
-from users.models import Users, Subscriptions
+from foodgram_backend.admin_tools import LargeTableAdmin, related_count
+from users.models import DeniedTokens, Users, Subscriptions
 
 
-class UsersPanel(admin.ModelAdmin):
+class UsersPanel(LargeTableAdmin):
     list_display = (
         'pk',
         'email',
@@ -11,23 +12,43 @@ class UsersPanel(admin.ModelAdmin):
         'first_name',
         'last_name',
         'password',
+        'count_subscribers',
     )
     list_editable = ('password',)
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_active')
     search_fields = ('username', 'email')
-    empty_value_display = '-пусто-'
+    ordering = ('-pk',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            subscribers_total=related_count(Subscriptions, 'id_writer')
+        )
 
-class SubscriptionsPanel(admin.ModelAdmin):
+    def count_subscribers(self, obj):
+        return obj.subscribers_total
+
+
+class SubscriptionsPanel(LargeTableAdmin):
     list_display = (
         'pk',
         'id_subscriber',
         'id_writer',
     )
-    list_editable = ('id_subscriber',)
-    list_filter = ('id_subscriber', 'id_writer')
-    empty_value_display = '-пусто-'
+    list_select_related = ('id_subscriber', 'id_writer')
+    search_fields = ('id_subscriber__username', 'id_writer__username')
+    autocomplete_fields = ('id_subscriber', 'id_writer')
+    ordering = ('-pk',)
+
+
+class DeniedTokensPanel(LargeTableAdmin):
+    list_display = (
+        'pk',
+        'jti',
+        'expires',
+    )
+    search_fields = ('jti',)
 
 
 admin.site.register(Users, UsersPanel)
 admin.site.register(Subscriptions, SubscriptionsPanel)
+admin.site.register(DeniedTokens, DeniedTokensPanel)
@@ -2,3 +2,4 @@
 
 STANDARD_FIELD_VALUE = 150  # Стандартное значения для поля
 EMAIL_FIELD_VALUE = 254     # Размер поля для (email)
+JTI_FIELD_VALUE = 255       # Размер поля для (jti) токена
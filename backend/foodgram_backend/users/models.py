@@ -1,10 +1,12 @@
 # flake8: noqa
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 from .configurations import (
     STANDARD_FIELD_VALUE,
     EMAIL_FIELD_VALUE,
+    JTI_FIELD_VALUE,
 )
 
 
@@ -81,3 +83,37 @@ class Subscriptions(models.Model):
             self.id_subscriber,
             self.id_writer,
         )
+
+
+class DeniedTokens(models.Model):
+    """Отозванные токены доступа и обновления (по jti).
+
+    Строка нужна, только пока сам токен не истёк,
+    поэтому список остаётся маленьким.
+    """
+
+    DENIEDTOKENS_TEMPLATE = '{} до {}'
+    jti = models.CharField(
+        'Идентификатор токена',
+        max_length=JTI_FIELD_VALUE,
+        unique=True,
+    )
+    expires = models.DateTimeField(
+        'Истекает',
+        db_index=True,
+    )
+
+    class Meta:
+        ordering = ['expires']
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.DENIEDTOKENS_TEMPLATE.format(self.jti, self.expires)
+
+    @classmethod
+    def active(cls):
+        """jti ещё не истёкших отозванных токенов."""
+        return cls.objects.filter(
+            expires__gt=timezone.now()
+        ).values_list('jti', flat=True)